@@ -0,0 +1,3 @@
+"""
+Performance benchmarks for the calculator. See benchmarks/run.py.
+"""
@@ -0,0 +1,250 @@
+"""
+Benchmark runner.
+
+Times command dispatch, the arithmetic commands in scalar and batch form and in
+each numeric mode, history
+saving and loading at several history sizes, plugin loading and application cold
+start, and writes the results as JSON.
+
+    python -m benchmarks.run --output benchmarks/results.json
+    python -m benchmarks.run --quick --compare benchmarks/baseline.json --threshold 0.2
+
+With --compare, the run fails (exit code 1) if any metric is slower than the
+baseline by more than the threshold (0.2 = 20%).
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+from calculator.commands import CommandHandler
+from calculator.plugins import PluginManager
+from calculator.plugins.arithmetic import AddCommand, SubtractCommand, MultiplyCommand, DivideCommand
+from calculator.plugins.history import HistoryManager
+from calculator.plugins.history.storage import close_all_storages
+from calculator.numeric import NUMERIC_MODES, NumericMode
+
+ARITHMETIC_COMMANDS = {
+    'add': AddCommand,
+    'subtract': SubtractCommand,
+    'multiply': MultiplyCommand,
+    'divide': DivideCommand,
+}
+DEFAULT_SIZES = (1_000, 1_000_000, 10_000_000)
+QUICK_SIZES = (1_000, 10_000)
+BATCH_SIZE = 1_000_000
+
+def measure(func, number=1, repeat=5):
+    """
+    Run `func` `number` times per round for `repeat` rounds.
+    :return: Median seconds per call.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return statistics.median(timings)
+
+def bench_dispatch(results):
+    """
+    Time CommandHandler.execute_command and each arithmetic command called directly.
+    """
+    handler = CommandHandler()
+    for name, command_class in ARITHMETIC_COMMANDS.items():
+        handler.register_command(name, command_class())
+    results['dispatch.execute_command'] = measure(lambda: handler.execute_command('add', 3.0, 4.0), number=100_000)
+
+    cached = CommandHandler(cache_size=1024)
+    cached.register_command('add', AddCommand())
+    results['dispatch.execute_command_cached'] = measure(lambda: cached.execute_command('add', 3.0, 4.0), number=100_000)
+
+    for name, command_class in ARITHMETIC_COMMANDS.items():
+        command = command_class()
+        results[f'arithmetic.{name}.scalar'] = measure(lambda command=command: command.execute(3.0, 4.0), number=100_000)
+
+def bench_numeric_modes(results):
+    """
+    Time parsing an operand and the scalar arithmetic commands in each numeric mode.
+    """
+    for mode_name in NUMERIC_MODES:
+        mode = NumericMode(mode_name)
+        mode.activate()
+        results[f'numeric.{mode_name}.parse'] = measure(lambda mode=mode: mode.parse('3.25'), number=100_000)
+        a, b = mode.parse('3.25'), mode.parse('4.5')
+        for name, command_class in ARITHMETIC_COMMANDS.items():
+            command = command_class()
+            results[f'numeric.{mode_name}.{name}'] = measure(lambda command=command: command.execute(a, b), number=100_000)
+    NumericMode().activate()
+
+def bench_batch(results, size=BATCH_SIZE):
+    """
+    Time each arithmetic command over whole arrays through CommandHandler.execute_batch.
+    """
+    handler = CommandHandler()
+    for name, command_class in ARITHMETIC_COMMANDS.items():
+        handler.register_command(name, command_class())
+    rng = np.random.default_rng(0)
+    a = rng.random(size)
+    b = rng.integers(0, 10, size).astype(np.float64)
+    for name in ARITHMETIC_COMMANDS:
+        results[f'arithmetic.{name}.batch_{size}'] = measure(lambda name=name: handler.execute_batch(name, a, b))
+
+def _history_frame(rows):
+    """
+    Build a history DataFrame with `rows` synthetic entries.
+    """
+    rng = np.random.default_rng(0)
+    operands = rng.random((rows, 2))
+    return pd.DataFrame({
+        'Operation': np.array(list(ARITHMETIC_COMMANDS))[rng.integers(0, 4, rows)],
+        'Operand1': operands[:, 0],
+        'Operand2': operands[:, 1],
+        'Result': operands[:, 0] + operands[:, 1],
+    })
+
+def bench_history(results, sizes, workdir):
+    """
+    Time saving history entries and loading/querying histories of each size.
+    """
+    for rows in sizes:
+        path = os.path.join(workdir, f'history_{rows}.csv')
+        manager = HistoryManager(backend='csv', history_file=path)
+        started = time.perf_counter()
+        for i in range(rows):
+            manager.save_to_history('add', 1.0, float(i), i + 1.0)
+        manager.flush()
+        results[f'history.save_to_history.{rows}'] = (time.perf_counter() - started) / rows
+
+        # Load with a fresh manager so nothing is served from the in-memory index
+        _history_frame(rows).to_csv(path, index=False)
+        close_all_storages()
+        reader = HistoryManager(backend='csv', history_file=path)
+        results[f'history.load_history.{rows}'] = measure(reader.load_history, repeat=3)
+        results[f'history.tail_20.{rows}'] = measure(lambda reader=reader: reader.storage.tail(20), repeat=3)
+        os.remove(path)
+        close_all_storages()
+
+def bench_plugins(results, workdir):
+    """
+    Time plugin discovery (cold manifest) and loading from the plugin manifest.
+    """
+    manifest_path = os.path.join(workdir, 'plugin_manifest.json')
+
+    def discover():
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        PluginManager(CommandHandler(), manifest_path).load_plugins()
+
+    results['plugins.load_plugins.discover'] = measure(discover)
+    results['plugins.load_plugins.manifest'] = measure(
+        lambda: PluginManager(CommandHandler(), manifest_path).load_plugins(), number=10)
+
+def bench_cold_start(results):
+    """
+    Time a fresh interpreter constructing CalculatorApp and loading its plugins.
+    """
+    script = "from calculator import CalculatorApp; CalculatorApp().plugin_manager.load_plugins()"
+    baseline = measure(lambda: subprocess.run([sys.executable, '-c', 'pass'], check=True), repeat=5)
+    total = measure(lambda: subprocess.run([sys.executable, '-c', script], check=True), repeat=5)
+    results['startup.interpreter'] = baseline
+    results['startup.calculator_app'] = total
+
+def run_benchmarks(sizes=DEFAULT_SIZES, batch_size=BATCH_SIZE):
+    """
+    Run all benchmarks.
+    :return: Dictionary of metric name -> seconds (per operation where applicable).
+    """
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='calc-bench-')
+    try:
+        bench_dispatch(results)
+        bench_numeric_modes(results)
+        bench_batch(results, batch_size)
+        bench_history(results, sizes, workdir)
+        bench_plugins(results, workdir)
+        bench_cold_start(results)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def compare_results(current, baseline, threshold):
+    """
+    Compare two sets of results.
+    :param threshold: Allowed slowdown as a fraction (0.2 = 20% slower).
+    :return: List of (metric, baseline seconds, current seconds, ratio) for regressed metrics.
+    """
+    regressions = []
+    for metric, seconds in sorted(current.items()):
+        previous = baseline.get(metric)
+        if previous is None or previous <= 0:
+            continue
+        ratio = seconds / previous
+        if ratio > 1 + threshold:
+            regressions.append((metric, previous, seconds, ratio))
+    return regressions
+
+def format_seconds(seconds):
+    """
+    Format a duration with a readable unit.
+    """
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+    return f"{seconds / 1e-9:.1f} ns"
+
+def main(argv=None):
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Run the calculator benchmarks.")
+    parser.add_argument('--output', metavar='FILE', help="Write results as JSON to FILE.")
+    parser.add_argument('--sizes', help="Comma separated history sizes (default: 1000,1000000,10000000).")
+    parser.add_argument('--quick', action='store_true', help="Use small history and batch sizes.")
+    parser.add_argument('--compare', metavar='BASELINE', help="Compare against a stored results file.")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown before failing (default: 0.2).")
+    args = parser.parse_args(argv)
+
+    if args.sizes:
+        sizes = [int(size) for size in args.sizes.split(',')]
+    else:
+        sizes = QUICK_SIZES if args.quick else DEFAULT_SIZES
+    results = run_benchmarks(sizes, 10_000 if args.quick else BATCH_SIZE)
+
+    for metric, seconds in sorted(results.items()):
+        print(f"{metric:45} {format_seconds(seconds)}")
+
+    if args.output:
+        report = {
+            'meta': {
+                'created': datetime.now(timezone.utc).isoformat(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+        regressions = compare_results(results, baseline, args.threshold)
+        for metric, previous, seconds, ratio in regressions:
+            print(f"REGRESSION {metric}: {format_seconds(previous)} -> {format_seconds(seconds)} ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
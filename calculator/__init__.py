@@ -2,44 +2,104 @@ import os
 import sys
 import logging
 import logging.config
+import time
 from dotenv import load_dotenv
 from calculator.commands import CommandHandler
 from calculator.plugins.history import HistoryManager 
 from calculator.plugins import PluginManager
+from calculator.config import Config, get_config, set_config
+from calculator.metrics import metrics
+from calculator.asynclog import start_async_logging, stop_async_logging, calculation_sampler
+from calculator.numeric import get_numeric_mode, set_numeric_mode
+from calculator.profiling import profiler
+
+# The batch, parallel and server modules (and asyncio / concurrent.futures) are
+# imported inside the methods that use them to keep interactive startup fast.
 
 class CalculatorApp:
-    def __init__(self):
+    def __init__(self, config_overrides=None, config_file=None):
+        """
+        :param config_overrides: Setting variable -> value, taking precedence over
+            the config file and the environment (e.g. from command-line flags).
+        :param config_file: Config file to read instead of data/config.env.
+        """
         os.makedirs('logs', exist_ok=True)
-        self.configure_logging()
-
-        # Load environment variables
+        # .env is read first so that it can switch any setting, logging options included
         load_dotenv()
-        self.settings = self.load_environment_variables()
 
-        # Initialize the command handler and plugin manager
-        self.command_handler = CommandHandler()
-        self.plugin_manager = PluginManager(self.command_handler)
+        # Load the settings; they are shared with every subsystem through get_config()
+        self.settings = self.load_environment_variables(config_overrides, config_file)
+        self.configure_logging()
+        config = self.settings
+        self.configure_log_sampling(config.log_sample_rate)
+        if config.metrics:
+            metrics.enabled = True
+        # Started before the history and plugins are set up, so their loading is profiled too
+        if config.profile:
+            profiler.start()
+        self.configure_numeric_mode(config.numeric_mode, config.decimal_precision)
 
-        # Initialize HistoryManager here in the CalculatorApp
+        # Initialize HistoryManager here in the CalculatorApp; it is shared with the history commands
         self.history_manager = HistoryManager()
 
+        # Initialize the command handler and plugin manager
+        self.command_handler = CommandHandler(cache_size=config.command_cache_size)
+        self.plugin_manager = PluginManager(self.command_handler, config.plugin_manifest, self.history_manager)
+
     def configure_logging(self):
         """
         Configure logging based on the logging.conf file. If the file is missing, configure basic logging.
+        The configured handlers then run on a background thread behind a queue,
+        unless the LOG_ASYNC setting is false.
         """
         logging_conf_path = 'logging.conf'
+        # Stop any previous listener before its handlers are replaced
+        stop_async_logging()
         # Look Before You Leap (LBYL)
         if os.path.exists(logging_conf_path):
             logging.config.fileConfig(logging_conf_path, disable_existing_loggers=False)
         else:
             logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        if get_config().log_async:
+            start_async_logging()
         logging.info("Logging configured.")
 
-    def load_environment_variables(self):
+    def configure_log_sampling(self, rate):
+        """
+        Set the fraction of calculations that are logged.
+        :param rate: A number between 0 and 1; None keeps logging every calculation.
+        """
+        if rate is None:
+            return
+        try:
+            calculation_sampler.rate = float(rate)
+        except ValueError:
+            logging.warning("Ignoring invalid LOG_SAMPLE_RATE: '%s'", rate)
+
+    def configure_numeric_mode(self, name=None, precision=None):
+        """
+        Select how operands are parsed and computed: float, decimal or fraction.
+        :param name: Mode name; None keeps the current mode.
+        :param precision: Significant digits in decimal mode; None for the default (28).
         """
-        Load all environment variables into a dictionary.
+        try:
+            set_numeric_mode(name or get_numeric_mode().name, precision)
+        except ValueError as e:
+            logging.warning("Ignoring invalid numeric mode settings: %s", e)
+            return
+        if hasattr(self, 'command_handler'):
+            self.command_handler.clear_cache()
+        logging.info("Numeric mode: %r", get_numeric_mode())
+
+    def load_environment_variables(self, overrides=None, path=None):
         """
-        settings = {key: value for key, value in os.environ.items()}
+        Load the settings from the config file, the environment and `overrides`,
+        and make them the shared Config. Only the known settings are read from
+        the environment; other variables are looked up when asked for.
+        :return: The Config.
+        """
+        settings = Config.load(overrides, path)
+        set_config(settings)
         logging.info("Environment variables loaded.")
         return settings
 
@@ -51,6 +111,142 @@ class CalculatorApp:
         """
         return self.settings.get(env_var, None)
 
+    def export_metrics(self):
+        """
+        Write a metrics snapshot to CALC_METRICS_FILE, if metrics are enabled and the setting is given.
+        """
+        metrics_file = get_config().metrics_file
+        if metrics.enabled and metrics_file:
+            try:
+                metrics.write(metrics_file)
+                logging.info("Metrics written to '%s'.", metrics_file)
+            except OSError as e:
+                logging.error("Could not write metrics to '%s': %s", metrics_file, e)
+
+    def export_profile(self):
+        """
+        If profiling is still running, stop it and write its report under logs/.
+        """
+        if not profiler.active:
+            return
+        profiler.stop()
+        try:
+            profiler.dump()
+        except OSError as e:
+            logging.error("Could not write profile: %s", e)
+
+    def run_batch(self, source, destination=None):
+        """
+        Run operations from a file or stdin without prompting, writing one result per line.
+        :param source: Path of the input file, or '-' for stdin.
+        :param destination: Path of the output file, or None for stdout.
+        :return: Number of operations processed.
+        """
+        from calculator.batch import run_batch  # pylint: disable=import-outside-toplevel
+        self.plugin_manager.load_plugins()
+
+        logging.info("Batch started from '%s'.", source)
+        started = time.perf_counter()
+        try:
+            count = run_batch(self.command_handler, source, destination, self.history_manager)
+        finally:
+            # Write out any history entries still sitting in the write buffer
+            self.history_manager.flush()
+            self.export_metrics()
+            self.export_profile()
+        elapsed = time.perf_counter() - started
+        logging.info("Batch finished: %s operations in %.3fs.", count, elapsed)
+        return count
+
+    def run_parallel_batch(self, source, destination=None, workers=None):
+        """
+        Run operations from a file or stdin across a pool of worker processes.
+        Results are written in input order and history is written by this process only.
+        :param workers: Number of worker processes; defaults to the CALC_WORKERS setting,
+            or the CPU count.
+        :return: Dictionary with operations, seconds, operations_per_second and workers.
+        """
+        from calculator.parallel import ParallelEngine  # pylint: disable=import-outside-toplevel
+        try:
+            return ParallelEngine(workers or get_config().workers).run(source, destination, self.history_manager)
+        finally:
+            # Write out any history entries still sitting in the write buffer
+            self.history_manager.flush()
+            self.export_metrics()
+            self.export_profile()
+
+    def run_repl(self, input_stream=None, output=None):
+        """
+        Run the prompt-free REPL: one command per line (e.g. `add 3 4`), command
+        names may be abbreviated, and results are written without prompts.
+        :param input_stream: Stream of command lines; defaults to stdin.
+        :param output: Stream results are written to; defaults to stdout.
+        :return: Number of commands executed.
+        """
+        from calculator.repl import FastREPL  # pylint: disable=import-outside-toplevel
+        self.plugin_manager.load_plugins()
+        try:
+            return FastREPL(self.command_handler, self.history_manager).run(input_stream, output)
+        except KeyboardInterrupt:
+            logging.info("Application interrupted by user. Exiting...")
+            return None
+        finally:
+            # Write out any history entries still sitting in the write buffer
+            self.history_manager.flush()
+            self.export_metrics()
+            self.export_profile()
+
+    def export_history(self, path, fmt=None):
+        """
+        Export the whole history to a CSV or JSON Lines file, optionally .gz or .xz
+        compressed, reporting progress on stderr.
+        :param fmt: 'csv' or 'jsonl'; taken from the file extension by default.
+        :return: Number of rows exported.
+        """
+        from calculator.plugins.history.transfer import TransferProgress  # pylint: disable=import-outside-toplevel
+        progress = TransferProgress("Exported")
+        rows = self.history_manager.export_history(path, fmt, progress)
+        progress.finish()
+        return rows
+
+    def import_history(self, path, fmt=None):
+        """
+        Append the entries of a CSV or JSON Lines file, optionally .gz or .xz
+        compressed, to the history, reporting progress on stderr.
+        :param fmt: 'csv' or 'jsonl'; taken from the file extension by default.
+        :return: Number of rows imported.
+        """
+        from calculator.plugins.history.transfer import TransferProgress  # pylint: disable=import-outside-toplevel
+        progress = TransferProgress("Imported")
+        try:
+            rows = self.history_manager.import_history(path, fmt, progress)
+        finally:
+            self.history_manager.flush()
+        progress.finish()
+        return rows
+
+    def serve(self, host=None, port=None, path=None):
+        """
+        Run the calculation server until interrupted.
+        :param host: Address to listen on; defaults to the CALC_SERVER_HOST setting.
+        :param port: Port to listen on; defaults to the CALC_SERVER_PORT setting.
+        :param path: Serve on this Unix socket path instead of host/port.
+        """
+        config = get_config()
+        host = host or config.server_host
+        port = port if port is not None else config.server_port
+        import asyncio  # pylint: disable=import-outside-toplevel
+        from calculator.server import CalculatorServer  # pylint: disable=import-outside-toplevel
+        self.plugin_manager.load_plugins()
+        server = CalculatorServer(self.command_handler, self.history_manager, host, port, path)
+        try:
+            asyncio.run(server.serve_forever())
+        except KeyboardInterrupt:
+            logging.info("Server interrupted by user. Exiting...")
+        finally:
+            self.export_metrics()
+            self.export_profile()
+
     def start(self):
         # Load and register plugins
         self.plugin_manager.load_plugins()
@@ -60,28 +256,48 @@ class CalculatorApp:
         try:
             while True:
                 # Step 1: Choose an operation
-                command_name = input("Choose 'exit' to exit or 'menu' for options: ").strip().lower()
+                command_name, *command_args = input("Choose 'exit' to exit or 'menu' for options: ").strip().split() or ['']
+                # Only the name is case-insensitive; arguments such as file paths are kept as typed
+                command_name = command_name.lower()
 
                 if command_name == 'exit':
                     logging.info("Exiting application.")
                     break
 
-                if command_name not in self.command_handler.commands:
-                    logging.error(f"Unknown command: '{command_name}'")
+                descriptor = self.command_handler.descriptors.get(command_name)
+                if descriptor is None:
+                    logging.error("Unknown command: '%s'", command_name)
                     continue
 
-                # For commands that do not require operands
-                if command_name in ['menu', 'showhistory', 'clearhistory']:
-                    # Directly execute the command without asking for operands
-                    self.command_handler.execute_command(command_name)
+                # For commands that do not take operands (no arity)
+                if descriptor.arity is None:
+                    # Directly execute the command without asking for operands,
+                    # passing along anything typed after the name (e.g. 'showhistory last 10')
+                    try:
+                        result = self.command_handler.execute_command(command_name, *command_args)
+                        if result is not None:
+                            print(f"Result: {result}")
+                    except (ValueError, ZeroDivisionError) as e:
+                        logging.error("Error: %s", e)
                     continue
                 # Easier to Ask for Forgiveness than Permission (EAFP)    
                 try:
-                    # Step 2: Enter the first number
-                    first_number = float(input("Enter the first number: ").strip())
-                    
-                    # Step 3: Enter the second number
-                    second_number = float(input("Enter the second number: ").strip())
+                    # Operands are parsed according to the numeric mode (float, decimal or fraction)
+                    parse = get_numeric_mode().parse
+
+                    if len(command_args) == descriptor.arity:
+                        # Operands typed on the same line, e.g. 'add 3 4'
+                        first_number, second_number = map(parse, command_args)
+                    elif command_args:
+                        # Some but not all operands typed (e.g. 'add 3'): rejected, as in the fast REPL and batch
+                        logging.error("Error: Expected %s operands, got %s.", descriptor.arity, len(command_args))
+                        continue
+                    else:
+                        # Step 2: Enter the first number
+                        first_number = parse(input("Enter the first number: ").strip())
+
+                        # Step 3: Enter the second number
+                        second_number = parse(input("Enter the second number: ").strip())
                     
                     # Step 4: Execute the command
                     result = self.command_handler.execute_command(command_name, first_number, second_number)
@@ -94,12 +310,18 @@ class CalculatorApp:
                 except ValueError:
                     logging.error("Invalid input. Please enter valid numbers.")
                 except ZeroDivisionError as e:
-                    logging.error(f"Error: {e}")
+                    logging.error("Error: %s", e)
                 except KeyError:
-                    logging.error(f"Unknown command: '{command_name}'")
+                    logging.error("Unknown command: '%s'", command_name)
         
         except KeyboardInterrupt:
             logging.info("Application interrupted by user. Exiting...")
         
         finally:
+            # Write out any history entries still sitting in the write buffer
+            self.history_manager.flush()
+            self.export_metrics()
+            self.export_profile()
             logging.info("Application shutdown.")
+            # Drain queued log records to the log file before returning
+            stop_async_logging()
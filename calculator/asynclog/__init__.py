@@ -0,0 +1,127 @@
+"""
+Non-blocking logging: log records are put on a queue by the calling thread and
+formatted and written by a QueueListener on a background thread, so a slow
+log file does not hold up calculations.
+
+Per-calculation log lines (one per saved history entry) can also be sampled
+with LOG_SAMPLE_RATE, e.g. 0.01 logs one calculation in a hundred.
+"""
+import os
+import queue
+import atexit
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+    The standard QueueHandler formats the message before enqueuing it, because
+    records may be pickled for another process; ours stay in-process, so the
+    record is passed through untouched.
+    """
+    def prepare(self, record):
+        return record
+
+
+class LogSampler:
+    """
+    Decides which calculations get logged. With a rate of 0.25 every fourth
+    call returns True; the choice is evenly spaced rather than random so that
+    a sampled log stays representative of the traffic.
+    """
+    def __init__(self, rate=1.0):
+        self.rate = rate
+        self._credit = 0.0
+
+    @property
+    def rate(self):
+        return self._rate
+
+    @rate.setter
+    def rate(self, value):
+        self._rate = min(max(float(value), 0.0), 1.0)
+        self._credit = 0.0
+
+    def sample(self):
+        """
+        Return True if the current calculation should be logged.
+        """
+        if self._rate >= 1.0:
+            return True
+        self._credit += self._rate
+        if self._credit >= 1.0:
+            self._credit -= 1.0
+            return True
+        return False
+
+
+# Shared sampler for per-calculation log lines
+calculation_sampler = LogSampler()
+
+_listener = None
+_queue_handler = None
+_logger = None
+
+def start_async_logging(logger=None):
+    """
+    Move the standard-library handlers of `logger` (the root logger by default)
+    behind a queue serviced by a background thread.
+    Handlers installed by other tools (e.g. a test runner's capture handler) are
+    left in place and keep receiving records synchronously.
+    :return: The running QueueListener, or None if there was nothing to move.
+    """
+    global _listener, _queue_handler, _logger  # pylint: disable=global-statement
+    stop_async_logging()
+    logger = logger or logging.getLogger()
+    handlers = [handler for handler in logger.handlers if type(handler).__module__.startswith('logging')]
+    if not handlers:
+        return None
+    for handler in handlers:
+        logger.removeHandler(handler)
+    log_queue = queue.SimpleQueue()
+    _queue_handler = DeferredQueueHandler(log_queue)
+    logger.addHandler(_queue_handler)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    _logger = logger
+    return _listener
+
+def stop_async_logging():
+    """
+    Write out every queued record, stop the background thread and put the
+    original handlers back on the logger, so later records are written directly.
+    Safe to call when async logging is not running.
+    """
+    global _listener, _queue_handler, _logger  # pylint: disable=global-statement
+    if _listener is None:
+        return
+    _listener.stop()  # Processes everything already on the queue before returning
+    _logger.removeHandler(_queue_handler)
+    for handler in _listener.handlers:
+        handler.flush()
+        _logger.addHandler(handler)
+    _listener = _queue_handler = _logger = None
+
+def _detach_after_fork():
+    """
+    In a forked child the listener thread does not exist, so records put on the
+    queue would never be written. Write directly to the handlers instead.
+    """
+    global _listener, _queue_handler, _logger  # pylint: disable=global-statement
+    if _listener is None:
+        return
+    _logger.removeHandler(_queue_handler)
+    for handler in _listener.handlers:
+        _logger.addHandler(handler)
+    _listener = _queue_handler = _logger = None
+
+def async_logging_active():
+    """
+    Return True while a QueueListener is running.
+    """
+    return _listener is not None
+
+# Queued records must reach the log file even if the app exits without a clean shutdown.
+atexit.register(stop_async_logging)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_detach_after_fork)
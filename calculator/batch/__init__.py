@@ -0,0 +1,143 @@
+"""
+Non-interactive batch mode: a generator pipeline that reads operations from a
+file or stdin, runs them through the CommandHandler and writes results in chunks.
+
+Each input line is either whitespace separated (`add 1 2`) or a CSV row
+(`add,1,2`); a line is read as a CSV row only when a comma follows the command
+name, so commas inside arguments (`eval a*2 a=1,2,3`) are kept. Blank lines and lines starting with '#' are skipped. Every input
+operation produces exactly one output line: the result, or `Error: <message>`
+if the operation failed, so output lines can be matched back to input lines.
+Commands without operands that print rather than return a result (such as
+showhistory) write what they print to the batch output in place of that line.
+"""
+import io
+import sys
+import logging
+from contextlib import contextmanager, redirect_stdout
+from calculator.config import get_config
+from calculator.numeric import get_numeric_mode
+
+@contextmanager
+def open_source(source):
+    """
+    Open a batch input for reading; '-' means stdin.
+    """
+    if source == '-':
+        yield sys.stdin
+    else:
+        with open(source, 'r', encoding='utf-8') as f:
+            yield f
+
+@contextmanager
+def open_output(destination):
+    """
+    Open a batch output for writing; None or '-' means stdout.
+    """
+    if destination in (None, '-'):
+        yield sys.stdout
+    else:
+        with open(destination, 'w', encoding='utf-8') as f:
+            yield f
+
+def parse_operations(lines, first_line_number=1):
+    """
+    Split input lines into (line_number, command_name, arguments) tuples.
+    :param first_line_number: Line number of the first line, for error messages.
+    """
+    for line_number, line in enumerate(lines, start=first_line_number):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        # A CSV row when nothing but the command name comes before the first comma
+        fields = line.split(',')
+        if len(fields) == 1 or len(fields[0].split()) > 1:
+            fields = line.split()
+        yield line_number, fields[0].strip().lower(), [field.strip() for field in fields[1:]]
+
+def execute_operations(command_handler, operations, history_manager=None, parse_number=None, calculations_only=False):
+    """
+    Execute parsed operations, yielding one output line per operation.
+    Errors are logged the same way the REPL logs them and do not stop the batch.
+    Commands without an `arity` (menu, showhistory, eval, ...) get their arguments as given.
+    :param history_manager: If given, successful calculations are saved to history.
+    :param parse_number: Function turning an operand string into a number; defaults to the
+        parser of the current numeric mode, looked up once per operation.
+    :param calculations_only: Refuse commands without an `arity` instead of running them,
+        e.g. in a worker process whose history and settings are not the user's.
+    """
+    for line_number, command_name, args in operations:
+        descriptor = command_handler.descriptors.get(command_name)
+        if descriptor is None:
+            logging.error("Line %s: Unknown command: '%s'", line_number, command_name)
+            yield f"Error: Unknown command: '{command_name}'"
+            continue
+
+        if descriptor.arity is None and calculations_only:
+            logging.error("Line %s: Command '%s' cannot run in a parallel batch.", line_number, command_name)
+            yield f"Error: Command '{command_name}' cannot run in a parallel batch."
+            continue
+
+        if descriptor.arity is None:
+            printed = io.StringIO()
+            try:
+                with redirect_stdout(printed):
+                    result = command_handler.execute_command(command_name, *args)
+            except (ValueError, ZeroDivisionError) as e:
+                logging.error("Line %s: Error: %s", line_number, e)
+                yield f"Error: {e}"
+                continue
+            # Printed output goes to the batch output, not the console
+            lines = [printed.getvalue().rstrip('\n')] if printed.getvalue() else []
+            if result is not None:
+                lines.append(str(result))
+            yield '\n'.join(lines) or "OK"
+            continue
+
+        try:
+            if len(args) != descriptor.arity:
+                raise ValueError(f"Expected {descriptor.arity} operands, got {len(args)}.")
+            parse = parse_number or get_numeric_mode().parse
+            first_number = parse(args[0])
+            second_number = parse(args[1])
+            result = command_handler.execute_command(command_name, first_number, second_number)
+            if history_manager is not None:
+                history_manager.save_to_history(command_name, first_number, second_number, result)
+            yield str(result)
+        except ValueError as e:
+            logging.error("Line %s: Invalid input. Please enter valid numbers. (%s)", line_number, e)
+            yield f"Error: {e}"
+        except ZeroDivisionError as e:
+            logging.error("Line %s: Error: %s", line_number, e)
+            yield f"Error: {e}"
+
+def write_chunks(lines, output, chunk_lines=None):
+    """
+    Write output lines in blocks of `chunk_lines` rather than one write per line.
+    :param chunk_lines: Lines per block; defaults to the BATCH_OUTPUT_CHUNK_LINES setting.
+    :return: Number of lines written.
+    """
+    chunk_lines = chunk_lines or get_config().batch_output_chunk_lines
+    count = 0
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_lines:
+            output.write('\n'.join(chunk) + '\n')
+            count += len(chunk)
+            chunk.clear()
+    if chunk:
+        output.write('\n'.join(chunk) + '\n')
+        count += len(chunk)
+    output.flush()
+    return count
+
+def run_batch(command_handler, source, destination=None, history_manager=None):
+    """
+    Run a whole batch: read operations from `source`, execute them and write results.
+    :param source: Path of the input file, or '-' for stdin.
+    :param destination: Path of the output file, or None/'-' for stdout.
+    :return: Number of operations processed.
+    """
+    with open_source(source) as lines, open_output(destination) as output:
+        results = execute_operations(command_handler, parse_operations(lines), history_manager)
+        return write_chunks(results, output)
@@ -1,4 +1,9 @@
+import time
 from abc import ABC, abstractmethod
+from functools import partial
+from collections import OrderedDict
+from calculator.metrics import metrics
+from calculator.profiling import profiler
 
 class Command(ABC):
     """
@@ -6,6 +11,28 @@ class Command(ABC):
     ensuring they all implement the `execute` method.
     """
 
+    # Pure commands always return the same result for the same arguments and have
+    # no side effects, so CommandHandler may serve them from its result cache.
+    pure = False
+
+    # Number of operands the command takes (e.g. 2 for `add 3 4`). None means the
+    # command is not a calculation and receives whatever follows its name as
+    # strings (e.g. `showhistory last 10`).
+    arity = None
+
+    # Types accepted as operands (a tuple), or None for any. Only checked by
+    # CommandDescriptor.validate, never on the execute path.
+    operand_types = None
+
+    # True if the command has an `execute_batch` method working on NumPy arrays;
+    # set automatically for every subclass unless it declares it itself.
+    vectorized = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'vectorized' not in cls.__dict__:
+            cls.vectorized = callable(getattr(cls, 'execute_batch', None))
+
     @abstractmethod
     def execute(self, *args):
         """
@@ -14,13 +41,87 @@ class Command(ABC):
         """
         pass
 
+
+class CommandDescriptor:
+    """
+    Read-only facts about a registered command, computed once when it is
+    registered, so dispatching and validating never inspect the command again.
+    """
+    __slots__ = ('name', 'command', 'execute', 'arity', 'operand_types', 'pure', 'vectorized')
+
+    def __init__(self, name, command):
+        assign = object.__setattr__
+        assign(self, 'name', name)
+        assign(self, 'command', command)
+        assign(self, 'execute', command.execute)
+        assign(self, 'arity', command.arity)
+        assign(self, 'operand_types', command.operand_types)
+        assign(self, 'pure', bool(command.pure))
+        assign(self, 'vectorized', bool(command.vectorized))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"CommandDescriptor is read-only; cannot set '{name}'.")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"CommandDescriptor is read-only; cannot delete '{name}'.")
+
+    def validate(self, args):
+        """
+        Check arguments against the command's arity and operand types, for input
+        that does not come from the calculator's own number parsing (e.g. JSON).
+        :raises ValueError: If the number or the type of the arguments is wrong.
+        """
+        if self.arity is None:
+            return
+        if len(args) != self.arity:
+            raise ValueError(f"'{self.name}' expects {self.arity} operands, got {len(args)}.")
+        if self.operand_types is not None:
+            for value in args:
+                # The exact-type test covers the usual case without an isinstance walk
+                if type(value) not in self.operand_types and (
+                        isinstance(value, bool) or not isinstance(value, self.operand_types)):
+                    raise ValueError("Invalid input: both values must be numbers.")
+
+    def __repr__(self):
+        return (f"CommandDescriptor({self.name!r}, arity={self.arity!r}, pure={self.pure}, "
+                f"vectorized={self.vectorized})")
+
 class CommandHandler:
     """
     A command handler class to manage and execute commands dynamically.
     """
 
-    def __init__(self):
+    def __init__(self, cache_size=0):
+        """
+        :param cache_size: Maximum number of results of pure commands to memoize.
+                           0 (the default) disables the cache.
+        """
         self.commands = {}
+        self.descriptors = {}  # Command name -> CommandDescriptor
+        self._dispatch = {}    # Command name -> callable that runs it (through the cache if pure)
+        self._cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_evictions = 0
+
+    @property
+    def cache_size(self):
+        return self._cache_size
+
+    @cache_size.setter
+    def cache_size(self, size):
+        self._cache_size = size
+        # Whether pure commands go through the cache is decided per command up front
+        self.refresh_dispatch()
+
+    def refresh_dispatch(self):
+        """
+        Rebuild the dispatch table after a setting it depends on changed
+        (the cache size, or profiling being started or stopped).
+        """
+        for descriptor in self.descriptors.values():
+            self._dispatch[descriptor.name] = self._dispatcher(descriptor)
 
     def register_command(self, name, command):
         """
@@ -28,7 +129,23 @@ class CommandHandler:
         :param name: Command name (string) that can be called by the REPL or other components.
         :param command: An instance of a class inheriting from Command.
         """
+        descriptor = CommandDescriptor(name, command)
         self.commands[name] = command
+        self.descriptors[name] = descriptor
+        self._dispatch[name] = self._dispatcher(descriptor)
+
+    def _dispatcher(self, descriptor):
+        """
+        Return the callable that runs a command: its bound `execute`, or a cached
+        wrapper for pure commands when the result cache is on, timed as a
+        profiler section while profiling.
+        """
+        call = descriptor.execute
+        if self._cache_size and descriptor.pure:
+            call = partial(self._execute_cached, descriptor.name, call)
+        if profiler.active:
+            call = partial(profiler.call, f"command.{descriptor.name}", call)
+        return call
 
     def execute_command(self, name, *args):
         """
@@ -37,8 +154,94 @@ class CommandHandler:
         :param args: Arguments to pass to the command's execute method
         :return: Result of the command execution
         """
-        if name not in self.commands:
+        try:
+            call = self._dispatch[name]
+        except KeyError:
+            raise KeyError(f"Command '{name}' not found.") from None
+        if metrics.enabled:
+            return self._execute_instrumented(name, call, args)
+        return call(*args)
+
+    def _execute_instrumented(self, name, call, args):
+        """
+        Execute a command while recording its call count, errors and latency.
+        """
+        started = time.perf_counter()
+        try:
+            return call(*args)
+        except Exception:
+            metrics.increment('calculator_command_errors_total', command=name)
+            raise
+        finally:
+            metrics.increment('calculator_command_calls_total', command=name)
+            metrics.observe('calculator_command_latency_seconds', time.perf_counter() - started, command=name)
+
+    def _execute_cached(self, name, execute, *args):
+        """
+        Execute a pure command through the LRU result cache.
+        """
+        # Argument types are part of the key so that e.g. add(1, 2) and add(1.0, 2.0)
+        # do not share a cached result of the wrong type
+        key = (name, args, tuple(map(type, args)))
+        try:
+            result = self.cache[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable arguments cannot be cached
+            return execute(*args)
+        else:
+            self.cache.move_to_end(key)
+            self.cache_hits += 1
+            return result
+
+        self.cache_misses += 1
+        result = execute(*args)
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+            self.cache_evictions += 1
+        return result
+
+    def cache_info(self):
+        """
+        Return the result cache counters.
+        :return: Dictionary with hits, misses, evictions, current size and maximum size.
+        """
+        return {
+            'hits': self.cache_hits,
+            'misses': self.cache_misses,
+            'evictions': self.cache_evictions,
+            'size': len(self.cache),
+            'max_size': self.cache_size,
+        }
+
+    def clear_cache(self):
+        """
+        Drop all memoized results and reset the cache counters.
+        """
+        self.cache.clear()
+        self.cache_hits = self.cache_misses = self.cache_evictions = 0
+
+    def execute_batch(self, name, a, b):
+        """
+        Execute a command over whole operand arrays in a single vectorized call.
+        :param name: Command name (string)
+        :param a: Array-like of first operands
+        :param b: Array-like of second operands (same length as a, or a scalar)
+        :return: Tuple of (results, error_mask) as NumPy arrays. Rows flagged in
+                 error_mask (e.g. division by zero) did not produce a valid result.
+        """
+        descriptor = self.descriptors.get(name)
+        if descriptor is None:
             raise KeyError(f"Command '{name}' not found.")
-        
-        command = self.commands[name]
-        return command.execute(*args)
+        if not descriptor.vectorized:
+            raise TypeError(f"Command '{name}' does not support batch execution.")
+
+        import numpy as np  # pylint: disable=import-outside-toplevel  # Only needed for batches
+        try:
+            a = np.asarray(a, dtype=np.float64)
+            b = np.asarray(b, dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            raise ValueError("Invalid input: both operand arrays must be numeric.") from e
+        return descriptor.command.execute_batch(a, b)
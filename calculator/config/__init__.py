@@ -0,0 +1,240 @@
+"""
+Application settings as one typed, read-only Config object.
+
+Values come from, lowest priority first: the defaults in SETTINGS, the config
+file (data/config.env, or the file named by CALC_CONFIG_FILE), the environment
+(which includes .env, loaded by the app at startup) and command-line overrides.
+Only the variables listed in SETTINGS are looked up, rather than copying the
+whole environment, and each value is parsed and validated the first time it is
+read and then cached. An invalid value is logged and replaced by its default,
+so a typo in a tuning knob never stops the calculator from starting.
+
+CalculatorApp installs its Config with `set_config`; subsystems read the shared
+instance with `get_config()`, which builds one from the config file and the
+environment on first use if the app has not.
+"""
+import os
+import logging
+from calculator.numeric import NUMERIC_MODES, DEFAULT_DECIMAL_PRECISION
+
+CONFIG_FILE = 'data/config.env'
+
+def parse_flag(value):
+    """
+    Interpret a setting value as an on/off switch.
+    """
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in ('1', 'true', 'yes', 'on'):
+        return True
+    if text in ('0', 'false', 'no', 'off', ''):
+        return False
+    raise ValueError("expected on/off, true/false, yes/no or 1/0")
+
+def _integer(minimum=0):
+    def parse(value):
+        number = int(value)
+        if number < minimum:
+            raise ValueError(f"must be at least {minimum}")
+        return number
+    return parse
+
+def _number(minimum=0.0, maximum=None):
+    def parse(value):
+        number = float(value)
+        if not minimum <= number <= (maximum if maximum is not None else float('inf')):
+            raise ValueError(f"must be between {minimum} and {maximum}" if maximum is not None
+                             else f"must be at least {minimum}")
+        return number
+    return parse
+
+def _choice(*choices):
+    def parse(value):
+        text = str(value).strip().lower()
+        if text not in choices:
+            raise ValueError(f"must be one of: {', '.join(choices)}")
+        return text
+    return parse
+
+def _text(value):
+    return str(value)
+
+
+class Setting:
+    """
+    One configurable value: its Config attribute, environment variable, parser and default.
+    """
+    __slots__ = ('attribute', 'variable', 'parse', 'default', 'description')
+
+    def __init__(self, attribute, variable, parse, default, description):
+        self.attribute = attribute
+        self.variable = variable
+        self.parse = parse
+        self.default = default
+        self.description = description
+
+
+SETTINGS = (
+    # Logging, metrics and profiling
+    Setting('log_async', 'LOG_ASYNC', parse_flag, True, "Write log records on a background thread."),
+    Setting('log_sample_rate', 'LOG_SAMPLE_RATE', _number(0.0, 1.0), 1.0, "Fraction of calculations logged."),
+    Setting('metrics', 'CALC_METRICS', parse_flag, False, "Collect metrics from startup."),
+    Setting('metrics_file', 'CALC_METRICS_FILE', _text, None, "File a metrics snapshot is written to on exit."),
+    Setting('profile', 'CALC_PROFILE', parse_flag, False, "Profile the session from startup."),
+    # Arithmetic and commands
+    Setting('numeric_mode', 'CALC_NUMERIC_MODE', _choice(*NUMERIC_MODES), 'float',
+            "Numeric mode for operands and results."),
+    Setting('decimal_precision', 'CALC_DECIMAL_PRECISION', _integer(1), DEFAULT_DECIMAL_PRECISION,
+            "Significant digits in decimal mode."),
+    Setting('command_cache_size', 'COMMAND_CACHE_SIZE', _integer(0), 0, "Results of pure commands to cache."),
+    Setting('expression_cache_size', 'EXPRESSION_CACHE_SIZE', _integer(0), 256, "Compiled expressions to cache."),
+    Setting('plugin_manifest', 'CALC_PLUGIN_MANIFEST', _text, 'data/plugin_manifest.json',
+            "Plugin manifest used for lazy plugin loading."),
+    # History
+    Setting('history_backend', 'HISTORY_BACKEND', _choice('csv', 'binary', 'sqlite'), 'csv', "History storage format."),
+    Setting('history_file', 'HISTORY_FILE', _text, None, "History file path (default depends on the backend)."),
+    Setting('history_recent_size', 'HISTORY_RECENT_SIZE', _integer(1), 1000, "Recent entries kept in memory."),
+    Setting('history_buffer_rows', 'HISTORY_BUFFER_ROWS', _integer(1), 1000, "Entries buffered before a write."),
+    Setting('history_flush_interval', 'HISTORY_FLUSH_INTERVAL', _number(0.0), 1.0, "Seconds between buffer flushes."),
+    Setting('history_read_chunk_rows', 'HISTORY_READ_CHUNK_ROWS', _integer(1), 100_000,
+            "Rows per chunk when streaming through the history."),
+    Setting('history_rotate_bytes', 'HISTORY_ROTATE_BYTES', _integer(0), 10 * 1024 * 1024,
+            "Size at which the CSV history is rotated (0 disables)."),
+    Setting('history_rotate_age', 'HISTORY_ROTATE_AGE', _number(0.0), 0.0,
+            "Age in seconds at which the CSV history is rotated (0 disables)."),
+    Setting('history_archive_codec', 'HISTORY_ARCHIVE_CODEC', _choice('gzip', 'lzma', 'none'), 'gzip',
+            "Compression of rotated history segments."),
+    Setting('history_sqlite_pool_size', 'HISTORY_SQLITE_POOL_SIZE', _integer(1), 4, "Pooled SQLite connections."),
+    # Batch, parallel, REPL and server
+    Setting('batch_output_chunk_lines', 'BATCH_OUTPUT_CHUNK_LINES', _integer(1), 10_000,
+            "Output lines written per block in batch mode and the fast REPL."),
+    Setting('workers', 'CALC_WORKERS', _integer(0), None,
+            "Run batches on this many worker processes (0 for one per CPU)."),
+    Setting('shard_lines', 'CALC_SHARD_LINES', _integer(1), 50_000, "Input lines sent to a worker at a time."),
+    Setting('repl_read_chunk_bytes', 'REPL_READ_CHUNK_BYTES', _integer(1), 64 * 1024,
+            "Bytes read from stdin at a time by the fast REPL."),
+    Setting('server_host', 'CALC_SERVER_HOST', _text, '127.0.0.1', "Calculation server address."),
+    Setting('server_port', 'CALC_SERVER_PORT', _integer(0), 8765, "Calculation server port."),
+)
+
+_SETTINGS_BY_ATTRIBUTE = {setting.attribute: setting for setting in SETTINGS}
+_SETTINGS_BY_VARIABLE = {setting.variable: setting for setting in SETTINGS}
+
+def read_config_file(path):
+    """
+    Read `KEY=value` lines from a config file; a missing file gives no values.
+    """
+    if not os.path.exists(path):
+        return {}
+    from dotenv import dotenv_values  # pylint: disable=import-outside-toplevel
+    return {key: value for key, value in dotenv_values(path).items() if value is not None}
+
+
+class Config:
+    """
+    Read-only settings, e.g. `config.history_buffer_rows`. Values are parsed on
+    first access; `get` returns the raw text of any variable, setting or not.
+    """
+    __slots__ = ('_raw', '_values', '_environ')
+
+    def __init__(self, raw=None, environ=None):
+        """
+        :param raw: Variable name -> value, with file, environment and overrides already merged.
+        :param environ: Environment consulted by `get` for variables that are not settings.
+        """
+        object.__setattr__(self, '_raw', dict(raw or {}))
+        object.__setattr__(self, '_values', {})
+        object.__setattr__(self, '_environ', os.environ if environ is None else environ)
+
+    @classmethod
+    def load(cls, overrides=None, path=None, environ=None):
+        """
+        Collect settings from the config file, the environment and overrides.
+        :param overrides: Variable name -> value (e.g. from command-line flags); None values are skipped.
+        :param path: Config file; defaults to CALC_CONFIG_FILE or data/config.env.
+        """
+        environ = os.environ if environ is None else environ
+        raw = read_config_file(path or environ.get('CALC_CONFIG_FILE', CONFIG_FILE))
+        for variable in _SETTINGS_BY_VARIABLE:
+            value = environ.get(variable)
+            if value is not None:
+                raw[variable] = value
+        for variable, value in (overrides or {}).items():
+            if value is not None:
+                raw[variable] = value
+        return cls(raw, environ)
+
+    def __getattr__(self, name):
+        setting = _SETTINGS_BY_ATTRIBUTE.get(name)
+        if setting is None:
+            raise AttributeError(f"Unknown setting: '{name}'")
+        values = self._values
+        try:
+            return values[name]
+        except KeyError:
+            pass
+        value = setting.default
+        raw = self._raw.get(setting.variable)
+        if raw is not None and raw != '':
+            try:
+                value = setting.parse(raw)
+            except (TypeError, ValueError) as e:
+                logging.warning("Ignoring invalid %s: '%s' (%s); using %r.", setting.variable, raw, e, setting.default)
+        values[name] = value
+        return value
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"Config is read-only; cannot set '{name}'.")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"Config is read-only; cannot delete '{name}'.")
+
+    def get(self, variable, default=None):
+        """
+        Return the raw value of a variable. Variables that are not settings are
+        looked up in the environment on demand, then in the config file.
+        """
+        if variable in _SETTINGS_BY_VARIABLE:
+            value = self._raw.get(variable)
+        else:
+            value = self._environ.get(variable, self._raw.get(variable))
+        return default if value is None else value
+
+    def replace(self, **overrides):
+        """
+        Return a new Config with some variables overridden, e.g. `replace(HISTORY_BACKEND='sqlite')`.
+        """
+        raw = dict(self._raw)
+        raw.update((variable, value) for variable, value in overrides.items() if value is not None)
+        return Config(raw, self._environ)
+
+    def as_dict(self):
+        """
+        Return every setting by attribute name, parsing (and so validating) them all.
+        """
+        return {setting.attribute: getattr(self, setting.attribute) for setting in SETTINGS}
+
+    def __repr__(self):
+        explicit = ', '.join(f"{setting.attribute}={getattr(self, setting.attribute)!r}"
+                             for setting in SETTINGS if setting.variable in self._raw)
+        return f"Config({explicit})"
+
+
+_config = None
+
+def get_config():
+    """
+    Return the shared Config, loading it from the config file and environment on first use.
+    """
+    global _config  # pylint: disable=global-statement
+    if _config is None:
+        _config = Config.load()
+    return _config
+
+def set_config(config):
+    """
+    Make `config` the shared Config.
+    """
+    global _config  # pylint: disable=global-statement
+    _config = config
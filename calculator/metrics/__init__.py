@@ -0,0 +1,180 @@
+"""
+In-process metrics: counters and latency histograms for command execution,
+history I/O and plugin loading.
+
+Instrumented code checks `metrics.enabled` before doing any timing, so when
+metrics are disabled (the default) the only cost is that attribute check.
+Enable them with CALC_METRICS=1 or the `stats on` command.
+"""
+import os
+import json
+import time
+from bisect import bisect_left
+from calculator.config import get_config
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1.0, 5.0)
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus style.
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is the +Inf bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        Record one observation.
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative_counts(self):
+        """
+        Return (upper bound, cumulative count) pairs, ending with +Inf.
+        """
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+
+class Metrics:
+    """
+    Registry of named counters and histograms, each keyed by a set of labels.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.counters = {}
+        self.histograms = {}
+        self.descriptions = {}
+
+    def increment(self, name, amount=1, **labels):
+        """
+        Add `amount` to a counter.
+        """
+        series = self.counters.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        """
+        Record a value (e.g. a latency in seconds) in a histogram.
+        """
+        series = self.histograms.setdefault(name, {})
+        key = tuple(sorted(labels.items()))
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+    def timer(self, name, **labels):
+        """
+        Return a context manager that observes the time spent in its block.
+        """
+        return _Timer(self, name, labels)
+
+    def reset(self):
+        """
+        Drop all recorded values.
+        """
+        self.counters.clear()
+        self.histograms.clear()
+
+    def snapshot(self):
+        """
+        Return all metrics as plain data, suitable for JSON.
+        """
+        return {
+            'counters': {
+                name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                for name, series in sorted(self.counters.items())
+            },
+            'histograms': {
+                name: [{
+                    'labels': dict(key),
+                    'count': histogram.count,
+                    'sum': histogram.sum,
+                    'buckets': {_format_bound(bound): count for bound, count in histogram.cumulative_counts()},
+                } for key, histogram in series.items()]
+                for name, series in sorted(self.histograms.items())
+            },
+        }
+
+    def to_json(self):
+        """
+        Return the snapshot as a JSON string.
+        """
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self):
+        """
+        Return the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(self.histograms.items()):
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in sorted(series.items()):
+                for bound, count in histogram.cumulative_counts():
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_bound(bound)),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """
+        Write a snapshot to a file: JSON if the path ends in '.json', Prometheus text otherwise.
+        """
+        content = self.to_json() if path.endswith('.json') else self.to_prometheus()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+
+class _Timer:
+    """
+    Context manager returned by Metrics.timer.
+    """
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.started = 0.0
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.registry.observe(self.name, time.perf_counter() - self.started, **self.labels)
+
+
+def _format_labels(key):
+    """
+    Format a label tuple as {name="value",...}.
+    """
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in key) + "}"
+
+def _format_bound(bound):
+    """
+    Format a bucket upper bound.
+    """
+    return "+Inf" if bound == float('inf') else repr(bound)
+
+
+# The application-wide registry
+metrics = Metrics(enabled=get_config().metrics)
@@ -0,0 +1,118 @@
+"""
+Numeric modes: how operands typed by the user are turned into numbers.
+
+    float     binary floating point (the default, fastest)
+    decimal   decimal.Decimal, rounded to a configurable number of significant digits
+    fraction  fractions.Fraction, exact rational arithmetic
+
+The mode is chosen with CALC_NUMERIC_MODE / CALC_DECIMAL_PRECISION, the --mode
+and --precision command-line flags, or the `mode` command. Operands are parsed
+from their text, so 0.1 in decimal or fraction mode is exactly one tenth.
+"""
+import math
+import decimal
+from decimal import Decimal
+from fractions import Fraction
+
+NUMERIC_MODES = ('float', 'decimal', 'fraction')
+DEFAULT_DECIMAL_PRECISION = 28
+
+# Operand types the arithmetic commands accept (bool is excluded separately)
+NUMBER_TYPES = (float, int, Decimal, Fraction)
+
+class NumericMode:
+    """
+    A numeric mode and, for decimal mode, its precision context.
+    """
+    def __init__(self, name='float', precision=None):
+        if name not in NUMERIC_MODES:
+            raise ValueError(f"Unknown numeric mode: '{name}'. Choose from {', '.join(NUMERIC_MODES)}.")
+        precision = DEFAULT_DECIMAL_PRECISION if precision is None else int(precision)
+        if precision < 1:
+            raise ValueError("Decimal precision must be at least 1.")
+        self.name = name
+        self.precision = precision
+        self.context = decimal.Context(prec=precision)
+        # The builtin float() itself in float mode, so that mode costs nothing extra
+        self.parse = float if name == 'float' else getattr(self, f'_parse_{name}')
+
+    def activate(self):
+        """
+        Make this mode's decimal context the current one for this thread.
+        """
+        decimal.setcontext(self.context)
+
+    @staticmethod
+    def _parse_decimal(text):
+        try:
+            return Decimal(str(text).strip())
+        except decimal.InvalidOperation:
+            raise ValueError(f"could not convert string to Decimal: '{text}'") from None
+
+    @staticmethod
+    def _parse_fraction(text):
+        return Fraction(str(text).strip())
+
+    def __repr__(self):
+        if self.name == 'decimal':
+            return f"NumericMode('decimal', precision={self.precision})"
+        return f"NumericMode({self.name!r})"
+
+
+def to_decimal(value):
+    """
+    Convert a number to Decimal; floats go through their shortest repr, so 0.1 becomes Decimal('0.1').
+    """
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, Fraction):
+        return Decimal(value.numerator) / Decimal(value.denominator)
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    return Decimal(value)
+
+def to_float(value):
+    """
+    Convert a number to float; exact values too large for a float (e.g. Fraction(10**400))
+    become infinity instead of raising OverflowError.
+    """
+    try:
+        return float(value)
+    except OverflowError:
+        return math.inf if value > 0 else -math.inf
+
+def exact_operands(a, b):
+    """
+    Bring a pair of operands that Python cannot combine directly (e.g. Decimal
+    and float, or Decimal and Fraction) to one exact type.
+    :raises ValueError: If an operand is not a real number.
+    """
+    for value in (a, b):
+        if isinstance(value, bool) or not isinstance(value, NUMBER_TYPES):
+            raise ValueError("Invalid input: both values must be numbers.")
+    if isinstance(a, Decimal) or isinstance(b, Decimal):
+        return to_decimal(a), to_decimal(b)
+    if isinstance(a, Fraction) or isinstance(b, Fraction):
+        return Fraction(a), Fraction(b)
+    return a, b
+
+
+_mode = NumericMode()
+
+def get_numeric_mode():
+    """
+    Return the current numeric mode.
+    """
+    return _mode
+
+def set_numeric_mode(name, precision=None):
+    """
+    Switch the numeric mode for the application.
+    :return: The new NumericMode.
+    :raises ValueError: For an unknown mode or an invalid precision.
+    """
+    global _mode  # pylint: disable=global-statement
+    mode = NumericMode(name, precision)
+    mode.activate()
+    _mode = mode
+    return mode
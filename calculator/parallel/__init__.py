@@ -0,0 +1,133 @@
+"""
+Parallel batch engine: shards a batch input across a process pool.
+
+Each worker process loads the plugins once into its own CommandHandler and runs
+shards of input lines through the batch pipeline. Results are written in input
+order, and history entries are sent back to the parent, which is the only process
+that writes to the history file. Commands without operands (clearhistory,
+importhistory, mode, ...) would act on a worker's own state rather than the
+user's, so in a parallel batch they are answered with an error line instead.
+"""
+import os
+import time
+import logging
+from itertools import islice
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from calculator.batch import open_source, open_output, parse_operations, execute_operations, write_chunks
+from calculator.commands import CommandHandler
+from calculator.config import get_config
+from calculator.plugins import PluginManager
+from calculator.numeric import get_numeric_mode, set_numeric_mode
+
+# Set up once per worker process by _init_worker
+_worker_command_handler = None
+
+class _HistoryCollector:
+    """
+    Stands in for HistoryManager inside workers, collecting entries to send back.
+    """
+    def __init__(self):
+        self.entries = []
+
+    def save_to_history(self, operation, operand1, operand2, result):
+        self.entries.append((operation, operand1, operand2, result))
+
+def _init_worker(numeric_mode='float', precision=None):
+    """
+    Load plugins once per worker process and switch to the parent's numeric mode.
+    """
+    global _worker_command_handler  # pylint: disable=global-statement
+    set_numeric_mode(numeric_mode, precision)
+    _worker_command_handler = CommandHandler()
+    PluginManager(_worker_command_handler).load_plugins()
+
+def _run_shard(shard):
+    """
+    Execute one shard of input lines in a worker.
+    :param shard: Tuple of (first_line_number, lines).
+    :return: Tuple of (output lines, history entries).
+    """
+    first_line_number, lines = shard
+    history = _HistoryCollector()
+    operations = parse_operations(lines, first_line_number)
+    outputs = list(execute_operations(_worker_command_handler, operations, history, calculations_only=True))
+    return outputs, history.entries
+
+def _shards(lines, shard_lines):
+    """
+    Split an input stream into (first_line_number, lines) shards.
+    """
+    line_number = 1
+    while True:
+        shard = list(islice(lines, shard_lines))
+        if not shard:
+            return
+        yield line_number, shard
+        line_number += len(shard)
+
+
+class ParallelEngine:
+    """
+    Runs batch inputs across a pool of worker processes.
+    """
+    def __init__(self, workers=None, shard_lines=None):
+        """
+        :param workers: Number of worker processes; defaults to the CPU count.
+        :param shard_lines: Number of input lines sent to a worker at a time;
+            defaults to the CALC_SHARD_LINES setting.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.shard_lines = shard_lines or get_config().shard_lines
+
+    def run(self, source, destination=None, history_manager=None):
+        """
+        Run a batch input in parallel.
+        :param source: Path of the input file, or '-' for stdin.
+        :param destination: Path of the output file, or None/'-' for stdout.
+        :param history_manager: If given, successful calculations are saved to history.
+        :return: Dictionary with operations, seconds, operations_per_second and workers.
+        """
+        started = time.perf_counter()
+        mode = get_numeric_mode()
+        with open_source(source) as lines, open_output(destination) as output, \
+                ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                    initargs=(mode.name, mode.precision)) as executor:
+            outputs = self._ordered_results(executor, _shards(lines, self.shard_lines), history_manager)
+            count = write_chunks(outputs, output)
+        elapsed = time.perf_counter() - started
+
+        stats = {
+            'operations': count,
+            'seconds': elapsed,
+            'operations_per_second': count / elapsed if elapsed else 0.0,
+            'workers': self.workers,
+        }
+        logging.info("Parallel batch finished: %s operations in %.3fs (%.0f ops/s on %s workers).",
+                     count, elapsed, stats['operations_per_second'], self.workers)
+        return stats
+
+    def _ordered_results(self, executor, shards, history_manager):
+        """
+        Submit shards while keeping a bounded number in flight, yielding output
+        lines in input order and saving history entries in the same order.
+        """
+        in_flight = deque()
+        max_in_flight = self.workers * 2
+        for shard in shards:
+            in_flight.append(executor.submit(_run_shard, shard))
+            if len(in_flight) >= max_in_flight:
+                yield from self._collect(in_flight.popleft(), history_manager)
+        while in_flight:
+            yield from self._collect(in_flight.popleft(), history_manager)
+
+    @staticmethod
+    def _collect(future, history_manager):
+        """
+        Wait for one shard, save its history entries and yield its output lines.
+        """
+        outputs, entries = future.result()
+        if history_manager is not None:
+            for entry in entries:
+                history_manager.save_to_history(*entry)
+        yield from outputs
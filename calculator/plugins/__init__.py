@@ -1,26 +1,139 @@
 import os
+import json
+import time
+import hashlib
 import pkgutil
 import importlib
 import logging
 import inspect
 from calculator.commands import Command
+from calculator.config import get_config
+from calculator.metrics import metrics
+from calculator.profiling import profiler
+
+class LazyCommand(Command):
+    """
+    Placeholder registered for a command whose plugin module has not been imported yet.
+    On first use it imports the module, instantiates the real command and replaces
+    itself in the command handler, so later calls go straight to the real command.
+    Its metadata (purity, arity, operand types, vectorized) comes from the manifest,
+    so the command handler can describe it without importing anything.
+    """
+    def __init__(self, plugin_manager, command_name, module_name, class_name, pure=False, arity=None,
+                 operand_types=None, vectorized=False, dependencies=None):
+        self._command = None
+        self.plugin_manager = plugin_manager
+        self.command_name = command_name
+        self.module_name = module_name
+        self.class_name = class_name
+        self.pure = pure
+        self.arity = arity
+        self.operand_types = operand_types
+        self.vectorized = vectorized
+        self.dependencies = dependencies
+
+    def load(self):
+        """
+        Import and instantiate the real command.
+        """
+        if self._command is None:
+            started = time.perf_counter()
+            with profiler.section('plugins.import'):
+                command_class = getattr(importlib.import_module(self.module_name), self.class_name)
+                self._command = self.plugin_manager.instantiate_command(command_class, self.dependencies)
+            self.plugin_manager.command_handler.register_command(self.command_name, self._command)
+            if metrics.enabled:
+                metrics.observe('calculator_plugin_import_seconds', time.perf_counter() - started, module=self.module_name)
+            logging.info("Command '%s' loaded from '%s'.", self.command_name, self.module_name)
+        return self._command
+
+    def execute(self, *args):
+        return self.load().execute(*args)
+
+    def __getattr__(self, name):
+        # Anything else (e.g. execute_batch) is looked up on the real command
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+
+def _type_names(types):
+    """
+    Return the qualified names of operand types, for the manifest.
+    """
+    if types is None:
+        return None
+    return [f"{operand_type.__module__}.{operand_type.__qualname__}" for operand_type in types]
+
+_resolved_types = {}  # Tuple of qualified names -> tuple of types, shared by commands with the same types
+
+def _resolve_types(names):
+    """
+    Turn qualified type names from the manifest back into a tuple of types.
+    """
+    if names is None:
+        return None
+    key = tuple(names)
+    types = _resolved_types.get(key)
+    if types is None:
+        try:
+            types = tuple(getattr(importlib.import_module(module), name)
+                          for module, name in (qualified.rsplit('.', 1) for qualified in names))
+        except (ImportError, AttributeError, ValueError) as e:
+            logging.warning("Ignoring unknown operand types %s in the plugin manifest: %s", names, e)
+            return None
+        _resolved_types[key] = types
+    return types
+
 
 class PluginManager:
-    def __init__(self, command_handler):
+    def __init__(self, command_handler, manifest_path=None, history_manager=None):
         self.command_handler = command_handler
+        # Shared history subsystem handed to commands that take a 'history_manager'
+        self.history_manager = history_manager
         self.plugins_package = 'calculator.plugins'
         self.plugins_path = self.plugins_package.replace('.', '/')
+        # Cache of discovered commands, so plugins can be imported lazily on later runs
+        self.manifest_path = manifest_path or get_config().plugin_manifest
+        self.manifest = {}
 
     def load_plugins(self):
         """
         Dynamically load all available plugins from the app.plugins directory.
         Plugins must be packages (subdirectories) containing a __init__.py file.
+
+        If the plugin manifest matches the current plugin files, commands are
+        registered from it without importing any plugin module; each module is
+        imported the first time one of its commands runs. Otherwise the plugins are
+        imported, registered and the manifest is rewritten.
         """
         if not os.path.exists(self.plugins_path):
-            logging.warning(f"Plugins directory '{self.plugins_path}' not found.")
+            logging.warning("Plugins directory '%s' not found.", self.plugins_path)
             return
 
-        logging.info(f"Loading plugins from '{self.plugins_path}'...")
+        started = time.perf_counter()
+        with profiler.section('plugins.load'):
+            fingerprint = self.plugins_fingerprint()
+            manifest = self.read_manifest()
+            if manifest is not None and manifest.get('fingerprint') == fingerprint:
+                self.register_from_manifest(manifest)
+                source = "manifest"
+            else:
+                self.discover_plugins()
+                self.write_manifest(fingerprint)
+                source = "plugin modules"
+        elapsed = time.perf_counter() - started
+        if metrics.enabled:
+            metrics.observe('calculator_plugin_load_seconds', elapsed, source=source)
+        elapsed_ms = elapsed * 1000
+        logging.info("Plugins loaded from %s in %.1f ms.", source, elapsed_ms)
+
+    def discover_plugins(self):
+        """
+        Import every plugin package and register its commands.
+        """
+        logging.info("Loading plugins from '%s'...", self.plugins_path)
+        self.manifest = {}
 
         # Iterate over all modules in the plugins path
         for _, plugin_name, is_pkg in pkgutil.iter_modules([self.plugins_path]):
@@ -29,30 +142,100 @@ class PluginManager:
                     plugin_module = importlib.import_module(f'{self.plugins_package}.{plugin_name}')
                     self.register_plugin_commands(plugin_module, plugin_name)
                 except ImportError as e:
-                    logging.error(f"Error importing plugin '{plugin_name}': {e}")
+                    logging.error("Error importing plugin '%s': %s", plugin_name, e)
+
+    @staticmethod
+    def command_dependencies(command_class):
+        """
+        Return which of 'command_handler' and 'history_manager' a command's constructor takes.
+        This is the only place the constructor is inspected; the result is kept in the manifest.
+        """
+        parameters = inspect.signature(command_class.__init__).parameters
+        return [name for name in ('command_handler', 'history_manager') if name in parameters]
+
+    def instantiate_command(self, command_class, dependencies=None):
+        """
+        Create a command instance, passing the 'command_handler' and/or the shared
+        'history_manager' if its constructor takes them.
+        :param dependencies: Names from command_dependencies(), if already known.
+        """
+        if dependencies is None:
+            dependencies = self.command_dependencies(command_class)
+        available = {'command_handler': self.command_handler, 'history_manager': self.history_manager}
+        return command_class(**{name: available[name] for name in dependencies if available[name] is not None})
 
     def register_plugin_commands(self, plugin_module, plugin_name):
         """
         Register all command classes in a plugin module with the command handler.
         Each command should be registered under its specific name (e.g., 'add', 'subtract').
-        If the command requires a 'command_handler' or other parameters, we pass them.
+        If the command requires a 'command_handler' or 'history_manager', we pass them.
         """
         for item_name in dir(plugin_module):
             item = getattr(plugin_module, item_name)
             if isinstance(item, type) and issubclass(item, Command) and item is not Command:
-                # Use inspect to check the constructor's parameters
-                init_signature = inspect.signature(item.__init__)
-                
-                if 'command_handler' in init_signature.parameters:
-                    # Pass 'command_handler' when instantiating the command
-                    command_instance = item(self.command_handler)
-                else:
-                    # Instantiate the command without additional arguments
-                    command_instance = item()
-                
+                dependencies = self.command_dependencies(item)
+                command_instance = self.instantiate_command(item, dependencies)
+
                 # Register the command using the class name (e.g., 'AddCommand' -> 'add')
                 command_name = item_name.replace('Command', '').lower()
                 self.command_handler.register_command(command_name, command_instance)
-                logging.info(f"Command '{command_name}' from plugin '{plugin_name}' registered.")
+                self.manifest[command_name] = {
+                    'module': item.__module__,
+                    'class': item.__name__,
+                    'pure': item.pure,
+                    'arity': item.arity,
+                    'operand_types': _type_names(item.operand_types),
+                    'vectorized': item.vectorized,
+                    'dependencies': dependencies,
+                }
+                logging.info("Command '%s' from plugin '%s' registered.", command_name, plugin_name)
+
+        logging.info("Successfully loaded '%s' plugin.", plugin_name)
+
+    def register_from_manifest(self, manifest):
+        """
+        Register a LazyCommand for every command listed in the manifest.
+        """
+        self.manifest = manifest['commands']
+        for command_name, entry in self.manifest.items():
+            self.command_handler.register_command(
+                command_name,
+                LazyCommand(self, command_name, entry['module'], entry['class'], entry['pure'], entry.get('arity'),
+                            _resolve_types(entry.get('operand_types')), entry.get('vectorized', False),
+                            entry.get('dependencies')),
+            )
 
-        logging.info(f"Successfully loaded '{plugin_name}' plugin.")
+    def plugins_fingerprint(self):
+        """
+        Hash the names, sizes and modification times of all plugin source files.
+        Any added, removed or edited plugin file changes the fingerprint.
+        """
+        digest = hashlib.sha1()
+        for root, dirs, files in os.walk(self.plugins_path):
+            dirs[:] = sorted(d for d in dirs if d != '__pycache__')
+            for file_name in sorted(files):
+                if file_name.endswith('.py'):
+                    stat = os.stat(os.path.join(root, file_name))
+                    digest.update(f"{root}/{file_name}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+        return digest.hexdigest()
+
+    def read_manifest(self):
+        """
+        Read the plugin manifest, returning None if it is missing or unreadable.
+        """
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_manifest(self, fingerprint):
+        """
+        Save the commands discovered in this run together with the plugins fingerprint.
+        """
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path) or '.', exist_ok=True)
+            with open(self.manifest_path, 'w', encoding='utf-8') as f:
+                json.dump({'fingerprint': fingerprint, 'commands': self.manifest}, f, indent=2)
+        except OSError as e:
+            logging.warning("Could not write plugin manifest '%s': %s", self.manifest_path, e)
@@ -1,30 +1,114 @@
+"""
+Arithmetic commands.
+
+Operands may be floats, ints, Decimals or Fractions (see calculator.numeric).
+The scalar path applies the operator directly, so each operand type uses its
+own implementation (float.__add__, Decimal.__add__, ...) with no per-call
+type checks; only pairs Python cannot combine (Decimal with float or Fraction)
+take the slower path that converts them to one exact type first. Decimal
+signals such as InvalidOperation (`inf - inf`) and Overflow are reported as
+ValueErrors, like any other invalid calculation. Exact powers (int or Fraction
+base, integral exponent) are refused up front when the result would have more
+digits than Python turns into text, just as float powers refuse to overflow.
+"""
+import math
+import decimal
+import operator
+from fractions import Fraction
+import numpy as np
 from calculator.commands import Command
+from calculator.numeric import NUMBER_TYPES, exact_operands
+
+# Decimal signals trapped by default, other than DivisionByZero (already a ZeroDivisionError)
+_DECIMAL_ERRORS = (decimal.InvalidOperation, decimal.Overflow)
+
+# Python's default limit on the digits of an int converted to text (sys.set_int_max_str_digits)
+MAX_EXACT_DIGITS = 4300
+
+def _mixed(function, a, b):
+    """
+    Apply `function` to operands of different exact types, e.g. Decimal and Fraction.
+    :raises ValueError: If an operand is not a number.
+    """
+    a, b = exact_operands(a, b)
+    try:
+        return function(a, b)
+    except _DECIMAL_ERRORS as e:
+        raise _decimal_error(e) from None
+
+def _decimal_error(error):
+    """
+    Return the ValueError reported for a decimal signal.
+    """
+    if isinstance(error, decimal.Overflow):
+        return ValueError("Result is too large.")
+    return ValueError("Result is undefined.")
 
 class AddCommand(Command):
+    pure = True
+    arity = 2
+    operand_types = NUMBER_TYPES
+
     def execute(self, a, b):
         try:
             return a + b
-        except TypeError as e:
-            print(f"Error: {e}")
-            raise ValueError("Invalid input: both values must be numbers.")
+        except TypeError:
+            return _mixed(operator.add, a, b)
+        except _DECIMAL_ERRORS as e:
+            raise _decimal_error(e) from None
+
+    def execute_batch(self, a, b):
+        """
+        Add two operand arrays element-wise.
+        :return: Tuple of (results, error_mask); addition never fails per element.
+        """
+        return np.add(a, b), np.zeros(np.broadcast(a, b).shape, dtype=bool)
 
 class SubtractCommand(Command):
+    pure = True
+    arity = 2
+    operand_types = NUMBER_TYPES
+
     def execute(self, a, b):
         try:
             return a - b
-        except TypeError as e:
-            print(f"Error: {e}")
-            raise ValueError("Invalid input: both values must be numbers.")
+        except TypeError:
+            return _mixed(operator.sub, a, b)
+        except _DECIMAL_ERRORS as e:
+            raise _decimal_error(e) from None
+
+    def execute_batch(self, a, b):
+        """
+        Subtract two operand arrays element-wise.
+        :return: Tuple of (results, error_mask); subtraction never fails per element.
+        """
+        return np.subtract(a, b), np.zeros(np.broadcast(a, b).shape, dtype=bool)
 
 class MultiplyCommand(Command):
+    pure = True
+    arity = 2
+    operand_types = NUMBER_TYPES
+
     def execute(self, a, b):
         try:
             return a * b
-        except TypeError as e:
-            print(f"Error: {e}")
-            raise ValueError("Invalid input: both values must be numbers.")
+        except TypeError:
+            return _mixed(operator.mul, a, b)
+        except _DECIMAL_ERRORS as e:
+            raise _decimal_error(e) from None
+
+    def execute_batch(self, a, b):
+        """
+        Multiply two operand arrays element-wise.
+        :return: Tuple of (results, error_mask); multiplication never fails per element.
+        """
+        return np.multiply(a, b), np.zeros(np.broadcast(a, b).shape, dtype=bool)
 
 class DivideCommand(Command):
+    pure = True
+    arity = 2
+    operand_types = NUMBER_TYPES
+
     def execute(self, a, b):
         try:
             if b == 0:
@@ -32,6 +116,94 @@ class DivideCommand(Command):
                 print(f"Error: {error_message}")
                 raise ZeroDivisionError(error_message)
             return a / b
-        except TypeError as e:
-            print(f"Error: {e}")
-            raise ValueError("Invalid input: both values must be numbers.")
+        except TypeError:
+            return _mixed(operator.truediv, a, b)
+        except _DECIMAL_ERRORS as e:
+            raise _decimal_error(e) from None
+
+    def execute_batch(self, a, b):
+        """
+        Divide two operand arrays element-wise.
+        Rows with a zero divisor are not raised; they are flagged in the error mask
+        and their result is NaN.
+        :return: Tuple of (results, error_mask)
+        """
+        a, b = np.broadcast_arrays(a, b)
+        zero_mask = b == 0
+        results = np.full(a.shape, np.nan)
+        np.divide(a, b, out=results, where=~zero_mask)
+        return results, zero_mask
+
+class PowerCommand(Command):
+    pure = True
+    arity = 2
+    operand_types = NUMBER_TYPES
+
+    def execute(self, a, b):
+        _check_exact_power(a, b)
+        try:
+            result = a ** b
+        except TypeError:
+            result = _mixed(operator.pow, a, b)
+        except _DECIMAL_ERRORS as e:
+            raise _decimal_error(e) from None
+        except OverflowError:
+            raise ValueError("Result is too large.") from None
+        if isinstance(result, complex):
+            raise ValueError("Result is not a real number.")
+        return result
+
+    def execute_batch(self, a, b):
+        """
+        Raise one operand array to the power of the other element-wise.
+        Rows whose result is not a finite real number (e.g. a negative base with a
+        fractional exponent) are flagged in the error mask and their result is NaN.
+        :return: Tuple of (results, error_mask)
+        """
+        with np.errstate(all='ignore'):
+            results = np.power(np.asarray(a, dtype=np.float64), b)
+        error_mask = ~np.isfinite(results)
+        return np.where(error_mask, np.nan, results), error_mask
+
+def _check_exact_power(a, b):
+    """
+    Refuse an exact power whose result would have more than MAX_EXACT_DIGITS
+    digits before computing it, since e.g. 7 ** 3000000 takes seconds.
+    :raises ValueError: If the result is too large.
+    """
+    if type(a) not in (int, Fraction) or type(b) not in (int, Fraction):
+        return
+    if type(b) is Fraction and b.denominator != 1:
+        return  # A fractional exponent gives a float result
+    base = Fraction(a)
+    # Digits of the larger of the result's numerator and denominator, less one
+    largest = max(abs(base.numerator), base.denominator)
+    if abs(b) * math.log10(largest) >= MAX_EXACT_DIGITS:
+        raise ValueError("Result is too large.")
+
+class ModuloCommand(Command):
+    pure = True
+    arity = 2
+    operand_types = NUMBER_TYPES
+
+    def execute(self, a, b):
+        try:
+            if b == 0:
+                raise ZeroDivisionError("Cannot take the modulo by zero.")
+            return a % b
+        except TypeError:
+            return _mixed(operator.mod, a, b)
+        except _DECIMAL_ERRORS as e:
+            raise _decimal_error(e) from None
+
+    def execute_batch(self, a, b):
+        """
+        Take the modulo of two operand arrays element-wise.
+        Rows with a zero divisor are flagged in the error mask and their result is NaN.
+        :return: Tuple of (results, error_mask)
+        """
+        a, b = np.broadcast_arrays(a, b)
+        zero_mask = b == 0
+        results = np.full(a.shape, np.nan)
+        np.mod(a, b, out=results, where=~zero_mask)
+        return results, zero_mask
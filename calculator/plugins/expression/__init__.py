@@ -0,0 +1,262 @@
+"""
+The `eval` command: evaluates arithmetic expressions such as `(a+b)*c/d a=1 b=2 c=3 d=4`.
+
+Expressions are parsed with the `ast` module and only a small whitelist of
+nodes is accepted (numbers, variables, + - * / ** %, unary minus and calls).
+Each accepted tree is compiled once into nested closures and kept in a bounded
+LRU cache keyed by the expression text, so repeated expressions skip parsing.
+Numbers are parsed from their source text in the current numeric mode (see
+calculator.numeric), so `0.1` is exact in decimal and fraction mode; vector
+inputs are always evaluated as float64 arrays.
+
+Operators do not compute anything themselves: they are looked up in the
+CommandHandler (`+` runs the 'add' command, `/` runs 'divide', ...), and a call
+such as `power(a, 2)` runs the registered 'power' command, so commands added by
+plugins are usable inside expressions too. Only calculation commands (those
+with a fixed number of operands) can be called; a call to anything else, such
+as `clearhistory()`, is rejected when the expression is compiled.
+Expressions longer than MAX_EXPRESSION_LENGTH characters or nested deeper than
+MAX_EXPRESSION_DEPTH levels are rejected too, before they can exhaust the stack.
+"""
+import ast
+import re
+import logging
+from collections import OrderedDict
+from calculator.commands import Command
+from calculator.config import get_config
+from calculator.numeric import get_numeric_mode
+
+# Operator node -> name of the command that implements it
+BINARY_OPERATORS = {
+    ast.Add: 'add',
+    ast.Sub: 'subtract',
+    ast.Mult: 'multiply',
+    ast.Div: 'divide',
+    ast.Pow: 'power',
+    ast.Mod: 'modulo',
+}
+
+# Limits on the expression text and on the depth of its tree; the compiled closures
+# call each other once per level, so the depth bounds the stack used when they run
+MAX_EXPRESSION_LENGTH = 10_000
+MAX_EXPRESSION_DEPTH = 200
+
+_ASSIGNMENT_PATTERN = re.compile(r'^([a-z_]\w*)=(.+)$', re.IGNORECASE)
+
+class CompiledExpression:
+    """
+    An expression compiled into a tree of closures. The same tree runs on plain
+    numbers (one command call per operator) or on NumPy arrays (one vectorized
+    `execute_batch` call per operator).
+    """
+    def __init__(self, text, root, variables):
+        self.text = text
+        self.variables = variables  # Sorted tuple of variable names used
+        self._root = root
+
+    def evaluate(self, command_handler, values=None):
+        """
+        Evaluate with scalar variable values.
+        :param values: Mapping of variable name to number.
+        :return: The result of the expression.
+        """
+        def apply(name, args):
+            _check_call(command_handler.descriptors, name, len(args))
+            return command_handler.execute_command(name, *args)
+        return self._root(self._bind(values), apply)
+
+    def evaluate_batch(self, command_handler, columns=None):
+        """
+        Evaluate over NumPy column vectors (scalars are broadcast).
+        :param columns: Mapping of variable name to array-like or number.
+        :return: Tuple of (results, error_mask). Rows where any step failed
+                 (e.g. division by zero) are flagged and their result is NaN.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel  # Only needed for vectors
+        errors = []
+
+        def apply(name, args):
+            _check_call(command_handler.descriptors, name, len(args))
+            if len(args) != 2:
+                raise ValueError(f"'{name}' takes {len(args)} arguments; only two-operand commands can be vectorized.")
+            try:
+                results, error_mask = command_handler.execute_batch(name, *args)
+            except KeyError:
+                raise ValueError(f"Unknown operator or function: '{name}'") from None
+            except TypeError as e:
+                raise ValueError(str(e)) from None
+            errors.append(error_mask)
+            return results
+
+        results = np.asarray(self._root(self._bind(columns), apply), dtype=np.float64)
+        error_mask = np.zeros(results.shape, dtype=bool)
+        for mask in errors:
+            error_mask |= np.broadcast_to(mask, results.shape)
+        if error_mask.any():
+            results = np.where(error_mask, np.nan, results)
+        return results, error_mask
+
+    def _bind(self, values):
+        """
+        Check that every variable has a value.
+        """
+        values = values or {}
+        missing = [name for name in self.variables if name not in values]
+        if missing:
+            raise ValueError(f"No value given for: {', '.join(missing)}")
+        return values
+
+
+def _check_call(descriptors, name, argument_count):
+    """
+    Check that `name` is a calculation command taking `argument_count` operands.
+    :param descriptors: Command name -> CommandDescriptor, from the CommandHandler.
+    :raises ValueError: For an unknown command, one without operands or a wrong argument count.
+    """
+    descriptor = descriptors.get(name)
+    if descriptor is None:
+        raise ValueError(f"Unknown operator or function: '{name}'")
+    if descriptor.arity is None:
+        raise ValueError(f"'{name}' cannot be used in an expression.")
+    if argument_count != descriptor.arity:
+        raise ValueError(f"'{name}' takes {descriptor.arity} arguments, got {argument_count}.")
+
+def compile_expression(text, parse_number=float, descriptors=None):
+    """
+    Parse and compile an expression.
+    :param parse_number: Function turning the text of a number literal into a number.
+    :param descriptors: Command name -> CommandDescriptor; if given, function calls
+        are checked against them here rather than when the expression runs.
+    :raises ValueError: If the text is not a supported arithmetic expression, or is
+        too long or too deeply nested.
+    """
+    source = text.strip()
+    if len(source) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression is too long (over {MAX_EXPRESSION_LENGTH} characters).")
+    try:
+        tree = ast.parse(source, mode='eval')
+        variables = set()
+        root = _compile_node(tree.body, variables, source, parse_number, descriptors)
+    except SyntaxError as e:
+        raise ValueError(f"Invalid expression: '{text}'") from e
+    except (RecursionError, MemoryError) as e:
+        raise ValueError("Expression is too deeply nested") from e
+    return CompiledExpression(text, root, tuple(sorted(variables)))
+
+def _compile_node(node, variables, source, parse_number, descriptors=None, depth=0):
+    """
+    Turn one AST node into a closure taking (values, apply), where `apply`
+    runs a command by name on a tuple of arguments.
+    :param depth: Nesting level of the node, checked against MAX_EXPRESSION_DEPTH.
+    """
+    if depth > MAX_EXPRESSION_DEPTH:
+        raise ValueError("Expression is too deeply nested")
+    depth += 1
+
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        value = parse_number(ast.get_source_segment(source, node))
+        return lambda values, apply: value
+
+    if isinstance(node, ast.Name):
+        name = node.id
+        variables.add(name)
+        return lambda values, apply: values[name]
+
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+        command_name = BINARY_OPERATORS[type(node.op)]
+        left = _compile_node(node.left, variables, source, parse_number, descriptors, depth)
+        right = _compile_node(node.right, variables, source, parse_number, descriptors, depth)
+        return lambda values, apply: apply(command_name, (left(values, apply), right(values, apply)))
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        operand = _compile_node(node.operand, variables, source, parse_number, descriptors, depth)
+        if isinstance(node.op, ast.UAdd):
+            return operand
+        # An int zero combines with every numeric type without conversion
+        return lambda values, apply: apply('subtract', (0, operand(values, apply)))
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        command_name = node.func.id
+        arguments = [_compile_node(argument, variables, source, parse_number, descriptors, depth)
+                     for argument in node.args]
+        if descriptors is not None:
+            _check_call(descriptors, command_name, len(arguments))
+        return lambda values, apply: apply(command_name, tuple(argument(values, apply) for argument in arguments))
+
+    raise ValueError(f"Unsupported expression element: '{ast.unparse(node)}'")
+
+def parse_value(text):
+    """
+    Parse a variable value: a number in the current numeric mode, or a
+    comma/semicolon separated list of numbers (a float64 vector).
+    """
+    parts = re.split(r'[,;]', text)
+    try:
+        if len(parts) == 1:
+            return get_numeric_mode().parse(text)
+        import numpy as np  # pylint: disable=import-outside-toplevel
+        return np.array([float(part) for part in parts], dtype=np.float64)
+    except ValueError:
+        raise ValueError(f"Invalid value: '{text}'") from None
+
+
+class EvalCommand(Command):
+    """
+    Command to evaluate an arithmetic expression, e.g.
+        eval (a+b)*c/d a=1 b=2 c=3 d=4
+        eval a*2 + 1 a=1,2,3          (vector input, evaluated with NumPy)
+    """
+    def __init__(self, command_handler, cache_size=None):
+        """
+        :param cache_size: Compiled expressions kept; defaults to the EXPRESSION_CACHE_SIZE setting.
+        """
+        self.command_handler = command_handler
+        self.cache_size = cache_size if cache_size is not None else get_config().expression_cache_size
+        # (number parser, expression text) -> CompiledExpression, in LRU order
+        self.compiled = OrderedDict()
+
+    def compile(self, text, parse_number=float):
+        """
+        Return the compiled form of an expression, from the cache if possible.
+        :param parse_number: Parser for number literals; expressions compiled for
+            different numeric modes are cached separately.
+        """
+        key = (parse_number, text)
+        compiled = self.compiled.get(key)
+        if compiled is not None:
+            self.compiled.move_to_end(key)
+            return compiled
+        compiled = self.compiled[key] = compile_expression(text, parse_number, self.command_handler.descriptors)
+        if len(self.compiled) > self.cache_size:
+            self.compiled.popitem(last=False)
+        return compiled
+
+    def evaluate(self, text, values=None):
+        """
+        Evaluate an expression. If any value is a vector the whole expression is
+        evaluated with NumPy and an array is returned, with NaN where a step failed.
+        """
+        values = values or {}
+        if any(hasattr(value, '__len__') for value in values.values()):
+            compiled = self.compile(text)
+            results, error_mask = compiled.evaluate_batch(self.command_handler, values)
+            if error_mask.any():
+                logging.warning("Expression '%s' failed for %s of %s rows.", text, int(error_mask.sum()), error_mask.size)
+            return results
+        return self.compile(text, get_numeric_mode().parse).evaluate(self.command_handler, values)
+
+    def execute(self, *args):
+        """
+        Evaluate `EXPRESSION [name=value ...]`; the expression may contain spaces.
+        """
+        expression_parts = []
+        values = {}
+        for token in args:
+            match = _ASSIGNMENT_PATTERN.match(token)
+            if match:
+                values[match.group(1)] = parse_value(match.group(2))
+            else:
+                expression_parts.append(token)
+        if not expression_parts:
+            raise ValueError("Usage: eval EXPRESSION [name=value ...]")
+        return self.evaluate(' '.join(expression_parts), values)
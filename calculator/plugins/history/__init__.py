@@ -1,49 +1,254 @@
-import os
-import pandas as pd
 import logging
 from calculator.commands import Command
+from calculator.config import get_config
+from calculator.metrics import metrics
+from calculator.profiling import profiler
+from calculator.asynclog import calculation_sampler
+from calculator.plugins.history.storage import get_storage, default_history_path, HISTORY_COLUMNS
+from calculator.plugins.history.aggregates import get_aggregates
+from calculator.plugins.history.records import HistoryRecord, RingBuffer
 
 class HistoryManager:
     """
     This class handles saving, loading, and clearing the calculation history.
+    The actual file format is handled by a storage backend ('csv' by default,
+    'binary' or 'sqlite'), selected with the HISTORY_BACKEND setting (see calculator.config).
+
+    The most recent entries are also kept in memory as HistoryRecords in a ring
+    buffer of HISTORY_RECENT_SIZE slots, so showing recent history right after a
+    calculation does not read the history file. Before the buffer is used, the
+    storage is asked whether the history has changed other than by this process's
+    own writes (see HistoryStorage.changes_by_others); entries written by another
+    process sharing the history file cause it to be seeded again.
     """
-    def __init__(self):
-        self.history_file = 'data/history.csv'  # Path to the CSV file for history
+    def __init__(self, backend=None, history_file=None, buffer_rows=None, flush_interval=None, recent_size=None):
+        config = get_config()
+        self.backend = backend or config.history_backend
+
+        # Ring buffer of the newest entries; None until it has been seeded from storage
+        self.recent_size = recent_size or config.history_recent_size
+        self.recent = None
+        self.recent_complete = False  # True when `recent` holds the entire history
+        self.recent_changes = None    # Storage's count of changes by others when `recent` was seeded
+        self.recent_writes = None     # Storage's count of manager writes that `recent` reflects
+
+        # Rows are buffered and appended in blocks; see HistoryWriter for the flush rules
+        self.buffer_rows = buffer_rows or config.history_buffer_rows
+        self.flush_interval = flush_interval if flush_interval is not None else config.history_flush_interval
 
-        # If the file doesn't exist, create an empty CSV with the appropriate columns
-        if not os.path.exists(self.history_file):
+        # Path to the history file
+        self.history_file = history_file or config.history_file or default_history_path(self.backend)
+
+        # If the file doesn't exist, create an empty history file
+        if not self.storage.exists():
             self.initialize_history_file()
 
+    @property
+    def history_file(self):
+        """
+        Path to the history file used by the storage backend.
+        """
+        return self.storage.path
+
+    @history_file.setter
+    def history_file(self, path):
+        self.storage = get_storage(self.backend, path, self.buffer_rows, self.flush_interval)
+        self.recent = None
+        self.recent_complete = False
+
+    @property
+    def aggregates(self):
+        """
+        Running per-operation aggregates of the results in this history.
+        """
+        return get_aggregates(self.storage)
+
     def initialize_history_file(self):
         """
-        Initialize the CSV file if it doesn't exist.
+        Initialize the history file if it doesn't exist.
         """
-        df = pd.DataFrame(columns=['Operation', 'Operand1', 'Operand2', 'Result'])
-        df.to_csv(self.history_file, index=False)
+        self.storage.initialize()
+        self.aggregates.clear()
+        self.recent = RingBuffer(self.recent_size)
+        self.recent_complete = True
+        self.storage.manager_writes += 1
+        self.recent_writes = self.storage.manager_writes
+        self.recent_changes = self.storage.changes_by_others()
         logging.info("History file initialized.")
 
     def save_to_history(self, operation, operand1, operand2, result):
         """
         Save a new calculation to the history file.
+        The entry is buffered by the storage backend and written out in blocks.
         """
-        new_entry = pd.DataFrame({
-            'Operation': [operation],
-            'Operand1': [operand1],
-            'Operand2': [operand2],
-            'Result': [result]
-        })
-        new_entry.to_csv(self.history_file, mode='a', header=False, index=False)
-        logging.info(f"Saved to history: {operation}({operand1}, {operand2}) = {result}")
+        record = HistoryRecord.now(operation, operand1, operand2, result)
+        self.aggregates.add(operation, result)
+        self.storage.append_record(record)
+        self._count_write()
+        if self.recent is not None and self.recent.append(record) is not None:
+            self.recent_complete = False  # The oldest entry dropped out of memory
+        if metrics.enabled:
+            metrics.increment('calculator_history_entries_written_total', backend=self.backend)
+        # One line per calculation: skip it cheaply when INFO is off or the line is not sampled
+        if logging.root.isEnabledFor(logging.INFO) and calculation_sampler.sample():
+            logging.info("Saved to history: %s(%s, %s) = %s", operation, operand1, operand2, result)
 
     def load_history(self):
         """
         Load and return the history as a Pandas DataFrame.
         """
-        if os.path.exists(self.history_file):
-            return pd.read_csv(self.history_file)
+        with profiler.section('history.load'):
+            if metrics.enabled:
+                with metrics.timer('calculator_history_read_seconds', operation='load', backend=self.backend):
+                    return self._load_history()
+            return self._load_history()
+
+    def _load_history(self):
+        """
+        Load the full history, from memory if the recent entries cover all of it.
+        """
+        self._check_recent()
+        if self.recent_complete:
+            return self._recent_frame()
+        if self.storage.exists():
+            return self.storage.load()
         else:
             logging.warning("History file not found.")
-            return pd.DataFrame(columns=['Operation', 'Operand1', 'Operand2', 'Result'])
+            import pandas as pd  # pylint: disable=import-outside-toplevel
+            return pd.DataFrame(columns=HISTORY_COLUMNS)
+
+    def query_history(self, history_query=None):
+        """
+        Return the history entries selected by a HistoryQuery as a Pandas DataFrame.
+        Queries that only need recent entries are answered from memory; others
+        stream through the history in chunks (or read from the end for tail
+        queries), so memory use does not grow with the size of the history.
+        :param history_query: The query to run; defaults to the most recent entries.
+        """
+        with profiler.section('history.query'):
+            if metrics.enabled:
+                with metrics.timer('calculator_history_read_seconds', operation='query', backend=self.backend):
+                    return self._query_history(history_query)
+            return self._query_history(history_query)
+
+    def _query_history(self, history_query):
+        """
+        Run a query against the in-memory entries if possible, otherwise against storage.
+        """
+        # Queries need pandas, which is only imported once history is actually read
+        from calculator.plugins.history.query import HistoryQuery  # pylint: disable=import-outside-toplevel
+        history_query = history_query or HistoryQuery()
+        if history_query.since is None and history_query.until is None:
+            self._seed_recent()
+            tail_only = not history_query.filtered and history_query.page is None
+            if tail_only and (self.recent_complete or history_query.last <= len(self.recent)):
+                # Only the requested rows are turned into a DataFrame
+                return self._recent_frame(self.recent.last(history_query.last))
+            if self.recent_complete:
+                return history_query.run([self._recent_frame()])
+        if not self.storage.exists():
+            logging.warning("History file not found.")
+            return history_query.run([])
+        return self.storage.query(history_query)
+
+    def _seed_recent(self):
+        """
+        Fill the ring buffer with the newest entries from storage, unless it is
+        already seeded and the history has not changed since.
+        """
+        self._check_recent()
+        if self.recent is not None:
+            return
+        self.recent = RingBuffer(self.recent_size)
+        # Taken before reading, so entries appended meanwhile make it outdated rather than missed
+        self.storage.flush()
+        self.recent_changes = self.storage.changes_by_others()
+        self.recent_writes = self.storage.manager_writes
+        if self.storage.exists():
+            self.recent.extend(self.storage.tail_records(self.recent_size))
+        self.recent_complete = not self.recent.full
+
+    def _check_recent(self):
+        """
+        Drop the in-memory entries if the stored history has changed since they
+        were seeded other than by this process, e.g. because another process
+        appended to the same file, or another HistoryManager of this process wrote
+        through the same storage. Entries this manager saves are already in memory.
+        """
+        if self.recent is not None and (self.storage.manager_writes != self.recent_writes
+                                        or self.storage.changes_by_others() != self.recent_changes):
+            self.recent = None
+            self.recent_complete = False
+
+    def _count_write(self):
+        """
+        Count a write this manager made through the shared storage. The in-memory
+        entries stay current only if no other manager in this process has written
+        to the storage since they were last brought up to date.
+        """
+        current = self.storage.manager_writes == self.recent_writes
+        self.storage.manager_writes += 1
+        if current:
+            self.recent_writes = self.storage.manager_writes
+
+    def recent_records(self, count=None):
+        """
+        Return the newest in-memory HistoryRecords, oldest first.
+        :param count: Number of records; all of them by default.
+        """
+        self._seed_recent()
+        return self.recent.last(len(self.recent) if count is None else count)
+
+    def _recent_frame(self, records=None):
+        """
+        Return in-memory records (all of them by default) as a history DataFrame.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        records = self.recent if records is None else records
+        rows = [record.row() for record in records]
+        try:
+            return pd.DataFrame(rows, columns=HISTORY_COLUMNS)
+        except OverflowError:
+            # pandas cannot mix floats with ints too large for one (e.g. 2**100000); keep them as objects
+            return pd.DataFrame(rows, columns=HISTORY_COLUMNS, dtype=object)
+
+    def operation_stats(self, operation=None):
+        """
+        Return the running aggregates per operation, without reading the history.
+        :param operation: Only return this operation's aggregates.
+        :return: Dict of operation name -> OperationAggregate.
+        """
+        return self.aggregates.get(operation)
+
+    def export_history(self, path, fmt=None, progress=None):
+        """
+        Write the whole history to a CSV or JSON Lines file (optionally .gz or .xz
+        compressed), streaming in chunks.
+        :param fmt: 'csv' or 'jsonl'; taken from the file extension by default.
+        :param progress: Callable receiving the number of rows written so far.
+        :return: Number of rows exported.
+        """
+        from calculator.plugins.history.transfer import export_history  # pylint: disable=import-outside-toplevel
+        with profiler.section('history.export'):
+            return export_history(self.storage, path, fmt, progress=progress)
+
+    def import_history(self, path, fmt=None, progress=None):
+        """
+        Append the entries of a CSV or JSON Lines file (optionally .gz or .xz
+        compressed) to the history, streaming in chunks.
+        :param fmt: 'csv' or 'jsonl'; taken from the file extension by default.
+        :param progress: Callable receiving the number of rows imported so far.
+        :return: Number of rows imported.
+        """
+        from calculator.plugins.history.transfer import import_history  # pylint: disable=import-outside-toplevel
+        try:
+            with profiler.section('history.import'):
+                return import_history(self.storage, path, fmt, progress=progress, aggregates=self.aggregates)
+        finally:
+            # The newest entries are now imported ones; reseed the ring buffer when next needed
+            self.storage.manager_writes += 1
+            self.recent = None
+            self.recent_complete = False
 
     def clear_history(self):
         """
@@ -52,14 +257,34 @@ class HistoryManager:
         self.initialize_history_file()
         logging.info("History cleared.")
 
+    def flush(self):
+        """
+        Write any buffered history entries, and the aggregates sidecar, to disk.
+        """
+        with profiler.section('history.flush'):
+            self.storage.flush()
+            self.aggregates.save()
+
 
 # Command to display history
 class ShowHistoryCommand(Command):
-    def __init__(self):
-        self.history_manager = HistoryManager()  # Initialize HistoryManager here
+    def __init__(self, history_manager=None):
+        # The app passes in its shared HistoryManager; create one only when used standalone
+        self.history_manager = history_manager or HistoryManager()
 
     def execute(self, *args):
-        history = self.history_manager.load_history()
+        """
+        Display history entries. Accepts optional filters, e.g.
+        `last 10`, `page 2 size=50`, `op=divide`, `result>=10`, `operand1=0..5`.
+        """
+        from calculator.plugins.history.query import HistoryQuery  # pylint: disable=import-outside-toplevel
+        try:
+            history_query = HistoryQuery.parse(args)
+        except ValueError as e:
+            logging.error("Invalid history query: %s", e)
+            print(f"Error: {e}")
+            return
+        history = self.history_manager.query_history(history_query)
         if history.empty:
             print("No history available.")
         else:
@@ -69,9 +294,78 @@ class ShowHistoryCommand(Command):
 
 # Command to clear history
 class ClearHistoryCommand(Command):
-    def __init__(self):
-        self.history_manager = HistoryManager()  # Initialize HistoryManager here
+    def __init__(self, history_manager=None):
+        # The app passes in its shared HistoryManager; create one only when used standalone
+        self.history_manager = history_manager or HistoryManager()
 
     def execute(self, *args):
         self.history_manager.clear_history()
         print("History has been cleared.")
+
+
+# Command to display per-operation statistics
+class HistoryStatsCommand(Command):
+    def __init__(self, history_manager=None):
+        # The app passes in its shared HistoryManager; create one only when used standalone
+        self.history_manager = history_manager or HistoryManager()
+
+    def execute(self, *args):
+        """
+        Display count, sum, mean, standard deviation, min and max of the results
+        per operation, e.g. `historystats` or `historystats divide`.
+        """
+        stats = self.history_manager.operation_stats(args[0] if args else None)
+        if not stats:
+            print("No history available.")
+            return
+        print(f"{'Operation':<12}{'Count':>10}{'Sum':>14}{'Mean':>14}{'StdDev':>14}{'Min':>14}{'Max':>14}")
+        for name, aggregate in sorted(stats.items()):
+            print(f"{name:<12}{aggregate.count:>10}{aggregate.total:>14.6g}{aggregate.mean:>14.6g}"
+                  f"{aggregate.stddev:>14.6g}{aggregate.minimum:>14.6g}{aggregate.maximum:>14.6g}")
+
+
+# Command to export history to a file
+class ExportHistoryCommand(Command):
+    def __init__(self, history_manager=None):
+        # The app passes in its shared HistoryManager; create one only when used standalone
+        self.history_manager = history_manager or HistoryManager()
+
+    def execute(self, *args):
+        """
+        Export the history, e.g. `exporthistory data/backup.csv.gz` or
+        `exporthistory out.txt jsonl` to give the format explicitly.
+        """
+        _transfer(self.history_manager.export_history, args, 'exporthistory', "Exported {rows} history entries to {path}.")
+
+
+# Command to import history from a file
+class ImportHistoryCommand(Command):
+    def __init__(self, history_manager=None):
+        # The app passes in its shared HistoryManager; create one only when used standalone
+        self.history_manager = history_manager or HistoryManager()
+
+    def execute(self, *args):
+        """
+        Append the entries of a file to the history, e.g. `importhistory data/backup.jsonl`.
+        """
+        _transfer(self.history_manager.import_history, args, 'importhistory', "Imported {rows} history entries from {path}.")
+
+
+def _transfer(method, args, command_name, message):
+    """
+    Run an export or import for the commands above, reporting progress on stderr.
+    """
+    from calculator.plugins.history.transfer import TransferProgress  # pylint: disable=import-outside-toplevel
+    if not 1 <= len(args) <= 2:
+        print(f"Usage: {command_name} PATH [csv|jsonl]")
+        return
+    path = args[0]
+    progress = TransferProgress(command_name)
+    try:
+        rows = method(path, args[1].lower() if len(args) == 2 else None, progress)
+    except (ValueError, OSError) as e:
+        logging.error("%s failed: %s", command_name, e)
+        print(f"Error: {e}")
+        return
+    progress.finish()
+    print(message.format(rows=rows, path=path))
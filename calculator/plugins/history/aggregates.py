@@ -0,0 +1,244 @@
+"""
+Running per-operation aggregates of calculation results.
+
+HistoryManager updates the aggregates as each entry is saved, so questions like
+"how many divides, and what was the mean result" are answered without reading
+the history. They are kept in a small JSON sidecar next to the history file,
+together with a version token of the history they describe; if the sidecar is
+missing or no longer matches the history, it is rebuilt with one pass over the
+history the next time the aggregates are needed. Entries written by another
+process are not counted as they are saved, so once the storage notices such a
+change the aggregates are rebuilt rather than written out as up to date.
+"""
+import os
+import json
+import math
+import atexit
+import logging
+from calculator.numeric import to_float
+from calculator.profiling import profiler
+
+class OperationAggregate:
+    """
+    Count, sum, sum of squares, minimum and maximum of one operation's results.
+    """
+    def __init__(self, count=0, total=0.0, total_squares=0.0, minimum=math.inf, maximum=-math.inf):
+        self.count = count
+        self.total = total
+        self.total_squares = total_squares
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def add(self, value):
+        """
+        Include one result.
+        """
+        self.count += 1
+        self.total += value
+        self.total_squares += value * value
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+
+    def merge(self, other):
+        """
+        Include all results counted by another aggregate.
+        """
+        self.count += other.count
+        self.total += other.total
+        self.total_squares += other.total_squares
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    @property
+    def stddev(self):
+        """
+        Population standard deviation of the results.
+        """
+        if not self.count:
+            return math.nan
+        return math.sqrt(max(self.total_squares / self.count - self.mean ** 2, 0.0))
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'sum_squares': self.total_squares,
+            'min': self.minimum if self.count else None,
+            'max': self.maximum if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['count'], data['sum'], data['sum_squares'],
+            math.inf if data['min'] is None else data['min'],
+            -math.inf if data['max'] is None else data['max'],
+        )
+
+
+class HistoryAggregates:
+    """
+    Per-operation aggregates for one history storage, backed by a sidecar file.
+    """
+    def __init__(self, storage, path=None):
+        self.storage = storage
+        self.path = path or f"{storage.path}.stats.json"
+        self.operations = None  # Operation name -> OperationAggregate; None until loaded
+        self.stale = False  # True when the sidecar could not be used and a rebuild is due
+        self.dirty = False
+        self.counted_changes = None  # storage.changes_by_others() when the aggregates were loaded or rebuilt
+
+    def ensure_loaded(self):
+        """
+        Load the sidecar, or rebuild the aggregates from the history if the sidecar
+        is missing or out of date.
+        """
+        if self.operations is None and not self.load():
+            self.rebuild()
+
+    def load(self):
+        """
+        Read the sidecar file.
+        :return: True if it was read and matches the current history.
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.storage.flush()
+            changes = self.storage.changes_by_others()
+            if data.get('version') != self.storage.seen_version:
+                return False
+            self.operations = {name: OperationAggregate.from_dict(entry) for name, entry in data['operations'].items()}
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        self.counted_changes = changes
+        self.dirty = False
+        return True
+
+    def rebuild(self):
+        """
+        Recompute the aggregates with one pass over the history.
+        """
+        with profiler.section('history.aggregates'):
+            self.storage.flush()
+            # Taken before the pass, so a change by another process during it forces another rebuild
+            self.counted_changes = self.storage.changes_by_others()
+            self.operations = self.storage.operation_totals() if self.storage.exists() else {}
+        self.stale = False
+        self.dirty = True
+        logging.info("History aggregates rebuilt for %s operations.", len(self.operations))
+
+    def add(self, operation, result):
+        """
+        Include an entry that is about to be saved. Call this before the entry is
+        appended to storage: if a rebuild is due, the entry is left for the rebuild
+        to read from the history, so saving never pays for a full pass.
+        """
+        if self.operations is None and (self.stale or not self.load()):
+            self.stale = True
+            return
+        aggregate = self.operations.get(operation)
+        if aggregate is None:
+            aggregate = self.operations[operation] = OperationAggregate()
+        aggregate.add(to_float(result))
+        self.dirty = True
+
+    def add_frame(self, frame):
+        """
+        Include a DataFrame of entries about to be appended in bulk (e.g. an imported
+        chunk), under the same rules as `add`.
+        """
+        if self.operations is None and (self.stale or not self.load()):
+            self.stale = True
+            return
+        from calculator.plugins.history.storage import chunk_totals  # pylint: disable=import-outside-toplevel
+        for name, aggregate in chunk_totals(frame).items():
+            if name in self.operations:
+                self.operations[name].merge(aggregate)
+            else:
+                self.operations[name] = aggregate
+        self.dirty = True
+
+    def invalidate(self):
+        """
+        Forget the aggregates after entries were written without being counted
+        (e.g. an import copying rows as they are); they are rebuilt when next needed.
+        """
+        self.operations = None
+        self.stale = True
+        self.dirty = False
+
+    def get(self, operation=None):
+        """
+        Return {operation: OperationAggregate}, for one operation or all of them.
+        """
+        self.ensure_loaded()
+        if operation is None:
+            return dict(self.operations)
+        return {operation: self.operations[operation]} if operation in self.operations else {}
+
+    def clear(self):
+        """
+        Reset the aggregates after the history has been cleared.
+        """
+        self.operations = {}
+        self.stale = False
+        self.dirty = True
+        self.counted_changes = self.storage.changes_by_others()
+        self.save()
+
+    def save(self):
+        """
+        Write the sidecar file if the aggregates changed since it was last written.
+        It is stamped with the version the aggregates were counted against, and
+        not written at all if another process has written entries since.
+        """
+        if not self.dirty or self.operations is None:
+            return
+        self.storage.flush()
+        if self.storage.changes_by_others() != self.counted_changes:
+            logging.info("History changed by another process; aggregates will be rebuilt.")
+            self.invalidate()
+            return
+        data = {
+            'version': self.storage.seen_version,
+            'operations': {name: aggregate.to_dict() for name, aggregate in self.operations.items()},
+        }
+        temporary_path = f"{self.path}.tmp"
+        try:
+            with open(temporary_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(temporary_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            logging.warning("Could not write history aggregates '%s': %s", self.path, e)
+
+
+# One aggregates object per storage, shared like the storages themselves
+_aggregates = {}
+
+def get_aggregates(storage):
+    """
+    Return the shared aggregates for a history storage.
+    """
+    aggregates = _aggregates.get(storage)
+    if aggregates is None:
+        aggregates = _aggregates[storage] = HistoryAggregates(storage)
+    return aggregates
+
+def save_all_aggregates():
+    """
+    Write every changed sidecar file.
+    """
+    for aggregates in list(_aggregates.values()):
+        aggregates.save()
+
+# Registered after the storage module's hook, so it runs first: sidecars are written
+# while the storages are still open.
+atexit.register(save_all_aggregates)
@@ -0,0 +1,245 @@
+"""
+Fixed-width binary history backend with memory-mapped reads.
+
+File layout:
+    - a HEADER_SIZE-byte header: MAGIC followed by the operation name table,
+      stored as JSON and padded with null bytes;
+    - packed RECORD_DTYPE records: Operation as a uint8 code into the name table,
+      Operand1, Operand2 and Result as little-endian float64.
+
+Each column is read as a strided view over a read-only memory map, so loading
+history does not parse or copy the file.
+
+Run as a module to migrate between formats:
+    python -m calculator.plugins.history.binary import data/history.csv data/history.bin
+    python -m calculator.plugins.history.binary export data/history.bin data/history.csv
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from calculator.plugins.history.storage import (HistoryStorage, CSVHistoryStorage, HISTORY_COLUMNS,
+                                                numeric_values)
+from calculator.plugins.history.writer import HistoryWriter
+from calculator.metrics import metrics
+from calculator.numeric import to_float
+from calculator.profiling import profiler
+
+MAGIC = b'CALCHB01'
+HEADER_SIZE = 1024
+MAX_OPERATIONS = 256  # Operation codes are stored in a single byte
+
+RECORD_DTYPE = np.dtype([
+    ('Operation', '<u1'),
+    ('Operand1', '<f8'),
+    ('Operand2', '<f8'),
+    ('Result', '<f8'),
+])
+
+class BinaryHistoryStorage(HistoryStorage):
+    """
+    History stored as fixed-width binary records.
+    """
+    def __init__(self, path, buffer_rows=1000, flush_interval=1.0):
+        super().__init__(path, buffer_rows, flush_interval)
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self.operations = []  # Operation name for each code
+        self.operation_codes = {}
+        if self.exists():
+            self._read_header()
+
+    def _read_header(self):
+        """
+        Load the operation name table from the file header.
+        """
+        with open(self.path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE or not header.startswith(MAGIC):
+            raise ValueError(f"'{self.path}' is not a binary history file.")
+        self.operations = json.loads(header[len(MAGIC):].rstrip(b'\0').decode('utf-8'))
+        self.operation_codes = {name: code for code, name in enumerate(self.operations)}
+
+    def _write_header(self, f):
+        """
+        Write the header with the current operation name table at the start of an open file.
+        """
+        table = json.dumps(self.operations).encode('utf-8')
+        if len(MAGIC) + len(table) > HEADER_SIZE:
+            raise ValueError("Too many distinct operations for the binary history header.")
+        f.seek(0)
+        f.write(MAGIC + table.ljust(HEADER_SIZE - len(MAGIC), b'\0'))
+
+    def operation_code(self, operation):
+        """
+        Return the code for an operation name, adding it to the name table if needed.
+        """
+        code = self.operation_codes.get(operation)
+        if code is None:
+            if len(self.operations) >= MAX_OPERATIONS:
+                raise ValueError("Too many distinct operations for the binary history format.")
+            code = self.operation_codes[operation] = len(self.operations)
+            self.operations.append(operation)
+        return code
+
+    def initialize(self):
+        self.buffer.clear()
+        self.operations = []
+        self.operation_codes = {}
+        with self._own_write(), open(self.path, 'wb') as f:
+            self._write_header(f)
+
+    def append(self, operation, operand1, operand2, result):
+        # Exact values too large for a float64 are stored as infinity
+        self.buffer.append((self.operation_code(operation), to_float(operand1), to_float(operand2),
+                            np.nan if result is None else to_float(result)))
+        if len(self.buffer) >= self.buffer_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def append_records(self, records):
+        """
+        Append an array of RECORD_DTYPE records directly, bypassing the row buffer.
+        Operation codes must come from `operation_code`.
+        """
+        self.flush()
+        self._write_records(np.ascontiguousarray(records, dtype=RECORD_DTYPE))
+
+    def append_frame(self, frame):
+        records = np.empty(len(frame), dtype=RECORD_DTYPE)
+        names = frame['Operation'].astype(str)
+        codes = {name: self.operation_code(name) for name in names.unique()}
+        records['Operation'] = names.map(codes).to_numpy(dtype=np.uint8)
+        for column in HISTORY_COLUMNS[1:]:
+            records[column] = numeric_values(frame[column]).to_numpy(dtype=np.float64)
+        self.append_records(records)
+
+    def flush(self):
+        if self.buffer:
+            self._write_records(np.array(self.buffer, dtype=RECORD_DTYPE))
+            self.buffer.clear()
+        self.last_flush = time.monotonic()
+
+    def _write_records(self, records):
+        """
+        Append encoded records to the file, refreshing the header since the name
+        table may have grown since the last write.
+        """
+        mode = 'r+b' if self.exists() else 'w+b'
+        with profiler.section('history.write'), self._own_write(), open(self.path, mode) as f:
+            self._write_header(f)
+            f.seek(0, os.SEEK_END)
+            f.write(records.tobytes())
+        if metrics.enabled:
+            metrics.increment('calculator_history_write_bytes_total', records.nbytes, backend='binary')
+
+    def records(self):
+        """
+        Return all records as a read-only memory-mapped structured array.
+        """
+        self.flush()
+        if not self.exists():
+            return np.empty(0, dtype=RECORD_DTYPE)
+        count = (os.path.getsize(self.path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if count <= 0:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        if metrics.enabled:
+            metrics.increment('calculator_history_mapped_bytes_total', count * RECORD_DTYPE.itemsize, backend='binary')
+        return np.memmap(self.path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(count,))
+
+    def load(self):
+        return self._frame(self.records())
+
+    def iter_chunks(self, chunksize):
+        records = self.records()
+        for start in range(0, len(records), chunksize):
+            yield self._frame(records[start:start + chunksize])
+
+    def query(self, history_query, chunksize=None):
+        if history_query.filtered or history_query.page is not None:
+            return super().query(history_query, chunksize)
+        # Unfiltered tail reads only touch the last pages of the memory map
+        return self._frame(self.records()[-history_query.last:])
+
+    def _frame(self, records):
+        """
+        Build a history DataFrame from a slice of records.
+        """
+        names = np.array(self.operations, dtype=object)
+        return pd.DataFrame({
+            'Operation': names[records['Operation']] if len(records) else np.empty(0, dtype=object),
+            'Operand1': records['Operand1'],
+            'Operand2': records['Operand2'],
+            'Result': records['Result'],
+        }, columns=HISTORY_COLUMNS)
+
+
+def import_csv(csv_path, binary_path, chunksize=1_000_000):
+    """
+    Convert a CSV history file, including its rotated segments, into a binary
+    history file, streaming in chunks.
+    :return: Number of rows imported.
+    """
+    if os.path.exists(binary_path):
+        os.remove(binary_path)
+    storage = BinaryHistoryStorage(binary_path)
+    storage.initialize()
+
+    rows = 0
+    for chunk in CSVHistoryStorage(csv_path).iter_chunks(chunksize):
+        records = np.empty(len(chunk), dtype=RECORD_DTYPE)
+        records['Operation'] = [storage.operation_code(name) for name in chunk['Operation']]
+        for column in HISTORY_COLUMNS[1:]:
+            records[column] = numeric_values(chunk[column]).to_numpy(dtype=np.float64)
+        storage.append_records(records)
+        rows += len(records)
+    logging.info("Imported %s history rows from '%s' into '%s'.", rows, csv_path, binary_path)
+    return rows
+
+def export_csv(binary_path, csv_path, chunksize=1_000_000):
+    """
+    Convert a binary history file back into the CSV history format.
+    :return: Number of rows exported.
+    """
+    storage = BinaryHistoryStorage(binary_path)
+    records = storage.records()
+    names = storage.operations
+
+    writer = HistoryWriter(csv_path, max_rows=chunksize, flush_interval=float('inf'))
+    pd.DataFrame(columns=HISTORY_COLUMNS).to_csv(csv_path, index=False)
+    for start in range(0, len(records), chunksize):
+        chunk = records[start:start + chunksize]
+        writer.write_many(zip(
+            (names[code] for code in chunk['Operation'].tolist()),
+            chunk['Operand1'].tolist(),
+            chunk['Operand2'].tolist(),
+            chunk['Result'].tolist(),
+        ))
+    writer.close()
+    logging.info("Exported %s history rows from '%s' to '%s'.", len(records), binary_path, csv_path)
+    return len(records)
+
+def main(argv=None):
+    """
+    Command-line entry point for migrating history files between formats.
+    """
+    parser = argparse.ArgumentParser(description="Convert calculator history between CSV and binary formats.")
+    parser.add_argument('action', choices=['import', 'export'],
+                        help="'import' converts CSV to binary, 'export' converts binary to CSV.")
+    parser.add_argument('source', help="Path of the file to read.")
+    parser.add_argument('destination', help="Path of the file to write.")
+    parser.add_argument('--chunksize', type=int, default=1_000_000, help="Rows processed per chunk.")
+    args = parser.parse_args(argv)
+
+    if args.action == 'import':
+        rows = import_csv(args.source, args.destination, args.chunksize)
+    else:
+        rows = export_csv(args.source, args.destination, args.chunksize)
+    print(f"{rows} rows written to {args.destination}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+Advisory file locking for history files shared by several processes.
+
+The lock is taken on a separate `<history file>.lock` file rather than on the
+history file itself, because clearing and rotating replace the history file
+with a new one; a lock on the old file would no longer protect the new one.
+On platforms without `fcntl` (Windows) only threads in this process are
+serialized.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+class HistoryFileLock:
+    """
+    Reentrant exclusive/shared lock on a history file, held across processes
+    with `fcntl.flock` and across threads with an RLock.
+    """
+    def __init__(self, path):
+        self.path = f"{path}.lock"
+        self._thread_lock = threading.RLock()
+        self._fd = None
+        self._depth = 0
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Hold the lock for writing: no other process reads or writes meanwhile.
+        """
+        with self._hold(fcntl.LOCK_EX if fcntl else None):
+            yield
+
+    @contextmanager
+    def shared(self):
+        """
+        Hold the lock for reading: other readers may proceed, writers wait.
+        """
+        with self._hold(fcntl.LOCK_SH if fcntl else None):
+            yield
+
+    @contextmanager
+    def _hold(self, mode):
+        with self._thread_lock:
+            # Only the outermost acquisition touches the file lock, so a writer can
+            # call other locked methods (e.g. rotation flushing the write buffer).
+            if self._depth == 0 and mode is not None:
+                if self._fd is None:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, mode)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0 and self._fd is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def close(self):
+        """
+        Release the lock file handle.
+        """
+        with self._thread_lock:
+            if self._fd is not None and self._depth == 0:
+                os.close(self._fd)
+                self._fd = None
@@ -0,0 +1,167 @@
+import re
+import operator
+from collections import deque
+import pandas as pd
+from calculator.plugins.history.storage import HISTORY_COLUMNS, numeric_values
+
+COLUMN_ALIASES = {
+    'op': 'Operation',
+    'operation': 'Operation',
+    'a': 'Operand1',
+    'operand1': 'Operand1',
+    'b': 'Operand2',
+    'operand2': 'Operand2',
+    'result': 'Result',
+}
+
+COMPARISONS = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+    '=': operator.eq,
+}
+
+DEFAULT_PAGE_SIZE = 20
+
+_CONDITION_PATTERN = re.compile(r'^(\w+)(>=|<=|>|<|=)(.+)$')
+
+class HistoryQuery:
+    """
+    Describes which history entries to return: an optional operation filter,
+    numeric conditions on operands/results, and either the last N matches or
+    one page of matches. Without `last` or `page`, the last DEFAULT_PAGE_SIZE
+    matches are returned, so a query never materializes the whole history.
+    """
+    def __init__(self, operation=None, conditions=None, last=None, page=None,
+                 page_size=DEFAULT_PAGE_SIZE, since=None, until=None):
+        self.operation = operation
+        self.conditions = conditions or []  # List of (column, comparison, value)
+        self.page = page
+        self.page_size = page_size
+        self.last = last if last is not None or page is not None else page_size
+        self.since = since
+        self.until = until
+
+    @classmethod
+    def parse(cls, args):
+        """
+        Build a query from `showhistory` arguments, e.g.
+        ['last', '10'], ['page', '2', 'size=50'], ['op=divide', 'result>=1'], ['operand1=0..10'].
+        :raises ValueError: If an argument is not understood.
+        """
+        options = {'conditions': []}
+        tokens = iter(args)
+        for token in tokens:
+            token = token.lower()
+            if token in ('last', 'page'):
+                value = next(tokens, None)
+                options[token] = _positive_int(token, value)
+                continue
+            match = _CONDITION_PATTERN.match(token)
+            if not match:
+                raise ValueError(f"Unknown history filter: '{token}'")
+            name, comparison, value = match.groups()
+            if name == 'size':
+                options['page_size'] = _positive_int(name, value)
+            elif name in ('since', 'until'):
+                options[name] = _number(name, value)
+            elif name not in COLUMN_ALIASES:
+                raise ValueError(f"Unknown history field: '{name}'")
+            elif COLUMN_ALIASES[name] == 'Operation':
+                if comparison != '=':
+                    raise ValueError("The operation filter only supports '='.")
+                options['operation'] = value
+            elif comparison == '=' and '..' in value:
+                low, high = value.split('..', 1)
+                options['conditions'].append((COLUMN_ALIASES[name], '>=', _number(name, low)))
+                options['conditions'].append((COLUMN_ALIASES[name], '<=', _number(name, high)))
+            else:
+                options['conditions'].append((COLUMN_ALIASES[name], comparison, _number(name, value)))
+        return cls(**options)
+
+    @property
+    def filtered(self):
+        """
+        True if the query restricts which entries match, including by time.
+        """
+        return (self.operation is not None or bool(self.conditions)
+                or self.since is not None or self.until is not None)
+
+    def mask(self, frame):
+        """
+        Return a boolean Series selecting the rows of `frame` that match the filters.
+        """
+        selected = pd.Series(True, index=frame.index)
+        if self.operation is not None:
+            selected &= frame['Operation'] == self.operation
+        for column, comparison, value in self.conditions:
+            selected &= COMPARISONS[comparison](numeric_values(frame[column]), value)
+        return selected
+
+    def run(self, chunks):
+        """
+        Apply the query to an iterable of DataFrame chunks, keeping at most one
+        chunk plus one result window in memory.
+        """
+        if self.since is not None or self.until is not None:
+            raise ValueError("Time filters are only supported by the sqlite history backend.")
+
+        if self.page is not None:
+            skip = (self.page - 1) * self.page_size
+            kept = []
+            remaining = self.page_size
+            for chunk in chunks:
+                matches = chunk[self.mask(chunk)] if self.filtered else chunk
+                if skip >= len(matches):
+                    skip -= len(matches)
+                    continue
+                matches = matches.iloc[skip:skip + remaining]
+                skip = 0
+                kept.append(matches)
+                remaining -= len(matches)
+                if remaining == 0:
+                    break
+            return _concat(kept)
+
+        window = deque()
+        kept_rows = 0
+        for chunk in chunks:
+            matches = chunk[self.mask(chunk)] if self.filtered else chunk
+            if matches.empty:
+                continue
+            window.append(matches.tail(self.last))
+            kept_rows += len(window[-1])
+            while kept_rows - len(window[0]) >= self.last:
+                kept_rows -= len(window.popleft())
+        return _concat(list(window)).tail(self.last)
+
+
+def _concat(frames):
+    """
+    Concatenate result frames, returning an empty history frame if there are none.
+    """
+    if not frames:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+def _positive_int(name, value):
+    """
+    Parse a positive integer argument.
+    """
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' needs a whole number.") from None
+    if number < 1:
+        raise ValueError(f"'{name}' must be at least 1.")
+    return number
+
+def _number(name, value):
+    """
+    Parse a numeric filter value.
+    """
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"'{name}' needs a number, got '{value}'.") from None
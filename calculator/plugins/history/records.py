@@ -0,0 +1,101 @@
+"""
+Lightweight in-memory history: a compact record type and a fixed-capacity ring buffer.
+"""
+import time
+
+class HistoryRecord:
+    """
+    One calculation. Uses __slots__, so a record is a small fixed-size object
+    instead of a dict-backed instance or a DataFrame row.
+    """
+    __slots__ = ('operation', 'operand1', 'operand2', 'result', 'timestamp')
+
+    def __init__(self, operation, operand1, operand2, result, timestamp=None):
+        self.operation = operation
+        self.operand1 = operand1
+        self.operand2 = operand2
+        self.result = result
+        self.timestamp = timestamp  # Seconds since the epoch; None if unknown (e.g. read back from CSV)
+
+    @classmethod
+    def now(cls, operation, operand1, operand2, result):
+        """
+        Create a record stamped with the current time.
+        """
+        return cls(operation, operand1, operand2, result, time.time())
+
+    def row(self):
+        """
+        Return the (operation, operand1, operand2, result) tuple stored in history files.
+        """
+        return (self.operation, self.operand1, self.operand2, self.result)
+
+    def __eq__(self, other):
+        if not isinstance(other, HistoryRecord):
+            return NotImplemented
+        return self.row() == other.row() and self.timestamp == other.timestamp
+
+    def __repr__(self):
+        return (f"HistoryRecord({self.operation!r}, {self.operand1!r}, {self.operand2!r}, "
+                f"{self.result!r}, timestamp={self.timestamp!r})")
+
+
+class RingBuffer:
+    """
+    Fixed-capacity buffer keeping the newest items. The slots are allocated once;
+    appending to a full buffer overwrites the oldest item.
+    """
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("Ring buffer capacity must be at least 1.")
+        self.capacity = capacity
+        self._items = [None] * capacity
+        self._start = 0  # Index of the oldest item
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def full(self):
+        return self._size == self.capacity
+
+    def append(self, item):
+        """
+        Add an item as the newest one.
+        :return: The item that was overwritten, or None if the buffer was not full.
+        """
+        if self._size < self.capacity:
+            self._items[(self._start + self._size) % self.capacity] = item
+            self._size += 1
+            return None
+        evicted = self._items[self._start]
+        self._items[self._start] = item
+        self._start = (self._start + 1) % self.capacity
+        return evicted
+
+    def extend(self, items):
+        """
+        Append several items, oldest first.
+        """
+        for item in items:
+            self.append(item)
+
+    def last(self, count):
+        """
+        Return the newest `count` items, oldest first.
+        """
+        count = min(count, self._size)
+        first = self._start + self._size - count
+        return [self._items[(first + offset) % self.capacity] for offset in range(count)]
+
+    def __iter__(self):
+        return iter(self.last(self._size))
+
+    def clear(self):
+        """
+        Drop all items.
+        """
+        self._items = [None] * self.capacity
+        self._start = 0
+        self._size = 0
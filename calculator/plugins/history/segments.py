@@ -0,0 +1,179 @@
+"""
+Rotation of the CSV history into archived segment files.
+
+When the active history file grows past HISTORY_ROTATE_BYTES, or has been in
+use for longer than HISTORY_ROTATE_AGE seconds, it is renamed to the next
+segment (e.g. data/history.000001.csv) and compressed with the codec chosen by
+HISTORY_ARCHIVE_CODEC (gzip, lzma or none); a fresh active file is started.
+Segments are never modified afterwards, and readers stream through them oldest
+first before the active file, so rotation loses no entries.
+"""
+import os
+import re
+import glob
+import gzip
+import json
+import lzma
+import time
+import shutil
+import logging
+from calculator.config import get_config
+
+# Codec name -> file extension added to archived segments
+CODECS = {
+    'gzip': '.gz',
+    'lzma': '.xz',
+    'none': '',
+}
+
+_OPENERS = {
+    '.gz': gzip.open,
+    '.xz': lzma.open,
+}
+
+def _split(path):
+    """
+    Split 'data/history.csv' into ('data/history', '.csv').
+    """
+    root, extension = os.path.splitext(path)
+    return root, extension or '.csv'
+
+def segment_path(path, index, codec='none'):
+    """
+    Return the path of segment `index` of a history file.
+    """
+    root, extension = _split(path)
+    return f"{root}.{index:06d}{extension}{CODECS[codec]}"
+
+def segment_paths(path):
+    """
+    Return the archived segments of a history file, oldest first.
+    Uncompressed segments left by an interrupted compression are included.
+    """
+    root, extension = _split(path)
+    pattern = re.compile(re.escape(os.path.basename(root)) + r'\.(\d{6})' + re.escape(extension) + r'(\.gz|\.xz)?$')
+    segments = []
+    for candidate in glob.glob(f"{glob.escape(root)}.*{extension}*"):
+        match = pattern.match(os.path.basename(candidate))
+        if match:
+            segments.append((int(match.group(1)), candidate))
+    return [candidate for _, candidate in sorted(segments)]
+
+def segment_index(segment):
+    """
+    Return the index number in a segment file name.
+    """
+    return int(re.search(r'\.(\d{6})\.', os.path.basename(segment)).group(1))
+
+def open_segment(segment, mode='rb'):
+    """
+    Open a segment for reading, decompressing it if needed.
+    """
+    opener = _OPENERS.get(os.path.splitext(segment)[1], open)
+    return opener(segment, mode)
+
+def compress_segment(segment, codec):
+    """
+    Compress an uncompressed segment; the original is removed only once the
+    compressed copy is complete.
+    :return: Path of the compressed segment.
+    """
+    if codec == 'none' or os.path.splitext(segment)[1] in _OPENERS:
+        return segment
+    target = segment + CODECS[codec]
+    temporary = target + '.tmp'
+    with open(segment, 'rb') as source, _OPENERS[CODECS[codec]](temporary, 'wb') as destination:
+        shutil.copyfileobj(source, destination, 1024 * 1024)
+    os.replace(temporary, target)
+    os.remove(segment)
+    return target
+
+
+class RotationPolicy:
+    """
+    Decides when the active history file is rotated and keeps the time it was started
+    in a small state file next to it.
+    """
+    def __init__(self, path, max_bytes=None, max_age=None, codec=None):
+        self.path = path
+        config = get_config()
+        self.max_bytes = max_bytes if max_bytes is not None else config.history_rotate_bytes
+        self.max_age = max_age if max_age is not None else config.history_rotate_age
+        self.codec = codec or config.history_archive_codec
+        if self.codec not in CODECS:
+            raise ValueError(f"Unknown history archive codec: '{self.codec}'")
+        self.state_path = f"{path}.rotation.json"
+        self._started = None
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 or self.max_age > 0
+
+    @property
+    def started(self):
+        """
+        Time the active file was started.
+        """
+        if self._started is None:
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    self._started = float(json.load(f)['started'])
+            except (OSError, ValueError, KeyError, TypeError):
+                self.mark_started()
+        return self._started
+
+    def mark_started(self):
+        """
+        Record that a new active file starts now. The state file is only needed
+        for age-based rotation.
+        """
+        self._started = time.time()
+        if self.max_age <= 0:
+            return
+        try:
+            with open(self.state_path, 'w', encoding='utf-8') as f:
+                json.dump({'started': self._started}, f)
+        except OSError as e:
+            logging.warning("Could not write history rotation state '%s': %s", self.state_path, e)
+
+    def due(self, size):
+        """
+        Return True if an active file of `size` bytes should be rotated now.
+        """
+        if self.max_bytes > 0 and size >= self.max_bytes:
+            return True
+        return self.max_age > 0 and time.time() - self.started >= self.max_age
+
+    def rotate(self):
+        """
+        Move the active file to the next segment and compress it.
+        The caller must have flushed and closed the active file first.
+        :return: Path of the new segment.
+        """
+        existing = segment_paths(self.path)
+        index = segment_index(existing[-1]) + 1 if existing else 1
+        segment = segment_path(self.path, index)
+        os.replace(self.path, segment)
+        # Also picks up any segment an earlier, interrupted rotation left uncompressed
+        self.compact()
+        compressed = segment + CODECS[self.codec]
+        logging.info("History rotated into '%s'.", compressed)
+        return compressed
+
+    def compact(self):
+        """
+        Compress any segments left uncompressed (e.g. by an interrupted rotation).
+        :return: Number of segments compressed.
+        """
+        count = 0
+        for segment in segment_paths(self.path):
+            if compress_segment(segment, self.codec) != segment:
+                count += 1
+        return count
+
+    def remove_segments(self):
+        """
+        Delete all archived segments (used when the history is cleared).
+        """
+        for segment in segment_paths(self.path):
+            os.remove(segment)
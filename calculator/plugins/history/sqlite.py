@@ -0,0 +1,267 @@
+"""
+SQLite history backend.
+
+The database runs in WAL mode so readers never block the writer, entries are
+inserted in batches inside a single transaction, and the table is indexed on
+operation and insertion time so filtered queries do not scan the whole history.
+Values are stored as REAL, so Decimal and Fraction results from the exact
+numeric modes are kept as their nearest float (the CSV backend keeps their text).
+Connections come from a small pool, so several threads (or several CalculatorApp
+processes, each with its own pool) can log to the same database at once.
+"""
+import math
+import itertools
+import time
+import queue
+import sqlite3
+import threading
+from decimal import Decimal
+from fractions import Fraction
+from contextlib import contextmanager
+import pandas as pd
+from calculator.config import get_config
+from calculator.numeric import to_float
+from calculator.profiling import profiler
+from calculator.plugins.history.storage import HistoryStorage, HISTORY_COLUMNS, numeric_values
+from calculator.plugins.history.records import HistoryRecord
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY,
+    operation TEXT NOT NULL,
+    operand1 REAL,
+    operand2 REAL,
+    result REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_operation ON history (operation);
+CREATE INDEX IF NOT EXISTS idx_history_created_at ON history (created_at);
+"""
+
+sqlite3.register_adapter(Decimal, float)
+sqlite3.register_adapter(Fraction, to_float)
+
+def _real(value):
+    """
+    Return an int as a float, as the REAL columns store it anyway; ints beyond
+    64 bits cannot be bound as SQLite parameters.
+    """
+    return to_float(value) if type(value) is int else value
+
+SELECT_COLUMNS = "SELECT operation AS Operation, operand1 AS Operand1, operand2 AS Operand2, result AS Result"
+
+class SQLiteConnectionPool:
+    """
+    A fixed-size pool of SQLite connections shared between threads.
+    Connections are opened lazily, up to `size`; callers block while all are in use.
+    """
+    def __init__(self, path, size=4, timeout=30.0):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """
+        Open a new connection configured for concurrent use.
+        """
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection from the pool for the duration of a `with` block.
+        """
+        conn = None
+        with self._lock:
+            if self._idle.empty() and self._opened < self.size:
+                conn = self._connect()
+                self._opened += 1
+        if conn is None:
+            conn = self._idle.get(timeout=self.timeout)
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        """
+        Close all idle connections.
+        """
+        with self._lock:
+            while not self._idle.empty():
+                self._idle.get_nowait().close()
+                self._opened -= 1
+
+
+class SQLiteHistoryStorage(HistoryStorage):
+    """
+    History stored in an indexed SQLite table.
+    """
+    def __init__(self, path, buffer_rows=1000, flush_interval=1.0):
+        super().__init__(path, buffer_rows, flush_interval)
+        self.pool = SQLiteConnectionPool(path, get_config().history_sqlite_pool_size)
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self._buffer_lock = threading.Lock()
+        if self.exists():
+            self._create_schema()
+
+    def _create_schema(self):
+        """
+        Create the history table and its indexes if they are missing.
+        """
+        with self.pool.connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def initialize(self):
+        with self._buffer_lock:
+            self.buffer.clear()
+        self._create_schema()
+        with self._write_transaction() as conn:
+            conn.execute("DELETE FROM history")
+            # Ids start again after a clear, so the generation tells the new history from the old
+            generation = conn.execute("PRAGMA user_version").fetchone()[0]
+            conn.execute(f"PRAGMA user_version = {generation + 1}")
+
+    def append(self, operation, operand1, operand2, result):
+        self._buffer_row((operation, _real(operand1), _real(operand2), _real(result), time.time()))
+
+    def append_record(self, record):
+        timestamp = record.timestamp if record.timestamp is not None else time.time()
+        self._buffer_row((record.operation, _real(record.operand1), _real(record.operand2), _real(record.result),
+                          timestamp))
+
+    def _buffer_row(self, row):
+        """
+        Buffer one (operation, operand1, operand2, result, created_at) row, flushing when due.
+        """
+        with self._buffer_lock:
+            self.buffer.append(row)
+            due = len(self.buffer) >= self.buffer_rows or time.monotonic() - self.last_flush >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self._buffer_lock:
+            rows, self.buffer = self.buffer, []
+            self.last_flush = time.monotonic()
+        if rows:
+            # One transaction per batch instead of one per entry
+            with profiler.section('history.write'), self._write_transaction() as conn:
+                conn.executemany(
+                    "INSERT INTO history (operation, operand1, operand2, result, created_at) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    @contextmanager
+    def _write_transaction(self):
+        """
+        Borrow a connection for one write transaction that holds the database write
+        lock from the start, so the versions taken around it are this storage's own.
+        """
+        with self.pool.connection() as conn:
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                before = self._version(conn)
+                yield conn
+                after = self._version(conn)
+            self._record_own_write(before, after)
+
+    def load(self):
+        self.flush()
+        with self.pool.connection() as conn:
+            return pd.read_sql_query(f"{SELECT_COLUMNS} FROM history ORDER BY id", conn)
+
+    def iter_chunks(self, chunksize):
+        self.flush()
+        with self.pool.connection() as conn:
+            yield from pd.read_sql_query(f"{SELECT_COLUMNS} FROM history ORDER BY id", conn, chunksize=chunksize)
+
+    def append_frame(self, frame):
+        self.flush()
+        created_at = time.time()
+        columns = [frame['Operation'].astype(str).tolist()]
+        columns += [numeric_values(frame[column]).astype('float64').tolist() for column in HISTORY_COLUMNS[1:]]
+        with self._write_transaction() as conn:
+            conn.executemany(
+                "INSERT INTO history (operation, operand1, operand2, result, created_at) VALUES (?, ?, ?, ?, ?)",
+                zip(*columns, itertools.repeat(created_at)),
+            )
+
+    def query(self, history_query, chunksize=None):
+        """
+        Return the entries selected by a HistoryQuery, filtering and paging in SQL
+        so the table indexes are used and only the selected rows are read.
+        """
+        self.flush()
+        conditions, params = [], []
+        if history_query.operation is not None:
+            conditions.append("operation = ?")
+            params.append(history_query.operation)
+        for column, comparison, value in history_query.conditions:
+            # Column names come from COLUMN_ALIASES, comparisons from COMPARISONS
+            conditions.append(f"{column.lower()} {comparison} ?")
+            params.append(value)
+        if history_query.since is not None:
+            conditions.append("created_at >= ?")
+            params.append(history_query.since)
+        if history_query.until is not None:
+            conditions.append("created_at < ?")
+            params.append(history_query.until)
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        if history_query.page is not None:
+            sql = f"{SELECT_COLUMNS} FROM history{where} ORDER BY id LIMIT ? OFFSET ?"
+            params += [history_query.page_size, (history_query.page - 1) * history_query.page_size]
+        else:
+            # Take the newest matches through the index, then return them oldest first
+            sql = f"{SELECT_COLUMNS} FROM (SELECT * FROM history{where} ORDER BY id DESC LIMIT ?) ORDER BY id"
+            params.append(history_query.last)
+        with self.pool.connection() as conn:
+            return pd.read_sql_query(sql, conn, params=params).reindex(columns=HISTORY_COLUMNS)
+
+    def tail_records(self, count):
+        self.flush()
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT operation, operand1, operand2, result, created_at "
+                "FROM (SELECT * FROM history ORDER BY id DESC LIMIT ?) ORDER BY id", (count,)
+            ).fetchall()
+        return [HistoryRecord(*row) for row in rows]
+
+    def version(self):
+        # The database file size lags behind under WAL. Ids only grow between clears, and
+        # each clear bumps the generation, so both are read from the header and the
+        # primary key index without counting rows.
+        self.flush()
+        with self.pool.connection() as conn:
+            return self._version(conn)
+
+    @staticmethod
+    def _version(conn):
+        generation = conn.execute("PRAGMA user_version").fetchone()[0]
+        return [generation, conn.execute("SELECT max(id) FROM history").fetchone()[0]]
+
+    def operation_totals(self, chunksize=None):
+        from calculator.plugins.history.aggregates import OperationAggregate  # pylint: disable=import-outside-toplevel
+        self.flush()
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT operation, count(result), total(result), total(result * result), min(result), max(result) "
+                "FROM history GROUP BY operation"
+            ).fetchall()
+        return {
+            name: OperationAggregate(count, total, total_squares,
+                                     math.inf if minimum is None else minimum,
+                                     -math.inf if maximum is None else maximum)
+            for name, count, total, total_squares, minimum, maximum in rows
+        }
+
+    def close(self):
+        self.flush()
+        self.pool.close()
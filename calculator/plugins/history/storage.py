@@ -0,0 +1,510 @@
+import io
+import os
+import csv
+import atexit
+import logging
+import importlib
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from fractions import Fraction
+from calculator.config import get_config
+from calculator.metrics import metrics
+from calculator.numeric import to_float
+from calculator.plugins.history.writer import HistoryWriter
+from calculator.plugins.history.segments import RotationPolicy, segment_paths, open_segment
+from calculator.plugins.history.locking import HistoryFileLock
+from calculator.plugins.history.records import HistoryRecord
+
+HISTORY_COLUMNS = ['Operation', 'Operand1', 'Operand2', 'Result']
+_HEADER_SIZE = len(','.join(HISTORY_COLUMNS) + os.linesep)  # Size of a CSV history file without entries
+
+# pandas is only imported on the read paths, so that saving history does not pay
+# its import cost at startup. Reads stream through the history in chunks of
+# HISTORY_READ_CHUNK_ROWS rows.
+
+def read_chunk_rows():
+    """
+    Return the rows per chunk when streaming through a history file (HISTORY_READ_CHUNK_ROWS).
+    """
+    return get_config().history_read_chunk_rows
+
+def numeric_values(column):
+    """
+    Convert a history column to floats for filtering and aggregation. Besides plain
+    numbers, the CSV history keeps the exact text of decimal and fraction mode
+    values (e.g. '0.1' or '1/3'); anything that is not a number becomes NaN.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    values = pd.to_numeric(column, errors='coerce')
+    if column.dtype == object:
+        unparsed = values.isna() & column.notna()
+        if unparsed.any():
+            values = values.astype('float64')
+            values[unparsed] = column[unparsed].map(_fraction_value)
+    return values
+
+def chunk_totals(chunk):
+    """
+    Compute per-operation result aggregates of one DataFrame of history entries.
+    :return: Dict of operation name -> OperationAggregate.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    from calculator.plugins.history.aggregates import OperationAggregate  # pylint: disable=import-outside-toplevel
+    results = numeric_values(chunk['Result'])
+    grouped = pd.DataFrame({'value': results, 'square': results * results}).groupby(chunk['Operation'])
+    summary = grouped.agg(count=('value', 'count'), total=('value', 'sum'), total_squares=('square', 'sum'),
+                          minimum=('value', 'min'), maximum=('value', 'max'))
+    return {
+        name: OperationAggregate(int(row['count']), float(row['total']), float(row['total_squares']),
+                                 float(row['minimum']), float(row['maximum']))
+        for name, row in summary.iterrows()
+    }
+
+class _BoundedReader(io.RawIOBase):
+    """
+    Reads an open file only up to a fixed end offset, so rows appended after a
+    read began are left out.
+    """
+    def __init__(self, f, end):
+        super().__init__()
+        self.file = f
+        self.remaining = end
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        count = self.file.readinto(memoryview(buffer)[:size])
+        self.remaining -= count
+        return count
+
+def _fraction_value(value):
+    try:
+        return to_float(Fraction(str(value)))
+    except (ValueError, ZeroDivisionError):
+        return float('nan')
+
+class HistoryStorage(ABC):
+    """
+    Base class for history backends. A backend owns one history file and knows how
+    to create it, append entries to it, read it back and clear it.
+    """
+    def __init__(self, path, buffer_rows=1000, flush_interval=1.0):
+        self.path = path
+        self.buffer_rows = buffer_rows
+        self.flush_interval = flush_interval
+        self.seen_version = None    # Version as this storage's own last write (or check) left it
+        self.foreign_changes = 0    # Changes made by other processes, as far as noticed
+        self.manager_writes = 0     # Writes through this storage by any HistoryManager of this process
+        self._own_write_depth = 0
+
+    def exists(self):
+        """
+        Check whether the backing file exists.
+        """
+        return os.path.exists(self.path)
+
+    @abstractmethod
+    def initialize(self):
+        """
+        Create (or truncate to) an empty history file.
+        """
+
+    @abstractmethod
+    def append(self, operation, operand1, operand2, result):
+        """
+        Append a single entry. Backends may buffer entries until `flush` is called.
+        """
+
+    def append_record(self, record):
+        """
+        Append a HistoryRecord. Backends that keep timestamps override this to
+        store the record's own timestamp.
+        """
+        self.append(record.operation, record.operand1, record.operand2, record.result)
+
+    @abstractmethod
+    def load(self):
+        """
+        Return the full history as a Pandas DataFrame with HISTORY_COLUMNS.
+        """
+
+    def append_frame(self, frame):
+        """
+        Append a DataFrame of entries with HISTORY_COLUMNS, e.g. one chunk of an import.
+        Backends override this to write the whole chunk at once.
+        """
+        for row in frame[HISTORY_COLUMNS].itertuples(index=False, name=None):
+            self.append(*row)
+        self.flush()
+
+    def iter_chunks(self, chunksize):
+        """
+        Yield the history as consecutive DataFrames of at most `chunksize` rows.
+        Backends override this to stream instead of loading everything.
+        """
+        yield self.load()
+
+    def query(self, history_query, chunksize=None):
+        """
+        Return the entries selected by a HistoryQuery, streaming through the history.
+        """
+        self.flush()
+        return history_query.run(self.iter_chunks(chunksize or read_chunk_rows()))
+
+    def tail_records(self, count):
+        """
+        Return the newest `count` entries as HistoryRecords, oldest first.
+        Backends that keep timestamps override this to return them too.
+        """
+        from calculator.plugins.history.query import HistoryQuery  # pylint: disable=import-outside-toplevel
+        newest = self.query(HistoryQuery(last=count))
+        return [HistoryRecord(*row) for row in newest.itertuples(index=False, name=None)]
+
+    def version(self):
+        """
+        Return a token that changes whenever entries are written or cleared,
+        used to tell whether saved aggregates still describe this history and,
+        through `changes_by_others`, whether another process has written to it.
+        """
+        return os.path.getsize(self.path) if self.exists() else None
+
+    def changes_by_others(self):
+        """
+        Return a counter that goes up when the history has been changed other than
+        by this storage's own writes, e.g. by another process sharing the file.
+        Unlike `version`, it stays the same while this process saves entries.
+        """
+        version = self.version()
+        if version != self.seen_version:
+            self.seen_version = version
+            self.foreign_changes += 1
+        return self.foreign_changes
+
+    @contextmanager
+    def _own_write(self):
+        """
+        Wrap a write by this storage, entered while other writers are locked out,
+        so that it is not counted by `changes_by_others`. Nested writes are
+        tracked by the outermost one.
+        """
+        self._own_write_depth += 1
+        try:
+            if self._own_write_depth > 1:
+                yield
+                return
+            before = self.version()
+            yield
+            self._record_own_write(before, self.version())
+        finally:
+            self._own_write_depth -= 1
+
+    def _record_own_write(self, before, after):
+        """
+        Note the versions just before and after a write by this storage. If another
+        process wrote since the last check, the old version is kept, so the next
+        check still counts that change.
+        """
+        if before == self.seen_version:
+            self.seen_version = after
+
+    def operation_totals(self, chunksize=None):
+        """
+        Compute per-operation result aggregates with one pass over the history.
+        :return: Dict of operation name -> OperationAggregate.
+        """
+        self.flush()
+        totals = {}
+        for chunk in self.iter_chunks(chunksize or read_chunk_rows()):
+            for name, aggregate in chunk_totals(chunk).items():
+                if name in totals:
+                    totals[name].merge(aggregate)
+                else:
+                    totals[name] = aggregate
+        return totals
+
+    def flush(self):
+        """
+        Write any buffered entries to disk.
+        """
+
+    def close(self):
+        """
+        Flush buffered entries and release open handles.
+        """
+        self.flush()
+
+
+class CSVHistoryStorage(HistoryStorage):
+    """
+    Plain CSV history file, the default and interoperable format.
+    The file is rotated into compressed segments as it grows (see segments.py);
+    reads stream through the segments and the active file as one history.
+
+    Several processes can share one history file: writes, clears and rotations
+    take an exclusive advisory lock, and reads take a shared one.
+    """
+    def __init__(self, path, buffer_rows=1000, flush_interval=1.0):
+        super().__init__(path, buffer_rows, flush_interval)
+        self.lock = HistoryFileLock(path)
+        self.writer = HistoryWriter(path, buffer_rows, flush_interval, lock=self.lock, header=HISTORY_COLUMNS,
+                                    write_context=self._own_write)
+        self.rotation = RotationPolicy(path)
+
+    def initialize(self):
+        self.writer.discard()
+        with self.lock.exclusive(), self._own_write():
+            self.rotation.remove_segments()
+            self._write_header()
+        self.rotation.mark_started()
+
+    def _write_header(self):
+        """
+        Replace the active file with one holding just the header row. The new file
+        is written under a temporary name and renamed over the old one, so an
+        interrupted clear leaves either the old or the new file, never a partial one.
+        """
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'w', newline='', encoding='utf-8') as f:
+            csv.writer(f, lineterminator=os.linesep).writerow(HISTORY_COLUMNS)
+        os.replace(temporary_path, self.path)
+
+    def append(self, operation, operand1, operand2, result):
+        if self.writer.write((operation, operand1, operand2, result)) and self.rotation.enabled:
+            self.rotate_if_due()
+
+    def append_frame(self, frame):
+        self.writer.write_many(frame[HISTORY_COLUMNS].itertuples(index=False, name=None))
+        self.flush()
+
+    def append_csv(self, data):
+        """
+        Append rows that are already in the history's CSV layout (bytes holding
+        whole lines, without a header) as they are, in one locked write.
+        """
+        with self.lock.exclusive(), self._own_write():
+            self.writer.flush()
+            with open(self.path, 'ab') as f:
+                f.write(data)
+        if metrics.enabled:
+            metrics.increment('calculator_history_write_bytes_total', len(data), backend='csv')
+        if self.rotation.enabled:
+            self.rotate_if_due()
+
+    def segments(self):
+        """
+        Return the archived segment files, oldest first.
+        """
+        return segment_paths(self.path)
+
+    def rotate_if_due(self):
+        """
+        Rotate the active file if it has reached the size or age limit and holds any entries.
+        :return: Path of the new segment, or None.
+        """
+        if not self._rotation_due():
+            return None
+        with self.lock.exclusive():
+            # Another process may have rotated the file while we waited for the lock
+            if not self._rotation_due():
+                return None
+            return self.rotate()
+
+    def _rotation_due(self):
+        """
+        Check the size and age limits against the active file.
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            # Another process is between moving the file into a segment and replacing it
+            return False
+        return size > _HEADER_SIZE and self.rotation.due(size)
+
+    def rotate(self):
+        """
+        Move the active file, including buffered entries, into a new compressed segment.
+        :return: Path of the new segment.
+        """
+        with self.lock.exclusive(), self._own_write():
+            self.writer.close()
+            segment = self.rotation.rotate()
+            self._write_header()
+        self.rotation.mark_started()
+        return segment
+
+    @contextmanager
+    def _snapshot(self):
+        """
+        Under the shared lock, list the segments, open the active file and note
+        its size, so a read sees a consistent history even while other processes
+        write. The active file is then streamed without holding the lock: writers
+        only append to it or replace it by renaming, so the bytes up to the noted
+        size stay as they were.
+        :return: Context manager giving (segment paths, binary reader of the active file).
+        """
+        with self.lock.shared():
+            segments = self.segments()
+            f = open(self.path, 'rb')  # pylint: disable=consider-using-with
+            end = os.fstat(f.fileno()).st_size
+        if metrics.enabled:
+            metrics.increment('calculator_history_read_bytes_total', end, backend='csv')
+        try:
+            yield segments, io.BufferedReader(_BoundedReader(f, end))
+        finally:
+            f.close()
+
+    def version(self):
+        try:
+            return [len(self.segments()), os.path.getsize(self.path)]
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        self.flush()
+        with self._snapshot() as (segments, active):
+            if segments:
+                return pd.concat(list(self._chunks(segments, active, read_chunk_rows())), ignore_index=True)
+            return pd.read_csv(active)
+
+    def iter_chunks(self, chunksize):
+        with self._snapshot() as (segments, active):
+            yield from self._chunks(segments, active, chunksize)
+
+    def iter_csv(self, block_size=8 * 1024 * 1024):
+        """
+        Yield the history's rows as raw CSV bytes without the header lines, in
+        blocks of about `block_size` bytes, streaming through the segments first.
+        """
+        self.flush()
+        with self._snapshot() as (segments, active):
+            for segment in segments:
+                with open_segment(segment) as f:
+                    f.readline()
+                    while block := f.read(block_size):
+                        yield block
+            active.readline()
+            while block := active.read(block_size):
+                yield block
+
+    def _chunks(self, segments, active, chunksize):
+        """
+        Stream the given segments, then the active file, in chunks.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        for segment in segments:
+            with open_segment(segment) as f, pd.read_csv(f, chunksize=chunksize) as reader:
+                yield from reader
+        with pd.read_csv(active, chunksize=chunksize) as reader:
+            yield from reader
+
+    def query(self, history_query, chunksize=None):
+        self.flush()
+        if history_query.filtered or history_query.page is not None:
+            return super().query(history_query, chunksize)
+        return self.tail(history_query.last)
+
+    def tail(self, count, block_size=65536):
+        """
+        Return the last `count` entries by reading backwards from the end of the
+        file, so the cost depends on `count` rather than on the file size.
+        If the active file holds fewer entries, the rest come from the newest segments.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        self.flush()
+        with self.lock.shared(), open(self.path, 'rb') as f:
+            header = f.readline()
+            start = f.tell()
+            position = f.seek(0, os.SEEK_END)
+            data = b''
+            while position > start and data.count(b'\n') <= count:
+                step = min(block_size, position - start)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+        if metrics.enabled:
+            metrics.increment('calculator_history_read_bytes_total', len(header) + len(data), backend='csv')
+        lines = data.splitlines(keepends=True)[-count:]
+        frame = pd.read_csv(io.BytesIO(header + b''.join(lines)))
+        if len(frame) >= count:
+            return frame
+        frames = [frame]
+        remaining = count - len(frame)
+        for segment in reversed(self.segments()):
+            with open_segment(segment) as f:
+                older = pd.read_csv(f).tail(remaining)
+            frames.insert(0, older)
+            remaining -= len(older)
+            if remaining <= 0:
+                break
+        return pd.concat(frames, ignore_index=True)
+
+    def flush(self):
+        self.writer.flush()
+        if self.rotation.enabled:
+            self.rotate_if_due()
+
+    def close(self):
+        self.writer.close()
+        self.lock.close()
+
+
+# Backend name -> (module, storage class, default file path). Backend modules are
+# imported only when selected, so the CSV backend never loads NumPy or SQLite.
+BACKENDS = {
+    'csv': ('calculator.plugins.history.storage', 'CSVHistoryStorage', 'data/history.csv'),
+    'binary': ('calculator.plugins.history.binary', 'BinaryHistoryStorage', 'data/history.bin'),
+    'sqlite': ('calculator.plugins.history.sqlite', 'SQLiteHistoryStorage', 'data/history.db'),
+}
+
+def _backend(backend):
+    """
+    Look up a backend entry by name.
+    """
+    try:
+        return BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown history backend: '{backend}'") from None
+
+def default_history_path(backend):
+    """
+    Return the default history file path for a backend name.
+    """
+    return _backend(backend)[2]
+
+
+# One storage instance per history file, so every HistoryManager pointing at the
+# same file shares a single write buffer and reads see each other's entries.
+_storages = {}
+
+def get_storage(backend, path, buffer_rows=1000, flush_interval=1.0):
+    """
+    Return the shared storage for a history file, creating it on first use.
+    :param backend: Backend name ('csv', 'binary' or 'sqlite').
+    :param path: Path to the history file.
+    """
+    key = (backend, os.path.abspath(path))
+    storage = _storages.get(key)
+    if storage is None:
+        module_name, class_name, _ = _backend(backend)
+        storage_class = getattr(importlib.import_module(module_name), class_name)
+        storage = _storages[key] = storage_class(path, buffer_rows, flush_interval)
+    return storage
+
+def close_all_storages():
+    """
+    Flush and close every open history storage.
+    """
+    for storage in list(_storages.values()):
+        try:
+            storage.close()
+        except OSError as e:
+            logging.error("Failed to flush history to '%s': %s", storage.path, e)
+    _storages.clear()
+
+# Make sure buffered entries reach the disk even if the app exits without a clean shutdown.
+atexit.register(close_all_storages)
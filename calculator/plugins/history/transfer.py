@@ -0,0 +1,288 @@
+"""
+Streaming export and import of calculation history.
+
+History is written to, or read from, a CSV file with the history's own columns
+or a JSON Lines file with one object per entry, e.g.
+    {"Operation": "add", "Operand1": 1.0, "Operand2": 2.0, "Result": 3.0}
+The format follows the file extension (.csv, .jsonl or .ndjson) unless given
+explicitly, and a further .gz or .xz extension compresses the file with gzip or
+lzma. Entries are streamed in chunks, so memory use stays the same however
+large the history or the file is; imported entries are appended after the
+existing history.
+
+Importing a CSV file into the CSV history skips most parsing: the file is copied
+in blocks of whole lines, each checked for the four-field layout and for numbers
+in the operand and result columns, and only blocks that fail the check (quoted
+fields, blank lines, fractions, invalid values) go through pandas. Rows whose
+operands or result are not numbers are skipped and reported in the log.
+"""
+import io
+import os
+import sys
+import gzip
+import lzma
+import time
+import logging
+from functools import partial
+from contextlib import closing
+from calculator.metrics import metrics
+from calculator.plugins.history.storage import HISTORY_COLUMNS, numeric_values, read_chunk_rows
+
+FORMATS = ('csv', 'jsonl')
+BLOCK_BYTES = 8 * 1024 * 1024  # Size of the raw blocks copied between CSV files
+
+# File extension -> format
+FORMAT_EXTENSIONS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+}
+
+# Compression extension -> opener. Level 6 (the gzip tool's default) compresses
+# several times faster than Python's default of 9 for nearly the same size.
+_OPENERS = {
+    '.gz': partial(gzip.open, compresslevel=6),
+    '.xz': lzma.open,
+}
+
+_HEADER = ','.join(HISTORY_COLUMNS).encode('utf-8')
+_NUMBER_COLUMNS = HISTORY_COLUMNS[1:]  # Operand1, Operand2 and Result
+
+def transfer_format(path, fmt=None):
+    """
+    Return the format ('csv' or 'jsonl') of an export or import file.
+    :param fmt: Explicit format; otherwise it is taken from the file extension.
+    :raises ValueError: If the format is unknown or cannot be told from the path.
+    """
+    if fmt is not None:
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown history format: '{fmt}'. Use one of: {', '.join(FORMATS)}.")
+        return fmt
+    root, extension = os.path.splitext(path)
+    if extension.lower() in _OPENERS:
+        extension = os.path.splitext(root)[1]
+    try:
+        return FORMAT_EXTENSIONS[extension.lower()]
+    except KeyError:
+        raise ValueError(f"Cannot tell the history format of '{path}'; "
+                         f"use a .csv or .jsonl file name or give the format.") from None
+
+def _open(path, mode, target=None):
+    """
+    Open a transfer file in binary mode, compressed according to its extension.
+    :param target: Open this file (e.g. a temporary one) instead, with the same compression.
+    """
+    opener = _OPENERS.get(os.path.splitext(path)[1].lower(), open)
+    return opener(target or path, mode)
+
+
+class TransferProgress:
+    """
+    Reports how many rows an export or import has handled, at most every
+    `interval` seconds. On a terminal the report is rewritten in place.
+    """
+    def __init__(self, label, stream=None, interval=0.5):
+        self.label = label
+        self.stream = stream or sys.stderr
+        self.interval = interval
+        self.started = time.perf_counter()
+        self.reported = self.started
+        self.rows = 0
+
+    def __call__(self, rows):
+        self.rows = rows
+        now = time.perf_counter()
+        if now - self.reported >= self.interval:
+            self.reported = now
+            self._report(now, '\r' if self.stream.isatty() else '\n')
+
+    def finish(self):
+        """
+        Write the final row count and rate.
+        """
+        self._report(time.perf_counter(), '\n')
+
+    def _report(self, now, end):
+        elapsed = now - self.started
+        rate = self.rows / elapsed if elapsed > 0 else 0
+        self.stream.write(f"{self.label}: {self.rows:,} rows ({rate:,.0f} rows/s){end}")
+        self.stream.flush()
+
+
+def export_history(storage, path, fmt=None, chunksize=None, progress=None):
+    """
+    Write the whole history to a CSV or JSON Lines file, streaming in chunks.
+    The file is written under a temporary name and renamed when complete.
+    :param storage: HistoryStorage to read from.
+    :param fmt: 'csv' or 'jsonl'; taken from the file extension by default.
+    :param progress: Callable receiving the number of rows written so far.
+    :return: Number of rows exported.
+    """
+    fmt = transfer_format(path, fmt)
+    temporary_path = f"{path}.tmp"
+    rows = 0
+    with _open(path, 'wb', temporary_path) as f:
+        if fmt == 'csv' and hasattr(storage, 'iter_csv'):
+            # The CSV history is already in the export layout
+            f.write(_HEADER + b'\n')
+            for block in storage.iter_csv():
+                f.write(block)
+                rows += block.count(b'\n')
+                if progress:
+                    progress(rows)
+        else:
+            storage.flush()
+            if fmt == 'csv':
+                f.write(_HEADER + b'\n')
+            for chunk in storage.iter_chunks(chunksize or read_chunk_rows()):
+                if fmt == 'csv':
+                    text = chunk.to_csv(header=False, index=False, lineterminator='\n')
+                else:
+                    text = chunk.to_json(orient='records', lines=True) if len(chunk) else ''
+                    if text and not text.endswith('\n'):
+                        text += '\n'
+                f.write(text.encode('utf-8'))
+                rows += len(chunk)
+                if progress:
+                    progress(rows)
+    os.replace(temporary_path, path)
+    if metrics.enabled:
+        metrics.increment('calculator_history_exported_rows_total', rows, format=fmt)
+    logging.info("Exported %s history rows to '%s'.", rows, path)
+    return rows
+
+def import_history(storage, path, fmt=None, chunksize=None, progress=None, aggregates=None):
+    """
+    Append the entries of a CSV or JSON Lines file to the history, streaming in chunks.
+    :param storage: HistoryStorage to append to.
+    :param fmt: 'csv' or 'jsonl'; taken from the file extension by default.
+    :param progress: Callable receiving the number of rows imported so far.
+    :param aggregates: HistoryAggregates to keep up to date with the imported entries.
+    :return: Number of rows imported; rows that are not numbers are skipped.
+    :raises ValueError: If the file lacks one of the history columns.
+    """
+    fmt = transfer_format(path, fmt)
+    rows = 0
+    with _open(path, 'rb') as f:
+        if fmt == 'csv':
+            header = f.readline().rstrip(b'\r\n')
+            if header == _HEADER and hasattr(storage, 'append_csv'):
+                batches = _csv_blocks(f, header, BLOCK_BYTES)
+            else:
+                f.seek(0)
+                batches = _csv_chunks(f, chunksize or read_chunk_rows())
+        else:
+            batches = _jsonl_chunks(f, chunksize or read_chunk_rows())
+
+        with closing(batches):
+            for batch in batches:
+                if isinstance(batch, bytes):
+                    storage.append_csv(batch)
+                    rows += batch.count(b'\n')
+                    if aggregates is not None:
+                        aggregates.invalidate()  # Rebuilt when next needed, rather than parsing every block
+                else:
+                    frame = _history_columns(batch, path)
+                    storage.append_frame(frame)
+                    # Only once the entries are stored, so a failed write leaves the aggregates matching the history
+                    if aggregates is not None:
+                        aggregates.add_frame(frame)
+                    rows += len(frame)
+                if progress:
+                    progress(rows)
+    storage.flush()
+    if metrics.enabled:
+        metrics.increment('calculator_history_imported_rows_total', rows, format=fmt)
+    logging.info("Imported %s history rows from '%s'.", rows, path)
+    return rows
+
+def _csv_blocks(f, header, block_size):
+    """
+    Yield blocks of whole lines from a CSV history file after its header. Blocks
+    in the plain four-field layout are yielded as bytes to be copied as they
+    are; any other block is yielded parsed, as a DataFrame.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    partial_line = b''
+    while True:
+        data = f.read(block_size)
+        if not data:
+            block, partial_line = partial_line, b''
+            if block and not block.endswith(b'\n'):
+                block += b'\n'
+        else:
+            data = partial_line + data
+            end = data.rfind(b'\n') + 1
+            block, partial_line = data[:end], data[end:]
+        if block:
+            lines = block.count(b'\n')
+            if (block.count(b',') == 3 * lines and b'"' not in block and b'\n\n' not in block
+                    and not block.startswith(b'\n') and _float_block(pd, block)):
+                yield block
+            else:
+                yield pd.read_csv(io.BytesIO(header + b'\n' + block))
+        if not data:
+            return
+
+def _float_block(pd, block):
+    """
+    True if every operand and result in a block of four-field CSV lines is a plain float.
+    Parsing only those columns to float64 is much cheaper than parsing the whole block.
+    """
+    try:
+        pd.read_csv(io.BytesIO(block), header=None, usecols=[1, 2, 3], dtype='float64', na_filter=False)
+    except ValueError:
+        return False
+    return True
+
+def _csv_chunks(f, chunksize):
+    """
+    Yield DataFrames parsed from a CSV file.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    with pd.read_csv(f, chunksize=chunksize) as reader:
+        yield from reader
+
+def _jsonl_chunks(f, chunksize):
+    """
+    Yield DataFrames parsed from a JSON Lines file.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    with pd.read_json(f, lines=True, chunksize=chunksize, dtype=False) as reader:
+        yield from reader
+
+def _history_columns(frame, path):
+    """
+    Select the history columns of an imported DataFrame, in history order.
+    """
+    missing = [column for column in HISTORY_COLUMNS if column not in frame.columns]
+    if missing:
+        raise ValueError(f"'{path}' is missing history columns: {', '.join(missing)}.")
+    frame = frame[HISTORY_COLUMNS]
+    invalid = _invalid_rows(frame)
+    if invalid.any():
+        example = frame[invalid].iloc[0].tolist()
+        logging.warning("Skipped %s rows of '%s' whose operands or result are not numbers, e.g. %s.",
+                        int(invalid.sum()), path, example)
+        frame = frame[~invalid]
+    return frame
+
+def _invalid_rows(frame):
+    """
+    Return a boolean Series selecting rows whose operands or result are not numbers.
+    Text such as '0.1' or '1/3' is accepted, and so are missing values, which is
+    how exports write NaN.
+    """
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    invalid = pd.Series(False, index=frame.index)
+    for column in _NUMBER_COLUMNS:
+        values = frame[column]
+        if pd.api.types.is_bool_dtype(values):
+            invalid |= True
+        elif values.dtype == object:
+            is_bool = values.map(lambda value: isinstance(value, bool))
+            invalid |= (numeric_values(values).isna() & values.notna()) | is_bool
+        elif not pd.api.types.is_numeric_dtype(values):
+            invalid |= True
+    return invalid
+
@@ -0,0 +1,114 @@
+import os
+import csv
+import time
+from contextlib import nullcontext
+from calculator.metrics import metrics
+from calculator.profiling import profiler
+
+class HistoryWriter:
+    """
+    Append-only writer for the history CSV file.
+
+    Keeps the file handle open and buffers rows in memory, writing them out in one
+    block once the buffer holds `max_rows` rows or `flush_interval` seconds have
+    passed since the last flush. Rows are written in the same layout pandas'
+    `to_csv(mode='a', header=False, index=False)` produces.
+
+    With a HistoryFileLock, each flush is one group commit under the exclusive
+    lock, so blocks from several processes never interleave, and the handle is
+    reopened if another process has replaced the file (cleared or rotated it).
+    """
+    def __init__(self, path, max_rows=1000, flush_interval=1.0, lock=None, header=None, write_context=None):
+        self.path = path
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self.lock = lock
+        self.header = header  # Written first if the writer ever finds the file missing or empty
+        self.write_context = write_context or nullcontext  # Entered inside the lock around each block written
+        self.buffer = []
+        self.last_flush = time.monotonic()
+        self._file = None
+        self._csv_writer = None
+
+    def _open(self):
+        """
+        Open the history file for appending, keeping the handle for later flushes.
+        """
+        self._file = open(self.path, 'a', newline='', encoding='utf-8')
+        self._csv_writer = csv.writer(self._file, lineterminator=os.linesep)
+        if self.header is not None and self._file.tell() == 0:
+            self._csv_writer.writerow(self.header)
+
+    def _ensure_current(self):
+        """
+        Make sure the open handle refers to the file currently at `path`.
+        """
+        if self._file is not None:
+            try:
+                current = os.stat(self.path)
+                opened = os.fstat(self._file.fileno())
+                if (current.st_dev, current.st_ino) == (opened.st_dev, opened.st_ino):
+                    return
+            except FileNotFoundError:
+                pass
+            self._file.close()
+        self._open()
+
+    def write(self, row):
+        """
+        Buffer a single row, flushing if the row or time limit has been reached.
+        :param row: Sequence of values (Operation, Operand1, Operand2, Result).
+        :return: True if the buffer was flushed.
+        """
+        self.buffer.append(row)
+        if len(self.buffer) >= self.max_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+            return True
+        return False
+
+    def write_many(self, rows):
+        """
+        Buffer several rows at once, flushing if a limit has been reached.
+        :return: True if the buffer was flushed.
+        """
+        self.buffer.extend(rows)
+        if len(self.buffer) >= self.max_rows or time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+            return True
+        return False
+
+    def flush(self):
+        """
+        Write all buffered rows to disk.
+        """
+        if self.buffer:
+            with profiler.section('history.write'), self.lock.exclusive() if self.lock is not None else nullcontext(), \
+                    self.write_context():
+                if self.lock is not None:
+                    self._ensure_current()
+                elif self._file is None:
+                    self._open()
+                start = self._file.tell() if metrics.enabled else 0
+                self._csv_writer.writerows(self.buffer)
+                self._file.flush()
+                if metrics.enabled:
+                    metrics.increment('calculator_history_write_bytes_total', self._file.tell() - start, backend='csv')
+            self.buffer.clear()
+        self.last_flush = time.monotonic()
+
+    def discard(self):
+        """
+        Drop buffered rows without writing them (used when the history is cleared).
+        """
+        self.buffer.clear()
+
+    def close(self):
+        """
+        Flush any remaining rows and close the file handle.
+        """
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._csv_writer = None
+
@@ -0,0 +1,29 @@
+import logging
+from calculator.commands import Command
+from calculator.numeric import NUMERIC_MODES, get_numeric_mode, set_numeric_mode
+
+class ModeCommand(Command):
+    """
+    Command to show or switch the numeric mode.
+        mode                     print the current mode
+        mode float|fraction      switch mode
+        mode decimal [DIGITS]    switch to decimal arithmetic, optionally setting the precision
+    """
+    def __init__(self, command_handler):
+        self.command_handler = command_handler
+
+    def execute(self, *args):
+        if not args:
+            mode = get_numeric_mode()
+            if mode.name == 'decimal':
+                print(f"Numeric mode: decimal ({mode.precision} digits)")
+            else:
+                print(f"Numeric mode: {mode.name}")
+            return
+        if len(args) > 2 or args[0] not in NUMERIC_MODES:
+            raise ValueError(f"Usage: mode [{' | '.join(NUMERIC_MODES)}] [DIGITS]")
+        mode = set_numeric_mode(args[0], args[1] if len(args) == 2 else None)
+        # Cached results may have been computed with another type or precision
+        self.command_handler.clear_cache()
+        logging.info("Numeric mode set to %r.", mode)
+        print(f"Numeric mode set to {args[0]}.")
@@ -0,0 +1,44 @@
+import logging
+from calculator.commands import Command
+from calculator.profiling import profiler
+
+class ProfileCommand(Command):
+    """
+    Command to profile the running session with cProfile and tracemalloc.
+        profile              show whether profiling is running and its section timings
+        profile start        start profiling (discarding the previous profile)
+        profile stop         stop profiling, keeping the results
+        profile dump [DIR]   write a report (and a .prof file) to DIR, logs/ by default
+    """
+    def __init__(self, command_handler):
+        self.command_handler = command_handler
+
+    def execute(self, *args):
+        action = args[0].lower() if args else 'status'
+        if action == 'start':
+            if profiler.start():
+                # Command dispatch is only wrapped in profiler sections while profiling
+                self.command_handler.refresh_dispatch()
+                print("Profiling started.")
+            else:
+                print("Profiling is already running.")
+        elif action == 'stop':
+            if profiler.stop():
+                self.command_handler.refresh_dispatch()
+                print("Profiling stopped. Use 'profile dump' to write the report.")
+            else:
+                print("Profiling is not running.")
+        elif action == 'dump' and len(args) <= 2:
+            try:
+                path = profiler.dump(*args[1:])
+            except (ValueError, OSError) as e:
+                logging.error("Could not write profile: %s", e)
+                print(f"Error: {e}")
+                return
+            print(f"Profile written to {path}.")
+        elif action == 'status':
+            print(f"Profiling is {'running' if profiler.active else 'not running'}.")
+            for name, section in sorted(profiler.sections.items()):
+                print(f"{name:<32}{section.count:>10} calls{section.seconds:>12.4f}s{section.allocated / 1024:>12.1f} KiB")
+        else:
+            print("Usage: profile [start | stop | dump [DIR]]")
@@ -0,0 +1,47 @@
+import logging
+from calculator.commands import Command
+from calculator.metrics import metrics
+
+class StatsCommand(Command):
+    """
+    Command to display or export the collected metrics.
+        stats              print metrics in the Prometheus text format
+        stats json         print metrics as JSON
+        stats save PATH    write a snapshot to PATH (JSON if it ends in .json)
+        stats on|off       enable or disable metrics collection
+        stats reset        drop all collected values
+    """
+    def __init__(self, command_handler):
+        self.command_handler = command_handler
+
+    def execute(self, *args):
+        action = args[0] if args else 'show'
+        if action == 'on':
+            metrics.enabled = True
+            print("Metrics collection enabled.")
+        elif action == 'off':
+            metrics.enabled = False
+            print("Metrics collection disabled.")
+        elif action == 'reset':
+            metrics.reset()
+            print("Metrics reset.")
+        elif action == 'save' and len(args) == 2:
+            path = args[1]
+            try:
+                metrics.write(path)
+            except OSError as e:
+                raise ValueError(f"Cannot write metrics to '{path}': {e.strerror or e}") from e
+            logging.info("Metrics written to '%s'.", path)
+            print(f"Metrics written to {path}.")
+        elif action == 'json':
+            print(metrics.to_json())
+        elif action == 'show':
+            if not metrics.enabled:
+                print("Metrics collection is disabled. Use 'stats on' or set CALC_METRICS=1.")
+            print(metrics.to_prometheus(), end='')
+            if self.command_handler.cache_size:
+                info = self.command_handler.cache_info()
+                print(f"Result cache: {info['hits']} hits, {info['misses']} misses, "
+                      f"{info['evictions']} evictions, {info['size']}/{info['max_size']} entries")
+        else:
+            print("Usage: stats [json | save PATH | on | off | reset]")
@@ -0,0 +1,224 @@
+"""
+Session profiling with cProfile and tracemalloc, switched on while the app runs.
+
+`profile start` (or CALC_PROFILE=1 at startup) starts a cProfile profile of the
+main thread and tracemalloc allocation tracing; `profile dump` writes a report
+under logs/ with the top functions by cumulative time, the top allocation sites
+and the allocations that grew since profiling started, plus a `.prof` file for
+pstats-compatible viewers.
+
+Command execution, plugin loading and history I/O are also timed as named
+sections (e.g. `command.add`, `plugins.load`, `history.write`), each recording
+calls, time and the net memory it allocated, so growth can be traced to the
+subsystem that caused it. Instrumented code calls `profiler.section(name)`,
+which returns a shared no-op context manager while profiling is off. cProfile,
+pstats and tracemalloc are only imported once profiling is started.
+"""
+import os
+import io
+import sys
+import time
+import logging
+from contextlib import contextmanager, nullcontext
+
+REPORT_DIRECTORY = 'logs'
+TOP_ENTRIES = 25          # Functions and allocation sites listed per report table
+TRACEMALLOC_FRAMES = 10   # Stack frames kept per allocation
+
+_NO_SECTION = nullcontext()
+
+def _snapshot():
+    """
+    Take an allocation snapshot without the profiler's own and the import system's allocations.
+    """
+    import tracemalloc  # pylint: disable=import-outside-toplevel
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '*/cProfile.py'),
+        tracemalloc.Filter(False, '*/pstats.py'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+        tracemalloc.Filter(False, '<unknown>'),
+    ))
+
+def _traced_memory():
+    """
+    Return the bytes currently allocated according to tracemalloc (0 if it is not tracing).
+    """
+    tracemalloc = sys.modules.get('tracemalloc')
+    return tracemalloc.get_traced_memory()[0] if tracemalloc is not None else 0
+
+class SectionStats:
+    """
+    Calls, total time and net allocated bytes of one named section.
+    """
+    __slots__ = ('count', 'seconds', 'allocated')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.allocated = 0
+
+
+class SessionProfiler:
+    """
+    Collects a cProfile profile, tracemalloc snapshots and section timings
+    between `start` and `stop`.
+    """
+    def __init__(self):
+        self.active = False
+        self.profile = None
+        self.baseline = None        # Allocation snapshot taken at start
+        self.final_snapshot = None  # Allocation snapshot taken at stop
+        self.sections = {}
+        self.started = None
+        self.stopped = None
+        self._owns_tracemalloc = False
+
+    def start(self, frames=TRACEMALLOC_FRAMES):
+        """
+        Start a new profile, discarding any previous one.
+        :return: False if profiling was already running.
+        """
+        import cProfile  # pylint: disable=import-outside-toplevel
+        import tracemalloc  # pylint: disable=import-outside-toplevel
+        if self.active:
+            return False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._owns_tracemalloc = True
+        self.baseline = _snapshot()
+        self.final_snapshot = None
+        self.sections = {}
+        self.started = time.time()
+        self.stopped = None
+        self.profile = cProfile.Profile()
+        self.active = True
+        self.profile.enable()
+        logging.info("Profiling started.")
+        return True
+
+    def stop(self):
+        """
+        Stop profiling, keeping the results for `dump`.
+        :return: False if profiling was not running.
+        """
+        if not self.active:
+            return False
+        self.profile.disable()
+        self.active = False
+        self.stopped = time.time()
+        self.final_snapshot = _snapshot()
+        if self._owns_tracemalloc:
+            sys.modules['tracemalloc'].stop()
+            self._owns_tracemalloc = False
+        logging.info("Profiling stopped.")
+        return True
+
+    @property
+    def has_results(self):
+        return self.profile is not None
+
+    def section(self, name):
+        """
+        Return a context manager timing a named section while profiling is active.
+        """
+        if not self.active:
+            return _NO_SECTION
+        return self._section(name)
+
+    @contextmanager
+    def _section(self, name):
+        started = time.perf_counter()
+        allocated = _traced_memory()
+        try:
+            yield
+        finally:
+            self._record(name, started, allocated)
+
+    def call(self, name, function, *args):
+        """
+        Call `function(*args)` as a named section; used to wrap command dispatch.
+        """
+        started = time.perf_counter()
+        allocated = _traced_memory()
+        try:
+            return function(*args)
+        finally:
+            self._record(name, started, allocated)
+
+    def _record(self, name, started, allocated):
+        stats = self.sections.get(name)
+        if stats is None:
+            stats = self.sections[name] = SectionStats()
+        stats.count += 1
+        stats.seconds += time.perf_counter() - started
+        if self.active:
+            stats.allocated += _traced_memory() - allocated
+
+    def dump(self, directory=REPORT_DIRECTORY, top=TOP_ENTRIES):
+        """
+        Write a text report and a `.prof` file of the current or last profile.
+        Profiling keeps running if it is active.
+        :return: Path of the text report.
+        :raises ValueError: If profiling has never been started.
+        """
+        import pstats  # pylint: disable=import-outside-toplevel
+        if not self.has_results:
+            raise ValueError("No profile to dump; use 'profile start' first.")
+        if self.active:
+            # Stats can only be taken from a disabled profile
+            self.profile.disable()
+            snapshot = _snapshot()
+            stats = pstats.Stats(self.profile)
+            self.profile.enable()
+        else:
+            stats = pstats.Stats(self.profile)
+            snapshot = self.final_snapshot
+
+        os.makedirs(directory, exist_ok=True)
+        base = stamped = os.path.join(directory, time.strftime("profile-%Y%m%d-%H%M%S"))
+        number = 1
+        while os.path.exists(f"{base}.txt"):  # Several dumps within one second
+            number += 1
+            base = f"{stamped}-{number}"
+        stats.dump_stats(f"{base}.prof")
+        path = f"{base}.txt"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.report(stats, snapshot, top))
+        logging.info("Profile written to '%s'.", path)
+        return path
+
+    def report(self, stats, snapshot, top=TOP_ENTRIES):
+        """
+        Format the sections, top functions and allocation sites as text.
+        """
+        end = time.time() if self.active else self.stopped
+        lines = [f"Profile of {end - self.started:.1f}s session ({'running' if self.active else 'stopped'})", ""]
+
+        lines.append("Sections")
+        lines.append(f"{'Section':<32}{'Calls':>10}{'Total s':>12}{'Mean ms':>12}{'Net KiB':>12}")
+        for name, section in sorted(self.sections.items(), key=lambda item: -item[1].seconds):
+            lines.append(f"{name:<32}{section.count:>10}{section.seconds:>12.4f}"
+                         f"{section.seconds / section.count * 1000:>12.4f}{section.allocated / 1024:>12.1f}")
+        lines.append("")
+
+        lines.append(f"Top {top} functions by cumulative time")
+        buffer = io.StringIO()
+        stats.stream = buffer
+        stats.sort_stats('cumulative').print_stats(top)
+        lines.append(buffer.getvalue().strip())
+        lines.append("")
+
+        lines.append(f"Top {top} allocation sites")
+        for statistic in snapshot.statistics('lineno')[:top]:
+            lines.append(str(statistic))
+        lines.append("")
+
+        lines.append(f"Top {top} allocation sites by growth since profiling started")
+        for difference in snapshot.compare_to(self.baseline, 'lineno')[:top]:
+            lines.append(str(difference))
+        return '\n'.join(lines) + '\n'
+
+
+profiler = SessionProfiler()
@@ -0,0 +1,221 @@
+"""
+Prompt-free REPL: one command per line, e.g. `add 3 4` or `showhistory last 5`.
+
+Command names may be shortened to any unique prefix (`a 3 4`, `sh`), resolved
+through a trie built once over the registered commands. Whether a command takes
+operands comes from its `arity` attribute instead of a list of command names.
+Results are written one per line, as in batch mode, but collected and written
+in blocks: output is flushed as soon as no more input is waiting, so a person
+typing (or a tool waiting for each answer) sees results immediately while a
+piped session is written in large blocks. Standard input is read in raw
+chunks, bypassing the line-by-line text layer.
+"""
+import io
+import os
+import sys
+import select
+import logging
+from calculator.config import get_config
+from calculator.numeric import get_numeric_mode
+
+EXIT_COMMANDS = ('exit', 'quit')
+
+class _TrieNode:
+    __slots__ = ('children', 'name', 'count', 'unique')
+
+    def __init__(self):
+        self.children = {}
+        self.name = None    # Command whose name ends at this node
+        self.count = 0      # Number of commands below this node
+        self.unique = None  # The command below this node, while there is only one
+
+
+class CommandTrie:
+    """
+    Prefix tree over command names, resolving a name or a unique prefix of one
+    in time proportional to the length of the prefix.
+    """
+    def __init__(self, names=()):
+        self.root = _TrieNode()
+        for name in names:
+            self.insert(name)
+
+    def insert(self, name):
+        """
+        Add a command name.
+        """
+        node = self.root
+        for char in name:
+            node = node.children.setdefault(char, _TrieNode())
+            node.count += 1
+            node.unique = name if node.count == 1 else None
+        node.name = name
+
+    def _find(self, prefix):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def resolve(self, prefix):
+        """
+        Return the command a full name or unique prefix refers to.
+        A full name always wins, so 'add' resolves even if 'addall' exists.
+        :raises KeyError: If no command starts with `prefix`.
+        :raises ValueError: If several commands start with `prefix`.
+        """
+        node = self._find(prefix) if prefix else None
+        if node is None:
+            raise KeyError(f"Unknown command: '{prefix}'")
+        if node.name is not None:
+            return node.name
+        if node.unique is not None:
+            return node.unique
+        raise ValueError(f"Ambiguous command '{prefix}': {', '.join(self.completions(prefix))}")
+
+    def completions(self, prefix):
+        """
+        Return all command names starting with `prefix`, sorted.
+        """
+        node = self._find(prefix)
+        names = []
+        stack = [node] if node is not None else []
+        while stack:
+            node = stack.pop()
+            if node.name is not None:
+                names.append(node.name)
+            stack.extend(node.children.values())
+        return sorted(names)
+
+
+def _read_lines(stream, chunk_bytes):
+    """
+    Yield (line, buffered) pairs from a stream, where `buffered` is True if more
+    input is already in memory. Real files and pipes are read in raw chunks of
+    `chunk_bytes`, so whether input is waiting only has to be asked once per chunk.
+    """
+    try:
+        fileno = stream.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        for line in stream:  # In-memory streams never block
+            yield line, True
+        return
+    encoding = getattr(stream, 'encoding', None) or 'utf-8'
+    partial = b''
+    while True:
+        chunk = os.read(fileno, chunk_bytes)
+        if not chunk:
+            if partial:
+                yield partial.decode(encoding, errors='replace'), False
+            return
+        lines = (partial + chunk).split(b'\n')
+        partial = lines.pop()
+        last = len(lines) - 1
+        for index, line in enumerate(lines):
+            yield line.decode(encoding, errors='replace'), index < last
+
+def _input_waiting(fileno):
+    """
+    Return True if more input can be read from a file descriptor without blocking.
+    """
+    try:
+        return bool(select.select([fileno], [], [], 0)[0])
+    except (OSError, ValueError):
+        return False  # Not selectable (e.g. a pipe on Windows): flush every line
+
+
+class FastREPL:
+    """
+    Reads single-line commands from a stream and writes one output line per command.
+    """
+    def __init__(self, command_handler, history_manager=None, chunk_lines=None, read_chunk_bytes=None):
+        """
+        :param history_manager: If given, successful calculations are saved to history.
+        :param chunk_lines: Maximum number of output lines held before writing;
+            defaults to the BATCH_OUTPUT_CHUNK_LINES setting.
+        :param read_chunk_bytes: Bytes read from the input at a time; defaults to
+            the REPL_READ_CHUNK_BYTES setting.
+        """
+        config = get_config()
+        self.command_handler = command_handler
+        self.history_manager = history_manager
+        self.chunk_lines = chunk_lines or config.batch_output_chunk_lines
+        self.read_chunk_bytes = read_chunk_bytes or config.repl_read_chunk_bytes
+        self.trie = CommandTrie(command_handler.commands)
+
+    def execute_line(self, line):
+        """
+        Run one command line.
+        :return: The output line, or None if the command has nothing to report.
+        """
+        name, *args = line.split()
+        name = self.trie.resolve(name.lower())
+        arity = self.command_handler.descriptors[name].arity
+        if arity is None:
+            result = self.command_handler.execute_command(name, *args)
+            return None if result is None else str(result)
+
+        if len(args) != arity:
+            raise ValueError(f"Expected {arity} operands, got {len(args)}.")
+        parse = get_numeric_mode().parse
+        operands = [parse(arg) for arg in args]
+        result = self.command_handler.execute_command(name, *operands)
+        if self.history_manager is not None and arity == 2:
+            self.history_manager.save_to_history(name, *operands, result)
+        return str(result)
+
+    def run(self, input_stream=None, output=None):
+        """
+        Execute commands until the input ends or an `exit` line.
+        :param input_stream: Stream of command lines; defaults to stdin.
+        :param output: Stream results are written to; defaults to stdout.
+        :return: Number of commands executed.
+        """
+        input_stream = input_stream or sys.stdin
+        output = output or sys.stdout
+        pending = []
+        count = 0
+        try:
+            for line_number, (line, buffered) in enumerate(_read_lines(input_stream, self.read_chunk_bytes), start=1):
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if line.lower() in EXIT_COMMANDS:
+                    break
+                if pending and self._prints_directly(line):
+                    # Commands such as menu print themselves; keep their output in order
+                    self._write(pending, output)
+                try:
+                    result = self.execute_line(line)
+                except (ValueError, ZeroDivisionError, KeyError) as e:
+                    message = e.args[0] if e.args else str(e)
+                    logging.error("Line %s: Error: %s", line_number, message)
+                    result = f"Error: {message}"
+                count += 1
+                if result is not None:
+                    pending.append(result)
+                if pending and (len(pending) >= self.chunk_lines
+                                or not (buffered or _input_waiting(input_stream.fileno()))):
+                    self._write(pending, output)
+        finally:
+            self._write(pending, output)
+        return count
+
+    def _prints_directly(self, line):
+        """
+        Return True if the line runs a command without an arity (which may print).
+        """
+        try:
+            name = self.trie.resolve(line.split(None, 1)[0].lower())
+        except (KeyError, ValueError):
+            return False
+        return self.command_handler.descriptors[name].arity is None
+
+    @staticmethod
+    def _write(pending, output):
+        if pending:
+            output.write('\n'.join(pending) + '\n')
+            pending.clear()
+        output.flush()
@@ -0,0 +1,171 @@
+"""
+Asyncio calculation server exposing the CommandHandler over a local socket.
+
+Protocol: one JSON object per line in each direction.
+    request:  {"id": 1, "command": "add", "args": [1, 2]}
+    response: {"id": 1, "result": 3}
+              {"id": 1, "error": "Cannot divide by zero.", "type": "ZeroDivisionError"}
+
+Operands are converted to the current numeric mode (see calculator.numeric)
+before the command runs, so in decimal mode 0.1 is Decimal('0.1'); Decimal and
+Fraction results are sent as strings, e.g. {"id": 1, "result": "0.3"}.
+
+Only calculation commands (those with a fixed number of operands) can be run;
+commands such as clearhistory or exporthistory are refused with an error.
+Requests on a connection are answered in order, and clients may pipeline: send
+many requests without waiting for the responses. Plugins are loaded once when the
+server starts, and history entries are written by a single background task.
+"""
+import json
+import asyncio
+import logging
+from decimal import Decimal
+from fractions import Fraction
+from calculator.numeric import get_numeric_mode
+
+def _encode_number(value):
+    """
+    JSON-encode the exact number types as their text, e.g. "0.3" or "1/3".
+    """
+    if isinstance(value, (Decimal, Fraction)):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class CalculatorServer:
+    """
+    Serves commands from a CommandHandler over TCP or a Unix domain socket.
+    """
+    def __init__(self, command_handler, history_manager=None, host='127.0.0.1', port=8765, path=None):
+        """
+        :param command_handler: CommandHandler with the plugins already registered.
+        :param history_manager: If given, successful calculations are saved to history.
+        :param path: Serve on this Unix socket path instead of host/port.
+        """
+        self.command_handler = command_handler
+        self.history_manager = history_manager
+        self.host = host
+        self.port = port
+        self.path = path
+        self.server = None
+        self.history_queue = None
+        self.history_task = None
+
+    async def start(self):
+        """
+        Start listening and start the history writer task.
+        """
+        self.history_queue = asyncio.Queue()
+        self.history_task = asyncio.create_task(self._write_history())
+        if self.path:
+            self.server = await asyncio.start_unix_server(self._handle_client, path=self.path)
+            logging.info("Calculation server listening on unix socket '%s'.", self.path)
+        else:
+            self.server = await asyncio.start_server(self._handle_client, self.host, self.port)
+            self.port = self.server.sockets[0].getsockname()[1]
+            logging.info("Calculation server listening on %s:%s.", self.host, self.port)
+
+    async def serve_forever(self):
+        """
+        Start the server and serve until cancelled, then shut down cleanly.
+        """
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        """
+        Stop accepting connections and write out all pending history entries.
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if self.history_task is not None:
+            await self.history_queue.put(None)
+            await self.history_task
+            self.history_task = None
+        if self.history_manager is not None:
+            self.history_manager.flush()
+        logging.info("Calculation server stopped.")
+
+    async def _handle_client(self, reader, writer):
+        """
+        Answer requests from one client, in order, until it disconnects.
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                writer.write(self.encode_response(self.handle_request(line)))
+                # Only waits when the client is not reading its responses fast enough
+                await writer.drain()
+        except ConnectionError as e:
+            logging.warning("Client connection lost: %s", e)
+        finally:
+            writer.close()
+
+    def handle_request(self, line):
+        """
+        Execute one request line and return the response object.
+        """
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            command_name = request['command']
+            args = request.get('args', [])
+            descriptor = self.command_handler.descriptors.get(command_name)
+            if descriptor is None:
+                raise KeyError(f"Command '{command_name}' not found.")
+            # Commands without operands (history, menu, profile, ...) print to the server's
+            # console or touch its files, so clients may only run calculations
+            if descriptor.arity is None:
+                raise ValueError(f"Command '{command_name}' is not available over the server.")
+            # JSON can carry any type, so arguments are checked against the command's metadata first
+            descriptor.validate(args)
+            # Through repr, so a JSON 0.1 becomes Decimal('0.1') rather than the nearest binary float,
+            # and a JSON integer becomes a float in float mode rather than an unbounded int
+            parse = get_numeric_mode().parse
+            args = [parse(repr(value)) for value in args]
+            result = self.command_handler.execute_command(command_name, *args)
+            if descriptor.pure and self.history_manager is not None:
+                self.history_queue.put_nowait((command_name, *args, result))
+            return {'id': request_id, 'result': result}
+        except (ValueError, ZeroDivisionError, KeyError, TypeError, AttributeError) as e:
+            if isinstance(e, json.JSONDecodeError):
+                e = ValueError(f"Invalid JSON request: {e}")
+            elif isinstance(e, AttributeError):
+                e = ValueError("A request must be a JSON object.")
+            message = e.args[0] if e.args else str(e)
+            return {'id': request_id, 'error': str(message), 'type': type(e).__name__}
+
+    @staticmethod
+    def encode_response(response):
+        """
+        Return a response object as one JSON line. A result that cannot be encoded
+        (e.g. an int with more digits than Python converts to text) is answered
+        with an error instead.
+        """
+        try:
+            return json.dumps(response, default=_encode_number).encode('utf-8') + b'\n'
+        except (TypeError, ValueError) as e:
+            error = {'id': response.get('id'), 'error': f"Result cannot be sent: {e}", 'type': 'ValueError'}
+            return json.dumps(error).encode('utf-8') + b'\n'
+
+    async def _write_history(self):
+        """
+        Background task that is the only writer of history entries.
+        """
+        while True:
+            entry = await self.history_queue.get()
+            if entry is None:
+                return
+            if self.history_manager is not None:
+                # A failed save must not stop the task that saves every client's entries
+                try:
+                    self.history_manager.save_to_history(*entry)
+                except Exception as e:  # pylint: disable=broad-exception-caught
+                    logging.error("Could not save %s to history: %s", entry[0], e)
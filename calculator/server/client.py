@@ -0,0 +1,94 @@
+"""
+Asyncio client for the calculation server.
+
+    client = await CalculatorClient.connect('127.0.0.1', 8765)
+    result = await client.call('add', 1, 2)
+    results = await asyncio.gather(*(client.call('add', i, 1) for i in range(100)))  # pipelined
+    await client.close()
+"""
+import json
+import asyncio
+import itertools
+
+# Server error types that are raised as the same exception type by the client
+ERROR_TYPES = {
+    'ValueError': ValueError,
+    'ZeroDivisionError': ZeroDivisionError,
+    'KeyError': KeyError,
+    'TypeError': TypeError,
+}
+
+class CalculatorClient:
+    """
+    A connection to a CalculatorServer. Calls can be issued concurrently; they are
+    pipelined over the single connection and matched to responses by id.
+    """
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        self.ids = itertools.count(1)
+        self.reader_task = asyncio.create_task(self._read_responses())
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765):
+        """
+        Connect to a server over TCP.
+        """
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    @classmethod
+    async def connect_unix(cls, path):
+        """
+        Connect to a server over a Unix domain socket.
+        """
+        reader, writer = await asyncio.open_unix_connection(path)
+        return cls(reader, writer)
+
+    async def call(self, command, *args):
+        """
+        Execute a command on the server and return its result.
+        Errors raised by the command are raised again here with the same type.
+        """
+        request_id = next(self.ids)
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        request = {'id': request_id, 'command': command, 'args': list(args)}
+        self.writer.write(json.dumps(request).encode('utf-8') + b'\n')
+        await self.writer.drain()
+        response = await future
+        if 'error' in response:
+            raise ERROR_TYPES.get(response.get('type'), RuntimeError)(response['error'])
+        return response['result']
+
+    async def _read_responses(self):
+        """
+        Resolve pending calls as their responses arrive.
+        """
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self.pending.pop(response.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection to the calculation server closed."))
+            self.pending.clear()
+
+    async def close(self):
+        """
+        Close the connection.
+        """
+        self.writer.close()
+        await self.writer.wait_closed()
+        self.reader_task.cancel()
+        try:
+            await self.reader_task
+        except asyncio.CancelledError:
+            pass
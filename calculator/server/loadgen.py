@@ -0,0 +1,95 @@
+"""
+Load generator for the calculation server.
+
+    python -m calculator.server.loadgen --port 8765 --connections 8 --requests 20000 --pipeline 32
+
+Each connection keeps up to `--pipeline` requests in flight. Reports requests per
+second and p50/p99 latency.
+"""
+import sys
+import time
+import random
+import asyncio
+import argparse
+from calculator.server.client import CalculatorClient
+
+COMMANDS = ('add', 'subtract', 'multiply', 'divide')
+
+def percentile(sorted_values, fraction):
+    """
+    Return the value at `fraction` (0..1) of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+async def _run_connection(connect, requests, pipeline, latencies, errors):
+    """
+    Send `requests` requests over one connection with up to `pipeline` in flight.
+    """
+    client = await connect()
+    limit = asyncio.Semaphore(pipeline)
+
+    async def one_request():
+        async with limit:
+            started = time.perf_counter()
+            try:
+                await client.call(random.choice(COMMANDS), random.uniform(1, 100), random.uniform(1, 100))
+            except (ValueError, ZeroDivisionError, KeyError, TypeError, RuntimeError):
+                errors.append(1)
+            finally:
+                latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one_request() for _ in range(requests)))
+    await client.close()
+
+async def run_load(host='127.0.0.1', port=8765, path=None, connections=8, requests=10_000, pipeline=32):
+    """
+    Run the load test.
+    :param requests: Total number of requests, spread evenly over the connections.
+    :return: Dictionary with requests, errors, seconds, requests_per_second, p50_ms and p99_ms.
+    """
+    if path:
+        connect = lambda: CalculatorClient.connect_unix(path)  # pylint: disable=unnecessary-lambda-assignment
+    else:
+        connect = lambda: CalculatorClient.connect(host, port)  # pylint: disable=unnecessary-lambda-assignment
+
+    latencies = []
+    errors = []
+    per_connection = max(1, requests // connections)
+    started = time.perf_counter()
+    await asyncio.gather(*(_run_connection(connect, per_connection, pipeline, latencies, errors)
+                           for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+def main(argv=None):
+    """
+    Command-line entry point.
+    """
+    parser = argparse.ArgumentParser(description="Load generator for the calculation server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', metavar='PATH', help="Connect to a Unix socket instead of host/port.")
+    parser.add_argument('--connections', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=10_000)
+    parser.add_argument('--pipeline', type=int, default=32, help="Requests in flight per connection.")
+    args = parser.parse_args(argv)
+
+    stats = asyncio.run(run_load(args.host, args.port, args.unix, args.connections, args.requests, args.pipeline))
+    print(f"{stats['requests']} requests ({stats['errors']} errors) in {stats['seconds']:.2f}s: "
+          f"{stats['requests_per_second']:.0f} req/s, p50 {stats['p50_ms']:.2f} ms, p99 {stats['p99_ms']:.2f} ms")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,8 +5,105 @@ This script initializes and runs the main application by creating an instance of
 and invoking its `start` method. 
 The `Calculator` class is responsible for loading plugins, handling commands, 
 and managing the application's core logic.
+
+With `--batch FILE` (or `--batch -` for stdin) operations are read one per line,
+e.g. `add 1 2` or `add,1,2`, and results are written to stdout or `--output FILE`.
+Add `--workers N` to spread a large batch over N processes.
+With `--serve` the calculator runs as a line-delimited JSON server (see calculator.server).
+With `--fast` the prompts are dropped: one command per line (`add 3 4`, or `a 3 4`
+using a unique prefix), results written in blocks, suited to driving through a pipe.
+`--mode decimal --precision 50` or `--mode fraction` selects exact arithmetic (see calculator.numeric).
+`--export-history FILE` / `--import-history FILE` stream the history to or from CSV or JSON Lines,
+e.g. `data/backup.jsonl.gz` (see calculator.plugins.history.transfer).
+Any setting can be given with `--set NAME=VALUE`, e.g. `--set HISTORY_BACKEND=sqlite`,
+over the config file (`--config FILE`, default data/config.env) and the environment
+(see calculator.config).
 """
+import sys
+import argparse
 from calculator import CalculatorApp
+from calculator.config import SETTINGS
+from calculator.numeric import NUMERIC_MODES
+
+SETTING_VARIABLES = frozenset(setting.variable for setting in SETTINGS)
+
+def setting_assignment(text):
+    """
+    Parse a `NAME=VALUE` setting given on the command line.
+    """
+    name, separator, value = text.partition('=')
+    name = name.strip().upper()
+    if not separator or name not in SETTING_VARIABLES:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE with a known setting name, got '{text}'")
+    return name, value.strip()
+
+def parse_arguments(argv=None):
+    """
+    Parse command-line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Advanced Python Calculator")
+    parser.add_argument('--batch', metavar='FILE',
+                        help="Run operations from FILE ('-' for stdin) instead of the interactive prompt.")
+    parser.add_argument('--output', metavar='FILE',
+                        help="Write batch results to FILE instead of stdout.")
+    parser.add_argument('--workers', type=int, metavar='N',
+                        help="Run the batch on N worker processes (0 for one per CPU; default: CALC_WORKERS).")
+    parser.add_argument('--serve', action='store_true',
+                        help="Run the line-delimited JSON calculation server.")
+    parser.add_argument('--host', help="Server address (default: CALC_SERVER_HOST or 127.0.0.1).")
+    parser.add_argument('--port', type=int, help="Server port (default: CALC_SERVER_PORT or 8765).")
+    parser.add_argument('--unix', metavar='PATH', help="Serve on a Unix socket instead of host/port.")
+    parser.add_argument('--fast', action='store_true',
+                        help="Prompt-free REPL reading one command per line, e.g. 'add 3 4'.")
+    parser.add_argument('--mode', choices=NUMERIC_MODES,
+                        help="Numeric mode for operands and results (default: CALC_NUMERIC_MODE or float).")
+    parser.add_argument('--precision', type=int, metavar='DIGITS',
+                        help="Significant digits in decimal mode (default: CALC_DECIMAL_PRECISION or 28).")
+    parser.add_argument('--export-history', metavar='FILE',
+                        help="Export the history to FILE (.csv or .jsonl, optionally .gz or .xz) and exit.")
+    parser.add_argument('--import-history', metavar='FILE',
+                        help="Append the entries of FILE (.csv or .jsonl, optionally .gz or .xz) to the history and exit.")
+    parser.add_argument('--history-format', choices=['csv', 'jsonl'],
+                        help="Format of the export or import file, if its extension does not tell.")
+    parser.add_argument('--config', metavar='FILE',
+                        help="Read settings from FILE instead of data/config.env (or CALC_CONFIG_FILE).")
+    parser.add_argument('--set', type=setting_assignment, action='append', default=[], metavar='NAME=VALUE',
+                        dest='settings', help="Override a setting, e.g. HISTORY_BUFFER_ROWS=5000; may be repeated.")
+    return parser.parse_args(argv)
+
+def config_overrides(args):
+    """
+    Collect the settings given on the command line; dedicated flags win over --set.
+    """
+    overrides = dict(args.settings)
+    for variable, value in (('CALC_NUMERIC_MODE', args.mode), ('CALC_DECIMAL_PRECISION', args.precision),
+                            ('CALC_WORKERS', args.workers)):
+        if value is not None:
+            overrides[variable] = str(value)
+    return overrides
 
 if __name__ == "__main__":
-    CalculatorApp().start()  # Run the app without assigning the return since it's not needed.
+    args = parse_arguments()
+    app = CalculatorApp(config_overrides(args), args.config)
+    if args.import_history or args.export_history:
+        # Import first, so both flags together copy a file's entries into the history and back out
+        try:
+            if args.import_history:
+                app.import_history(args.import_history, args.history_format)
+            if args.export_history:
+                app.export_history(args.export_history, args.history_format)
+        except (ValueError, OSError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+    elif args.serve:
+        app.serve(args.host, args.port, args.unix)
+    elif args.batch and app.settings.workers is not None:
+        stats = app.run_parallel_batch(args.batch, args.output)
+        print(f"{stats['operations']} operations in {stats['seconds']:.2f}s "
+              f"({stats['operations_per_second']:.0f} ops/s, {stats['workers']} workers)", file=sys.stderr)
+    elif args.batch:
+        app.run_batch(args.batch, args.output)
+    elif args.fast:
+        app.run_repl()
+    else:
+        app.start()  # Run the app without assigning the return since it's not needed.
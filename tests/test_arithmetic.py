@@ -2,12 +2,15 @@
 Unit tests for arithmetic commands in the calculator application.
 
 This module contains pytest unit tests for AddCommand, SubtractCommand, MultiplyCommand,
-and DivideCommand, verifying that each command performs the correct operation and raises
+DivideCommand, PowerCommand and ModuloCommand, verifying that each command performs the correct operation and raises
 appropriate errors for invalid input.
 """
 
+from fractions import Fraction
+import numpy as np
 import pytest
-from calculator.plugins.arithmetic import AddCommand, SubtractCommand, MultiplyCommand, DivideCommand
+from calculator.plugins.arithmetic import (AddCommand, SubtractCommand, MultiplyCommand, DivideCommand, PowerCommand,
+                                          ModuloCommand)
 
 def test_add_command():
     """Test addition operation and error handling in AddCommand."""
@@ -44,3 +47,54 @@ def test_divide_command():
 
     with pytest.raises(ValueError):
         command.execute(5, "three")  # Invalid input type
+
+def test_power_command():
+    """Test exponentiation and the results that are not finite real numbers."""
+    command = PowerCommand()
+    assert command.execute(2, 3) == 8
+    assert command.execute(4.0, 0.5) == 2.0
+    with pytest.raises(ValueError, match="not a real number"):
+        command.execute(-8.0, 0.5)
+    with pytest.raises(ValueError, match="too large"):
+        command.execute(10.0, 400.0)
+    with pytest.raises(ValueError):
+        command.execute(2, "three")  # Invalid input type
+
+def test_exact_power_size_limit():
+    """Test that exact powers too large to show are refused before they are computed."""
+    command = PowerCommand()
+    with pytest.raises(ValueError, match="too large"):
+        command.execute(7, 3000000)
+    with pytest.raises(ValueError, match="too large"):
+        command.execute(Fraction(1, 3), 10000)
+    assert command.execute(2, 100) == 2 ** 100
+    assert command.execute(1, 10 ** 9) == 1
+    assert command.execute(-1, 10 ** 9 + 1) == -1
+
+def test_modulo_command():
+    """Test the remainder operation and error handling in ModuloCommand."""
+    command = ModuloCommand()
+    assert command.execute(7, 2) == 1
+    assert command.execute(-7, 3) == 2
+    with pytest.raises(ZeroDivisionError):
+        command.execute(7, 0)
+
+def test_arithmetic_execute_batch():
+    """Test vectorized execution of each arithmetic command."""
+    a = np.array([6.0, -2.0, 0.5])
+    b = np.array([3.0, 4.0, 2.0])
+    assert AddCommand().execute_batch(a, b)[0].tolist() == [9.0, 2.0, 2.5]
+    assert SubtractCommand().execute_batch(a, b)[0].tolist() == [3.0, -6.0, -1.5]
+    assert MultiplyCommand().execute_batch(a, b)[0].tolist() == [18.0, -8.0, 1.0]
+    assert DivideCommand().execute_batch(a, b)[0].tolist() == [2.0, -0.5, 0.25]
+    assert PowerCommand().execute_batch(a, b)[0].tolist() == [216.0, 16.0, 0.25]
+    assert ModuloCommand().execute_batch(a, b)[0].tolist() == [0.0, 2.0, 0.5]
+    results, errors = PowerCommand().execute_batch(np.array([-8.0, 4.0]), np.array([0.5, 0.5]))
+    assert errors.tolist() == [True, False] and np.isnan(results[0]) and results[1] == 2.0
+
+def test_divide_execute_batch_zero_mask():
+    """Test that division by zero is reported per element instead of raising."""
+    results, errors = DivideCommand().execute_batch(np.array([1.0, 2.0, 3.0]), np.array([1.0, 0.0, 3.0]))
+    assert errors.tolist() == [False, True, False]
+    assert results[0] == 1.0 and results[2] == 1.0
+    assert np.isnan(results[1])
@@ -0,0 +1,65 @@
+"""
+Tests for the queue-based logging pipeline and calculation log sampling.
+"""
+
+import io
+import logging
+from calculator.asynclog import (LogSampler, DeferredQueueHandler, start_async_logging,
+                                 stop_async_logging, async_logging_active)
+
+class CaptureHandler(logging.Handler):
+    """A handler defined outside the logging package, which must stay synchronous."""
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def test_async_logging_writes_and_restores_handlers():
+    """Test that records go through the listener and handlers are restored on stop."""
+    logger = logging.getLogger('calculator.test.asynclog')
+    logger.propagate = False
+    stream = io.StringIO()
+    stream_handler = logging.StreamHandler(stream)
+    capture = CaptureHandler()
+    logger.addHandler(stream_handler)
+    logger.addHandler(capture)
+    try:
+        assert start_async_logging(logger) is not None
+        assert async_logging_active()
+        assert stream_handler not in logger.handlers
+        assert any(isinstance(handler, DeferredQueueHandler) for handler in logger.handlers)
+        assert capture in logger.handlers
+        for number in range(100):
+            logger.warning("calculation %s", number)
+        stop_async_logging()
+        assert not async_logging_active()
+        assert stream.getvalue().splitlines() == [f"calculation {number}" for number in range(100)]
+        assert len(capture.records) == 100
+        assert stream_handler in logger.handlers
+        assert not any(isinstance(handler, DeferredQueueHandler) for handler in logger.handlers)
+    finally:
+        stop_async_logging()
+        logger.handlers.clear()
+
+def test_deferred_queue_handler_does_not_format():
+    """Test that message arguments are left for the listener to format."""
+    record = logging.LogRecord('test', logging.INFO, __file__, 1, "value %s", (42,), None)
+    prepared = DeferredQueueHandler(None).prepare(record)
+    assert prepared.msg == "value %s" and prepared.args == (42,)
+
+def test_stop_async_logging_when_not_running():
+    """Test that stopping without a listener is a no-op."""
+    stop_async_logging()
+    assert not async_logging_active()
+
+def test_log_sampler_rates():
+    """Test evenly spaced sampling and clamping of the rate."""
+    quarter, every, never = LogSampler(0.25), LogSampler(), LogSampler(0)
+    assert [quarter.sample() for _ in range(4)] == [False, False, False, True]
+    assert sum(quarter.sample() for _ in range(96)) == 24
+    assert all(every.sample() for _ in range(10))
+    assert not any(never.sample() for _ in range(10))
+    assert LogSampler(5).rate == 1.0
+    assert LogSampler(-1).rate == 0.0
@@ -0,0 +1,94 @@
+"""
+Unit tests for the non-interactive batch mode.
+"""
+import io
+import logging
+import pytest
+from calculator.batch import parse_operations, execute_operations, write_chunks, run_batch
+from calculator.commands import CommandHandler
+from calculator.plugins.arithmetic import AddCommand, DivideCommand
+from calculator.plugins.history import HistoryManager, ShowHistoryCommand, ClearHistoryCommand
+
+@pytest.fixture
+def command_handler():
+    """Fixture for a CommandHandler with a few arithmetic commands."""
+    handler = CommandHandler()
+    handler.register_command("add", AddCommand())
+    handler.register_command("divide", DivideCommand())
+    return handler
+
+def test_parse_operations():
+    """Test parsing whitespace separated and CSV lines, skipping blanks and comments."""
+    lines = ["add 1 2\n", "\n", "# comment\n", "Divide,6, 3\n", "add , 1,2\n", "eval a*2 a=1,2,3\n"]
+    assert list(parse_operations(lines)) == [
+        (1, 'add', ['1', '2']),
+        (4, 'divide', ['6', '3']),
+        (5, 'add', ['1', '2']),
+        (6, 'eval', ['a*2', 'a=1,2,3']),
+    ]
+
+def test_execute_operations_reports_errors_per_line(command_handler, caplog):
+    """Test that failing lines produce an error line and do not stop the batch."""
+    operations = parse_operations(["add 1 2", "divide 1 0", "add one 2", "power 2 3", "add 1", "divide 9 3"])
+    with caplog.at_level(logging.ERROR):
+        results = list(execute_operations(command_handler, operations))
+    assert results[0] == "3.0"
+    assert results[1].startswith("Error:")
+    assert results[2].startswith("Error:")
+    assert results[3] == "Error: Unknown command: 'power'"
+    assert results[4].startswith("Error:")
+    assert results[5] == "3.0"
+    assert "Line 4: Unknown command: 'power'" in caplog.text
+
+def test_execute_operations_saves_history(command_handler):
+    """Test that successful calculations are saved to history."""
+    saved = []
+
+    class RecordingHistory:
+        """Collects saved entries."""
+        def save_to_history(self, *entry):
+            saved.append(entry)
+
+    list(execute_operations(command_handler, parse_operations(["add 1 2", "divide 1 0"]), RecordingHistory()))
+    assert saved == [('add', 1.0, 2.0, 3.0)]
+
+def test_write_chunks():
+    """Test that output is written in blocks."""
+    output = io.StringIO()
+    assert write_chunks((str(i) for i in range(5)), output, chunk_lines=2) == 5
+    assert output.getvalue() == "0\n1\n2\n3\n4\n"
+
+def test_run_batch_from_file(command_handler, tmp_path):
+    """Test a complete batch run from an input file to an output file."""
+    source = tmp_path / "ops.txt"
+    source.write_text("add 1 2\nadd,2,2\n")
+    destination = tmp_path / "results.txt"
+    assert run_batch(command_handler, str(source), str(destination)) == 2
+    assert destination.read_text() == "3.0\n4.0\n"
+
+def test_run_batch_from_stdin(command_handler, monkeypatch, capsys):
+    """Test reading operations from stdin and writing results to stdout."""
+    monkeypatch.setattr('sys.stdin', io.StringIO("add 5 5\n"))
+    run_batch(command_handler, '-')
+    assert capsys.readouterr().out == "10.0\n"
+
+def test_execute_operations_eval(command_handler):
+    """Test that eval lines output their result, or an error line."""
+    from calculator.plugins.expression import EvalCommand  # pylint: disable=import-outside-toplevel
+    command_handler.register_command("eval", EvalCommand(command_handler))
+    operations = parse_operations(["eval (a+b)/c a=1 b=2 c=2", "eval a/0 a=1", "eval a+"])
+    assert list(execute_operations(command_handler, operations)) == [
+        "1.5", "Error: Cannot divide by zero.", "Error: Invalid expression: 'a+'",
+    ]
+
+def test_run_batch_writes_printed_output(command_handler, tmp_path, capsys):
+    """Test that what commands without operands print goes to the output file, not the console."""
+    history = HistoryManager(history_file=str(tmp_path / "history.csv"))
+    command_handler.register_command("showhistory", ShowHistoryCommand(history))
+    command_handler.register_command("clearhistory", ClearHistoryCommand(history))
+    source = tmp_path / "ops.txt"
+    source.write_text("clearhistory\nshowhistory\nadd 1 2\n")
+    destination = tmp_path / "results.txt"
+    assert run_batch(command_handler, str(source), str(destination)) == 3
+    assert destination.read_text() == "History has been cleared.\nNo history available.\n3.0\n"
+    assert capsys.readouterr().out == ""
@@ -0,0 +1,36 @@
+"""
+Unit tests for the benchmark runner's comparison and reporting helpers.
+"""
+import json
+from benchmarks import run
+
+def test_compare_results_flags_regressions():
+    """Test that only metrics slower than the threshold are reported."""
+    baseline = {'fast': 1.0, 'same': 1.0, 'slow': 1.0, 'removed': 1.0}
+    current = {'fast': 0.5, 'same': 1.1, 'slow': 1.5, 'new': 9.0}
+    assert run.compare_results(current, baseline, 0.2) == [('slow', 1.0, 1.5, 1.5)]
+
+def test_format_seconds():
+    """Test duration formatting."""
+    assert run.format_seconds(2.5) == "2.500 s"
+    assert run.format_seconds(0.0015) == "1.500 ms"
+    assert run.format_seconds(2e-6) == "2.000 us"
+    assert run.format_seconds(5e-8) == "50.0 ns"
+
+def test_main_compare_exit_code(tmp_path, monkeypatch, capsys):
+    """Test that --compare fails the run when a metric regresses."""
+    monkeypatch.setattr(run, 'run_benchmarks', lambda sizes, batch_size: {'metric': 2.0})
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({'results': {'metric': 1.0}}))
+    assert run.main(['--quick', '--compare', str(baseline)]) == 1
+    assert "REGRESSION metric" in capsys.readouterr().out
+    assert run.main(['--quick', '--compare', str(baseline), '--threshold', '1.5']) == 0
+
+def test_main_writes_json(tmp_path, monkeypatch):
+    """Test that results are written as JSON with metadata."""
+    monkeypatch.setattr(run, 'run_benchmarks', lambda sizes, batch_size: {'metric': 1.0})
+    output = tmp_path / "results.json"
+    assert run.main(['--sizes', '10', '--output', str(output)]) == 0
+    report = json.loads(output.read_text())
+    assert report['results'] == {'metric': 1.0}
+    assert 'python' in report['meta']
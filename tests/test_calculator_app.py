@@ -4,6 +4,7 @@ Unit tests for the CalculatorApp functionality in the calculator application.
 This module tests core features of CalculatorApp, including starting the app
 and loading environment variables.
 """
+from unittest import mock
 from calculator import CalculatorApp
 
 def test_calculator_start(monkeypatch):
@@ -17,3 +18,36 @@ def test_environment_variable_loading():
     """Test that CalculatorApp loads environment variables correctly."""
     app = CalculatorApp()
     assert app.load_environment_variables() is not None
+
+
+def test_calculator_run_batch(tmp_path):
+    """Test that CalculatorApp runs a batch file through the loaded plugins."""
+    source = tmp_path / "ops.txt"
+    source.write_text("add 1 2\nmultiply 2 3\n")
+    destination = tmp_path / "results.txt"
+    app = CalculatorApp()
+    app.history_manager.save_to_history = lambda *entry: None  # Keep the test out of data/history.csv
+    assert app.run_batch(str(source), str(destination)) == 2
+    assert destination.read_text() == "3.0\n6.0\n"
+
+
+def test_batch_and_server_export_metrics_and_profile(tmp_path):
+    """Test that batch, parallel batch and server runs write metrics and the profile on exit."""
+    source = tmp_path / "ops.txt"
+    source.write_text("add 1 2\n")
+    app = CalculatorApp()
+    app.history_manager.save_to_history = lambda *entry: None  # Keep the test out of data/history.csv
+
+    def interrupted(coroutine):
+        coroutine.close()
+        raise KeyboardInterrupt
+
+    with mock.patch.object(app, 'export_metrics') as export_metrics, \
+            mock.patch.object(app, 'export_profile') as export_profile:
+        app.run_batch(str(source), str(tmp_path / "results.txt"))
+        with mock.patch('calculator.parallel.ParallelEngine.run', return_value={}):
+            app.run_parallel_batch(str(source), workers=1)
+        with mock.patch('asyncio.run', side_effect=interrupted):
+            app.serve(port=0)
+    assert export_metrics.call_count == 3
+    assert export_profile.call_count == 3
@@ -86,6 +86,18 @@ def test_add_command(mock_save_to_history, mock_execute_command, mock_input, app
     mock_save_to_history.assert_called_once_with('add', 5, 10, 15)
 
 
+@mock.patch('builtins.input', side_effect=['add 3', 'add 1 2 3', 'exit'])
+@mock.patch.object(CommandHandler, 'execute_command')
+def test_wrong_operand_count(mock_execute_command, mock_input, app, caplog):
+    """Test that a wrong number of operands on the command line is rejected without prompting."""
+    with caplog.at_level(logging.ERROR):
+        app.start()
+    assert "Error: Expected 2 operands, got 1." in caplog.text
+    assert "Error: Expected 2 operands, got 3." in caplog.text
+    assert mock_input.call_count == 3
+    mock_execute_command.assert_not_called()
+
+
 @mock.patch('builtins.input', side_effect=['divide', '5', '0', 'exit'])
 @mock.patch.object(CommandHandler, 'execute_command', side_effect=ZeroDivisionError("division by zero"))
 def test_divide_by_zero(mock_execute_command, mock_input, app, caplog):
@@ -102,3 +114,49 @@ def test_clear_history_command(mock_execute_command, mock_input, app):
     """Test clear history command."""
     app.start()
     mock_execute_command.assert_any_call('clearhistory')
+
+
+def test_history_commands_share_app_history_manager(app):
+    """Test that the history commands use the app's HistoryManager instead of their own."""
+    app.plugin_manager.load_plugins()
+    for command_name in ('showhistory', 'clearhistory'):
+        command = app.command_handler.commands[command_name]
+        if hasattr(command, 'load'):
+            command = command.load()  # Lazily registered from the plugin manifest
+        assert command.history_manager is app.history_manager
+
+
+def test_configure_log_sampling(app, caplog):
+    """Test setting the calculation log sampling rate and ignoring invalid values."""
+    from calculator.asynclog import calculation_sampler  # pylint: disable=import-outside-toplevel
+    try:
+        app.configure_log_sampling('0.1')
+        assert calculation_sampler.rate == 0.1
+        with caplog.at_level(logging.WARNING):
+            app.configure_log_sampling('often')
+        assert calculation_sampler.rate == 0.1
+        assert "Ignoring invalid LOG_SAMPLE_RATE: 'often'" in caplog.text
+    finally:
+        calculation_sampler.rate = 1.0
+
+def test_configure_numeric_mode(app, caplog):
+    """Test selecting the numeric mode and ignoring invalid settings."""
+    from calculator.numeric import get_numeric_mode, set_numeric_mode  # pylint: disable=import-outside-toplevel
+    try:
+        app.configure_numeric_mode('decimal', '40')
+        assert (get_numeric_mode().name, get_numeric_mode().precision) == ('decimal', 40)
+        with caplog.at_level(logging.WARNING):
+            app.configure_numeric_mode('roman')
+        assert get_numeric_mode().name == 'decimal'
+        assert "Ignoring invalid numeric mode settings" in caplog.text
+    finally:
+        set_numeric_mode('float')
+
+
+@mock.patch('builtins.input', side_effect=['eval (a + b) * c a=1 b=2 c=3', 'eval 1/0', 'exit'])
+def test_eval_command(mock_input, app, capsys, caplog):
+    """Test evaluating expressions from the prompt, including errors."""
+    with caplog.at_level(logging.ERROR):
+        app.start()
+    assert "Result: 9.0" in capsys.readouterr().out
+    assert "Error: Cannot divide by zero." in caplog.text
@@ -3,7 +3,8 @@ Unit tests for Command and CommandHandler classes in calculator/commands.
 """
 
 import pytest
-from calculator.commands import Command, CommandHandler
+from calculator.commands import Command, CommandHandler, CommandDescriptor
+from calculator.plugins.arithmetic import AddCommand
 
 class SampleCommand(Command):
     """A sample command for testing."""
@@ -23,3 +24,113 @@ def test_command_handler_invalid_command():
     handler = CommandHandler()
     with pytest.raises(KeyError):
         handler.execute_command("nonexistent")  # Should raise an error
+
+def test_command_handler_execute_batch():
+    """Test vectorized batch execution through CommandHandler."""
+    handler = CommandHandler()
+    handler.register_command("add", AddCommand())
+    results, errors = handler.execute_batch("add", [1, 2, 3], [4, 5, 6])
+    assert results.tolist() == [5, 7, 9]
+    assert not errors.any()
+
+def test_command_handler_execute_batch_invalid():
+    """Test batch execution errors for unknown, non-vectorized and non-numeric input."""
+    handler = CommandHandler()
+    handler.register_command("sample", SampleCommand())
+    handler.register_command("add", AddCommand())
+    with pytest.raises(KeyError):
+        handler.execute_batch("nonexistent", [1], [2])
+    with pytest.raises(TypeError):
+        handler.execute_batch("sample", [1], [2])
+    with pytest.raises(ValueError):
+        handler.execute_batch("add", ["five"], [2])
+
+class CountingCommand(Command):
+    """A pure sample command that counts how often it really runs."""
+    pure = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def execute(self, *args):
+        self.calls += 1
+        return sum(args)
+
+def test_command_handler_cache_hits_and_evictions():
+    """Test LRU memoization of pure commands and the cache counters."""
+    handler = CommandHandler(cache_size=2)
+    command = CountingCommand()
+    handler.register_command("sum", command)
+    assert handler.execute_command("sum", 1, 2) == 3
+    assert handler.execute_command("sum", 1, 2) == 3
+    assert command.calls == 1
+    handler.execute_command("sum", 2, 2)
+    handler.execute_command("sum", 1, 2)  # Refreshes (1, 2), so (2, 2) is least recently used
+    handler.execute_command("sum", 3, 3)  # Evicts (2, 2)
+    handler.execute_command("sum", 2, 2)
+    assert command.calls == 4
+    assert handler.cache_info() == {'hits': 2, 'misses': 4, 'evictions': 2, 'size': 2, 'max_size': 2}
+
+def test_command_handler_cache_keeps_argument_types():
+    """Test that equal arguments of different types are cached separately."""
+    handler = CommandHandler(cache_size=8)
+    handler.register_command("add", AddCommand())
+    assert isinstance(handler.execute_command("add", 1, 2), int)
+    assert isinstance(handler.execute_command("add", 1.0, 2.0), float)
+
+def test_command_handler_cache_skips_impure_commands():
+    """Test that commands not declared pure are always executed."""
+    handler = CommandHandler(cache_size=8)
+    command = CountingCommand()
+    command.pure = False
+    handler.register_command("sum", command)
+    handler.execute_command("sum", 1)
+    handler.execute_command("sum", 1)
+    assert command.calls == 2
+    assert handler.cache_info()['misses'] == 0
+
+def test_command_handler_cache_disabled_by_default():
+    """Test that results are not memoized unless a cache size is given."""
+    handler = CommandHandler()
+    command = CountingCommand()
+    handler.register_command("sum", command)
+    handler.execute_command("sum", 1)
+    handler.execute_command("sum", 1)
+    assert command.calls == 2
+
+def test_command_descriptor_is_computed_at_registration():
+    """Test that registration records arity, operand types, purity and vectorization."""
+    handler = CommandHandler()
+    handler.register_command("add", AddCommand())
+    handler.register_command("sample", SampleCommand())
+    add = handler.descriptors["add"]
+    assert (add.arity, add.pure, add.vectorized) == (2, True, True)
+    assert float in add.operand_types
+    sample = handler.descriptors["sample"]
+    assert (sample.arity, sample.operand_types, sample.pure, sample.vectorized) == (None, None, False, False)
+    with pytest.raises(AttributeError):
+        add.arity = 3
+
+def test_command_descriptor_validate():
+    """Test argument checks against the descriptor."""
+    descriptor = CommandDescriptor("add", AddCommand())
+    descriptor.validate((1, 2.5))
+    with pytest.raises(ValueError, match="expects 2 operands, got 1"):
+        descriptor.validate((1,))
+    for bad in ("1", True, None):
+        with pytest.raises(ValueError, match="must be numbers"):
+            descriptor.validate((1, bad))
+    CommandDescriptor("sample", SampleCommand()).validate(("anything", 1, 2))
+
+def test_command_handler_cache_size_change_rebuilds_dispatch():
+    """Test that switching the cache on after registration routes pure commands through it."""
+    handler = CommandHandler()
+    command = CountingCommand()
+    handler.register_command("sum", command)
+    handler.cache_size = 4
+    handler.execute_command("sum", 1)
+    handler.execute_command("sum", 1)
+    assert command.calls == 1
+    handler.cache_size = 0
+    handler.execute_command("sum", 1)
+    assert command.calls == 2
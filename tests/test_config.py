@@ -0,0 +1,75 @@
+"""
+Tests for the typed settings object: sources, precedence, validation and the command-line flags.
+"""
+import logging
+from unittest import mock
+import pytest
+from calculator import CalculatorApp
+from calculator.config import Config, get_config, set_config
+from calculator.plugins.history import HistoryManager
+from main import parse_arguments, config_overrides
+
+@pytest.fixture(autouse=True)
+def restore_config():
+    """Fixture that reloads the shared Config after each test."""
+    yield
+    set_config(None)
+
+def test_precedence(tmp_path):
+    """Test that overrides beat the environment, which beats the config file, which beats the defaults."""
+    config_file = tmp_path / "config.env"
+    config_file.write_text("HISTORY_BUFFER_ROWS=50\nHISTORY_RECENT_SIZE=60\nCOMMAND_CACHE_SIZE=70\n")
+    environ = {'HISTORY_RECENT_SIZE': '600', 'COMMAND_CACHE_SIZE': '700'}
+    config = Config.load({'COMMAND_CACHE_SIZE': '7000'}, str(config_file), environ)
+    assert (config.history_buffer_rows, config.history_recent_size, config.command_cache_size) == (50, 600, 7000)
+    assert config.history_flush_interval == 1.0
+    assert config.replace(HISTORY_BUFFER_ROWS='5').history_buffer_rows == 5
+
+def test_reads_only_known_variables(tmp_path):
+    """Test that only settings are copied from the environment; other variables are looked up on demand."""
+    environ = {'HISTORY_BACKEND': 'sqlite', 'ENVIRONMENT': 'test', 'UNRELATED': 'x'}
+    config = Config.load(path=str(tmp_path / "missing.env"), environ=environ)
+    assert config._raw == {'HISTORY_BACKEND': 'sqlite'}
+    assert config.get('ENVIRONMENT') == 'test'
+    assert config.get('NON_EXISTENT_VAR') is None
+
+def test_parsed_once_and_read_only():
+    """Test that values are parsed on first access and cached, and cannot be changed."""
+    config = Config({'HISTORY_BUFFER_ROWS': '10'})
+    assert config._values == {}
+    assert config.history_buffer_rows == 10
+    assert config._values == {'history_buffer_rows': 10}
+    with pytest.raises(AttributeError, match="read-only"):
+        config.history_buffer_rows = 20
+    with pytest.raises(AttributeError, match="Unknown setting"):
+        config.history_buffer_size  # pylint: disable=pointless-statement
+
+def test_invalid_values_fall_back(caplog):
+    """Test that invalid values are logged and replaced by their defaults."""
+    config = Config({'HISTORY_BUFFER_ROWS': 'many', 'LOG_SAMPLE_RATE': '2', 'HISTORY_BACKEND': 'SQLite',
+                     'CALC_METRICS': 'maybe'})
+    with caplog.at_level(logging.WARNING):
+        settings = config.as_dict()
+    assert settings['history_buffer_rows'] == 1000 and settings['log_sample_rate'] == 1.0
+    assert settings['history_backend'] == 'sqlite' and settings['metrics'] is False
+    assert "Ignoring invalid HISTORY_BUFFER_ROWS: 'many'" in caplog.text
+    assert "Ignoring invalid CALC_METRICS: 'maybe'" in caplog.text
+
+def test_subsystems_share_config(tmp_path):
+    """Test that the app installs its Config and subsystems take their defaults from it."""
+    app = CalculatorApp({'HISTORY_BUFFER_ROWS': '42', 'EXPRESSION_CACHE_SIZE': '8'})
+    assert get_config() is app.settings
+    assert HistoryManager(history_file=str(tmp_path / "history.csv")).buffer_rows == 42
+    app.plugin_manager.load_plugins()
+    assert app.command_handler.commands['eval'].cache_size == 8
+    assert app.get_environment_variable('HISTORY_BUFFER_ROWS') == '42'
+
+def test_cli_flags(tmp_path):
+    """Test that --set, --config and the dedicated flags become overrides."""
+    args = parse_arguments(['--set', 'history_buffer_rows=5000', '--set', 'CALC_WORKERS=2', '--workers', '4',
+                            '--mode', 'decimal', '--config', str(tmp_path / "fast.env")])
+    assert config_overrides(args) == {'HISTORY_BUFFER_ROWS': '5000', 'CALC_WORKERS': '4',
+                                      'CALC_NUMERIC_MODE': 'decimal'}
+    assert args.config == str(tmp_path / "fast.env")
+    with mock.patch('sys.stderr'), pytest.raises(SystemExit):
+        parse_arguments(['--set', 'NO_SUCH_SETTING=1'])
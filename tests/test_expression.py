@@ -0,0 +1,121 @@
+"""
+Tests for the eval command and the expression compiler.
+"""
+
+import numpy as np
+import pytest
+from calculator.commands import Command, CommandHandler
+from calculator.plugins.arithmetic import AddCommand, SubtractCommand, MultiplyCommand, DivideCommand, ModuloCommand
+from calculator.plugins.arithmetic import PowerCommand as ArithmeticPowerCommand
+from calculator.plugins.expression import EvalCommand, compile_expression
+
+class PowerCommand(Command):
+    """A plugin-style command used as the ** operator."""
+    arity = 2
+
+    def execute(self, a, b):
+        return a ** b
+
+    def execute_batch(self, a, b):
+        return np.power(a, b), np.zeros(np.broadcast(a, b).shape, dtype=bool)
+
+@pytest.fixture
+def command_handler():
+    """A CommandHandler with the arithmetic commands and eval registered."""
+    handler = CommandHandler()
+    handler.register_command('add', AddCommand())
+    handler.register_command('subtract', SubtractCommand())
+    handler.register_command('multiply', MultiplyCommand())
+    handler.register_command('divide', DivideCommand())
+    handler.register_command('eval', EvalCommand(handler))
+    return handler
+
+def test_eval_with_variables(command_handler):
+    """Test evaluating an expression with variables through the command handler."""
+    result = command_handler.execute_command('eval', '(a+b)*c/d', 'a=1', 'b=2', 'c=3', 'd=4')
+    assert result == 2.25
+    assert command_handler.execute_command('eval', '-a', '+', '2', '*', '3', 'a=1') == 5
+
+def test_eval_uses_registered_commands(command_handler):
+    """Test that operators and calls run registered commands, including plugin ones."""
+    with pytest.raises(ValueError, match="Unknown operator or function: 'power'"):
+        command_handler.execute_command('eval', 'a**2', 'a=3')
+    command_handler.register_command('power', PowerCommand())
+    assert command_handler.execute_command('eval', 'a**2', 'a=3') == 9
+    assert command_handler.execute_command('eval', 'power(a,2) + 1', 'a=3') == 10
+
+def test_eval_rejects_commands_without_operands(command_handler):
+    """Test that calls to commands without an arity, or with the wrong argument count, fail at compile time."""
+    cleared = []
+
+    class ClearCommand(Command):
+        """A command without operands, like clearhistory."""
+        def execute(self, *args):
+            cleared.append(args)
+
+    command_handler.register_command('clearhistory', ClearCommand())
+    with pytest.raises(ValueError, match="'clearhistory' cannot be used in an expression"):
+        command_handler.execute_command('eval', 'clearhistory()')
+    with pytest.raises(ValueError, match="'clearhistory' cannot be used in an expression"):
+        command_handler.execute_command('eval', 'a + clearhistory()', 'a=1,2')
+    with pytest.raises(ValueError, match="'add' takes 2 arguments, got 3"):
+        command_handler.execute_command('eval', 'add(1, 2, 3)')
+    with pytest.raises(ValueError, match="Unknown operator or function: 'nothing'"):
+        command_handler.execute_command('eval', 'nothing(1)')
+    assert not cleared
+
+def test_eval_power_and_modulo():
+    """Test that ** and % run the power and modulo commands of the arithmetic plugin."""
+    handler = CommandHandler()
+    handler.register_command('add', AddCommand())
+    handler.register_command('power', ArithmeticPowerCommand())
+    handler.register_command('modulo', ModuloCommand())
+    handler.register_command('eval', EvalCommand(handler))
+    assert handler.execute_command('eval', '2**3 + 7%2') == 9
+    assert handler.execute_command('eval', 'a**2 % 5', 'a=1,2,3').tolist() == [1, 4, 4]
+
+def test_eval_vectors(command_handler):
+    """Test vectorized evaluation, with failed rows flagged and set to NaN."""
+    evaluator = command_handler.commands['eval']
+    results = command_handler.execute_command('eval', 'a*2+b', 'a=1,2,3', 'b=10')
+    assert results.tolist() == [12, 14, 16]
+    results, errors = compile_expression('a/b').evaluate_batch(command_handler, {'a': [1, 2, 3], 'b': [1, 0, 2]})
+    assert errors.tolist() == [False, True, False]
+    assert results[0] == 1 and np.isnan(results[1]) and results[2] == 1.5
+    assert evaluator.evaluate('a-1', {'a': np.arange(4.0)}).tolist() == [-1, 0, 1, 2]
+
+def test_eval_errors(command_handler):
+    """Test rejected expressions, missing variables and division by zero."""
+    with pytest.raises(ValueError, match="Invalid expression"):
+        command_handler.execute_command('eval', '(a+')
+    with pytest.raises(ValueError, match="Unsupported expression element"):
+        command_handler.execute_command('eval', "__import__('os')")
+    with pytest.raises(ValueError, match="Unsupported expression element"):
+        command_handler.execute_command('eval', 'a.real')
+    with pytest.raises(ValueError, match="No value given for: b"):
+        command_handler.execute_command('eval', 'a+b', 'a=1')
+    with pytest.raises(ValueError, match="Usage"):
+        command_handler.execute_command('eval')
+    with pytest.raises(ZeroDivisionError):
+        command_handler.execute_command('eval', '1/a', 'a=0')
+
+def test_eval_rejects_deep_or_long_expressions(command_handler):
+    """Test that deeply nested or overlong expressions are errors rather than stack overflows."""
+    for text in ('-' * 5000 + '1', '-' * 300 + '1', '+'.join(['a'] * 300), '(' * 1000 + '1' + ')' * 1000):
+        with pytest.raises(ValueError, match="too deeply nested|Invalid expression"):
+            compile_expression(text)
+    with pytest.raises(ValueError, match="too long"):
+        compile_expression('1+' * 10000 + '1')
+    assert command_handler.execute_command('eval', '-' * 150 + '1') == 1
+    assert command_handler.execute_command('eval', '+'.join(['a'] * 150), 'a=1') == 150
+
+def test_eval_compile_cache(command_handler):
+    """Test that compiled expressions are reused and the cache is bounded."""
+    evaluator = EvalCommand(command_handler, cache_size=2)
+    first = evaluator.compile('a+1')
+    assert evaluator.compile('a+1') is first
+    evaluator.compile('a+2')
+    evaluator.compile('a+1')  # Most recently used again
+    evaluator.compile('a+3')
+    assert [text for _, text in evaluator.compiled] == ['a+1', 'a+3']
+    assert first.variables == ('a',)
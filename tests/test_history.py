@@ -8,6 +8,8 @@ import os
 import pytest
 import pandas as pd
 from calculator.plugins.history import HistoryManager
+from calculator.plugins.history.writer import HistoryWriter
+from calculator.plugins.history.query import HistoryQuery
 
 @pytest.fixture
 def history_manager(tmp_path):
@@ -72,3 +74,75 @@ def test_save_to_history_multiple_entries(history_manager):
         'Operand2': 3,
         'Result': 2
     }
+
+def test_save_to_history_matches_pandas_layout(history_manager, tmp_path):
+    """Test that buffered rows are written exactly as pandas' to_csv would write them."""
+    rows = [("add", 1.5, 2.0, 3.5), ("divide", 1, 3, 1 / 3), ("multiply", 1e20, -2.0, -2e20)]
+    for row in rows:
+        history_manager.save_to_history(*row)
+    history_manager.flush()
+
+    expected_file = tmp_path / "expected.csv"
+    pd.DataFrame(columns=['Operation', 'Operand1', 'Operand2', 'Result']).to_csv(expected_file, index=False)
+    for row in rows:
+        pd.DataFrame([row], columns=['Operation', 'Operand1', 'Operand2', 'Result']).to_csv(
+            expected_file, mode='a', header=False, index=False)
+    with open(history_manager.history_file, 'rb') as actual, open(expected_file, 'rb') as expected:
+        assert actual.read() == expected.read()
+
+def test_history_writer_buffers_until_limit(tmp_path):
+    """Test that the writer holds rows in memory until the row limit is reached."""
+    path = tmp_path / "buffered.csv"
+    writer = HistoryWriter(str(path), max_rows=3, flush_interval=3600)
+    writer.write(("add", 1, 2, 3))
+    writer.write(("add", 2, 2, 4))
+    assert not path.exists()
+    writer.write(("add", 3, 2, 5))
+    assert path.read_text().splitlines() == ["add,1,2,3", "add,2,2,4", "add,3,2,5"]
+    writer.write(("add", 4, 2, 6))
+    writer.close()
+    assert path.read_text().splitlines()[-1] == "add,4,2,6"
+
+def test_clear_history_discards_buffered_rows(history_manager):
+    """Test that clearing history drops rows that have not been flushed yet."""
+    history_manager.save_to_history("add", 5, 3, 8)
+    history_manager.clear_history()
+    history_manager.flush()
+    assert history_manager.load_history().empty
+
+def test_recent_entries_served_from_memory(history_manager, monkeypatch):
+    """Test that showing history right after calculations does not read the file."""
+    history_manager.save_to_history("add", 1, 2, 3)
+    history_manager.save_to_history("multiply", 2, 3, 6)
+
+    def no_disk_read(*args, **kwargs):
+        raise AssertionError("history was read from disk")
+
+    monkeypatch.setattr(history_manager.storage, 'query', no_disk_read)
+    monkeypatch.setattr(history_manager.storage, 'load', no_disk_read)
+    assert history_manager.query_history()['Result'].tolist() == [3, 6]
+    assert len(history_manager.load_history()) == 2
+
+def test_recent_index_seeded_from_existing_file(tmp_path):
+    """Test that a new manager seeds its recent entries from an existing history file once."""
+    path = str(tmp_path / "history.csv")
+    writer_manager = HistoryManager(history_file=path)
+    for i in range(5):
+        writer_manager.save_to_history("add", i, 1, i + 1)
+    writer_manager.flush()
+
+    manager = HistoryManager(history_file=path, recent_size=3)
+    assert manager.recent is None
+    assert manager.query_history(HistoryQuery(last=3))['Result'].tolist() == [3, 4, 5]
+    assert [record.row() for record in manager.recent] == [("add", 2, 1, 3), ("add", 3, 1, 4), ("add", 4, 1, 5)]
+    assert not manager.recent_complete
+
+def test_partial_recent_index_falls_back_to_storage(tmp_path):
+    """Test that queries beyond the in-memory entries are answered from the file."""
+    manager = HistoryManager(history_file=str(tmp_path / "history.csv"), recent_size=3)
+    for i in range(10):
+        manager.save_to_history("add", i, 1, i + 1)
+    assert not manager.recent_complete
+    assert manager.query_history(HistoryQuery(last=2))['Result'].tolist() == [9, 10]
+    assert manager.query_history(HistoryQuery(last=5))['Result'].tolist() == [6, 7, 8, 9, 10]
+    assert manager.query_history(HistoryQuery(page=1, page_size=2))['Result'].tolist() == [1, 2]
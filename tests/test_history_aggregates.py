@@ -0,0 +1,118 @@
+"""
+Tests for the running per-operation history aggregates and the historystats command.
+"""
+import os
+import math
+from fractions import Fraction
+import pytest
+from calculator.plugins.history import HistoryManager, HistoryStatsCommand
+from calculator.plugins.history.aggregates import HistoryAggregates
+
+@pytest.fixture(params=['csv', 'binary', 'sqlite'])
+def filled_manager(request, tmp_path):
+    """Fixture for a HistoryManager of each backend holding 20 entries."""
+    manager = HistoryManager(backend=request.param, history_file=str(tmp_path / f"history.{request.param}"))
+    for i in range(20):
+        operation = 'divide' if i % 4 == 0 else 'add'
+        manager.save_to_history(operation, i, 1, float(i))
+    return manager
+
+def expected(values):
+    """Reference statistics for a list of results."""
+    mean = sum(values) / len(values)
+    return len(values), sum(values), mean, math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+
+def check_stats(stats):
+    """Compare aggregates of the filled_manager entries with reference values."""
+    divides = [float(i) for i in range(20) if i % 4 == 0]
+    adds = [float(i) for i in range(20) if i % 4 != 0]
+    for name, values in (('divide', divides), ('add', adds)):
+        count, total, mean, stddev = expected(values)
+        assert stats[name].count == count
+        assert stats[name].total == pytest.approx(total)
+        assert stats[name].mean == pytest.approx(mean)
+        assert stats[name].stddev == pytest.approx(stddev)
+        assert (stats[name].minimum, stats[name].maximum) == (min(values), max(values))
+
+def test_aggregates_updated_incrementally(filled_manager):
+    """Test that aggregates are maintained as entries are saved."""
+    check_stats(filled_manager.operation_stats())
+    assert set(filled_manager.operation_stats('divide')) == {'divide'}
+    assert filled_manager.operation_stats('power') == {}
+
+def test_aggregates_loaded_from_sidecar(filled_manager, monkeypatch):
+    """Test that flushed aggregates are read back from the sidecar without a rebuild."""
+    filled_manager.flush()
+    assert os.path.exists(filled_manager.aggregates.path)
+
+    def no_rebuild(*args, **kwargs):
+        raise AssertionError("aggregates were rebuilt")
+
+    monkeypatch.setattr(filled_manager.storage, 'operation_totals', no_rebuild)
+    check_stats(HistoryAggregates(filled_manager.storage).get())
+
+def test_aggregates_rebuilt_when_sidecar_missing_or_stale(filled_manager):
+    """Test lazy rebuilds from the history when the sidecar is unusable."""
+    filled_manager.flush()
+    os.remove(filled_manager.aggregates.path)
+    check_stats(HistoryAggregates(filled_manager.storage).get())
+
+    filled_manager.aggregates.save()  # Nothing changed since the last save: no file written
+    assert not os.path.exists(filled_manager.aggregates.path)
+    filled_manager.aggregates.dirty = True
+    filled_manager.aggregates.save()
+    filled_manager.storage.append('add', 1, 1, 2.0)  # Written behind the aggregates' back
+    filled_manager.storage.flush()
+    stats = HistoryAggregates(filled_manager.storage).get()
+    assert stats['add'].count == 16
+
+def test_stale_sidecar_does_not_double_count(filled_manager):
+    """Test that entries saved while a rebuild is pending are counted once."""
+    filled_manager.flush()
+    os.remove(filled_manager.aggregates.path)
+    aggregates = HistoryAggregates(filled_manager.storage)
+    aggregates.add('add', 100.0)
+    filled_manager.storage.append('add', 99, 1, 100.0)
+    assert aggregates.get()['add'].count == 16
+    assert aggregates.get()['add'].maximum == 100.0
+
+def test_rows_from_another_process_are_not_stamped_as_counted(filled_manager):
+    """Test that the sidecar is not saved as up to date after another writer added rows it did not count."""
+    filled_manager.flush()
+    other = type(filled_manager.storage)(filled_manager.storage.path)  # Another process's view of the file
+    other.append('add', 99, 1, 100.0)
+    other.flush()
+    other.close()
+    filled_manager.save_to_history('add', 1, 1, 2.0)
+    filled_manager.flush()
+    stats = HistoryAggregates(filled_manager.storage).get()
+    assert (stats['add'].count, stats['add'].maximum) == (17, 100.0)
+    assert filled_manager.operation_stats()['add'].count == 17
+
+@pytest.mark.parametrize('result', [Fraction(10) ** 400, 10 ** 400])
+def test_results_too_large_for_a_float(filled_manager, result):
+    """Test that exact results beyond the float range are saved and counted as infinity instead of raising."""
+    filled_manager.save_to_history('multiply', result, 1, result)
+    filled_manager.flush()
+    assert filled_manager.operation_stats()['multiply'].maximum == math.inf
+    assert len(filled_manager.query_history()) == 20
+    filled_manager.aggregates.rebuild()
+    assert filled_manager.operation_stats()['multiply'].maximum == math.inf
+
+def test_clear_history_resets_aggregates(filled_manager):
+    """Test that clearing history also clears the aggregates."""
+    filled_manager.clear_history()
+    assert filled_manager.operation_stats() == {}
+    filled_manager.save_to_history('multiply', 2, 3, 6)
+    assert filled_manager.operation_stats()['multiply'].count == 1
+
+def test_historystats_command(filled_manager, capsys):
+    """Test the historystats table output."""
+    command = HistoryStatsCommand(filled_manager)
+    command.execute()
+    output = capsys.readouterr().out.splitlines()
+    assert output[0].split() == ['Operation', 'Count', 'Sum', 'Mean', 'StdDev', 'Min', 'Max']
+    assert output[1].split()[:3] == ['add', '15', '150']
+    assert output[2].split()[:3] == ['divide', '5', '40']
+    command.execute('power')
+    assert capsys.readouterr().out == "No history available.\n"
@@ -0,0 +1,82 @@
+"""
+Unit tests for the binary history backend and the CSV import/export tool.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from calculator.plugins.history import HistoryManager
+from calculator.plugins.history.binary import (
+    BinaryHistoryStorage, RECORD_DTYPE, HEADER_SIZE, import_csv, export_csv, main
+)
+
+@pytest.fixture
+def binary_manager(tmp_path):
+    """Fixture for a HistoryManager using the binary backend in a temporary directory."""
+    return HistoryManager(backend='binary', history_file=str(tmp_path / "history.bin"))
+
+def test_binary_save_and_load(binary_manager):
+    """Test that entries round-trip through the binary backend."""
+    binary_manager.save_to_history("add", 1, 2, 3)
+    binary_manager.save_to_history("divide", 1, 4, 0.25)
+    history = binary_manager.load_history()
+    assert list(history.columns) == ['Operation', 'Operand1', 'Operand2', 'Result']
+    assert history.to_dict('records') == [
+        {'Operation': 'add', 'Operand1': 1.0, 'Operand2': 2.0, 'Result': 3.0},
+        {'Operation': 'divide', 'Operand1': 1.0, 'Operand2': 4.0, 'Result': 0.25},
+    ]
+
+def test_binary_file_layout(binary_manager):
+    """Test the on-disk layout: fixed header followed by fixed-width records."""
+    binary_manager.save_to_history("add", 1, 2, 3)
+    binary_manager.save_to_history("multiply", 2, 2, 4)
+    binary_manager.flush()
+    with open(binary_manager.history_file, 'rb') as f:
+        data = f.read()
+    assert len(data) == HEADER_SIZE + 2 * RECORD_DTYPE.itemsize
+    records = np.frombuffer(data[HEADER_SIZE:], dtype=RECORD_DTYPE)
+    assert records['Operation'].tolist() == [0, 1]
+    assert records['Result'].tolist() == [3.0, 4.0]
+
+def test_binary_records_are_memory_mapped(binary_manager):
+    """Test that records are served from a read-only memory map."""
+    binary_manager.save_to_history("add", 1, 2, 3)
+    records = binary_manager.storage.records()
+    assert isinstance(records, np.memmap)
+    assert not records.flags.writeable
+
+def test_binary_reopen_keeps_operation_table(tmp_path):
+    """Test that a new storage instance reads operation names from the header."""
+    path = str(tmp_path / "history.bin")
+    storage = BinaryHistoryStorage(path)
+    storage.initialize()
+    storage.append("subtract", 5, 3, 2)
+    storage.close()
+    assert BinaryHistoryStorage(path).load()['Operation'].tolist() == ['subtract']
+
+def test_binary_clear_history(binary_manager):
+    """Test clearing the binary history."""
+    binary_manager.save_to_history("add", 1, 2, 3)
+    binary_manager.clear_history()
+    assert binary_manager.load_history().empty
+
+def test_csv_import_export_round_trip(tmp_path):
+    """Test migrating a CSV history to binary and back."""
+    csv_path = tmp_path / "history.csv"
+    original = pd.DataFrame({
+        'Operation': ['add', 'divide', 'add'],
+        'Operand1': [1.0, 9.0, 2.5],
+        'Operand2': [2.0, 3.0, 2.5],
+        'Result': [3.0, 3.0, 5.0],
+    })
+    original.to_csv(csv_path, index=False)
+
+    assert import_csv(str(csv_path), str(tmp_path / "history.bin"), chunksize=2) == 3
+    assert export_csv(str(tmp_path / "history.bin"), str(tmp_path / "exported.csv"), chunksize=2) == 3
+    pd.testing.assert_frame_equal(pd.read_csv(tmp_path / "exported.csv"), original)
+
+def test_migration_cli(tmp_path, capsys):
+    """Test the command-line entry point of the migration tool."""
+    csv_path = tmp_path / "history.csv"
+    pd.DataFrame({'Operation': ['add'], 'Operand1': [1], 'Operand2': [2], 'Result': [3]}).to_csv(csv_path, index=False)
+    assert main(['import', str(csv_path), str(tmp_path / "history.bin")]) == 0
+    assert "1 rows written" in capsys.readouterr().out
@@ -0,0 +1,109 @@
+"""
+Tests for sharing one CSV history file between several writers and processes.
+"""
+import os
+import multiprocessing
+import pytest
+from calculator.plugins.history.storage import CSVHistoryStorage, HISTORY_COLUMNS
+from calculator.plugins.history import HistoryManager, locking
+from calculator.plugins.history.query import HistoryQuery
+
+WRITERS = 6
+ROWS_PER_WRITER = 2000
+
+def write_rows(path, writer_id, rows):
+    """Append rows tagged with the writer id from a separate process."""
+    storage = CSVHistoryStorage(path, buffer_rows=37, flush_interval=float('inf'))
+    storage.rotation.max_bytes = 16 * 1024  # Rotate often to exercise concurrent rotation
+    for sequence in range(rows):
+        storage.append('add', writer_id, sequence, writer_id * rows + sequence)
+    storage.close()
+
+needs_fork = pytest.mark.skipif(locking.fcntl is None or 'fork' not in multiprocessing.get_all_start_methods(),
+                                reason="needs fcntl and fork")
+
+@needs_fork
+def test_many_processes_append_without_losing_rows(tmp_path):
+    """Stress test: several processes write and rotate one history; every row must survive intact."""
+    path = str(tmp_path / "history.csv")
+    CSVHistoryStorage(path).initialize()
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=write_rows, args=(path, writer_id, ROWS_PER_WRITER))
+                 for writer_id in range(WRITERS)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    storage = CSVHistoryStorage(path)
+    assert storage.segments(), "the history should have been rotated"
+    history = storage.load()
+    assert list(history.columns) == HISTORY_COLUMNS
+    assert len(history) == WRITERS * ROWS_PER_WRITER
+    assert (history['Operation'] == 'add').all()
+    # Every (writer, sequence) pair exactly once, and rows of each writer in order
+    assert not history.duplicated(['Operand1', 'Operand2']).any()
+    for _, rows in history.groupby('Operand1'):
+        assert rows['Operand2'].is_monotonic_increasing
+    assert (history['Result'] == history['Operand1'] * ROWS_PER_WRITER + history['Operand2']).all()
+
+@needs_fork
+def test_recent_entries_see_other_processes(tmp_path):
+    """Test that in-memory recent entries are reseeded when another process appends to the file."""
+    path = str(tmp_path / "history.csv")
+    manager = HistoryManager(history_file=path, buffer_rows=1)
+    for i in range(2):
+        manager.save_to_history('add', i, 2, 2)
+    assert len(manager.load_history()) == 2  # Served from memory
+    process = multiprocessing.get_context('fork').Process(target=write_rows, args=(path, 1, 5))
+    process.start()
+    process.join(60)
+    assert process.exitcode == 0
+    assert len(manager.load_history()) == 7
+    assert manager.query_history(HistoryQuery(last=3))['Result'].tolist() == [7, 8, 9]
+    manager.save_to_history('add', 9, 1, 10)
+    assert manager.query_history(HistoryQuery(last=2))['Result'].tolist() == [9, 10]
+
+def test_clear_is_atomic_and_seen_by_other_writers(tmp_path):
+    """Test that a writer holding the old file handle writes into the file that replaced it."""
+    path = str(tmp_path / "history.csv")
+    first = CSVHistoryStorage(path, buffer_rows=1)
+    first.initialize()
+    second = CSVHistoryStorage(path, buffer_rows=1)
+    first.append('add', 1, 1, 2)
+    second.append('add', 2, 2, 4)
+    inode = os.stat(path).st_ino
+    first.initialize()  # Clear: the file is replaced, not truncated in place
+    assert os.stat(path).st_ino != inode
+    assert not os.path.exists(f"{path}.tmp")
+    second.append('multiply', 3, 3, 9)
+    assert first.load()['Operation'].tolist() == ['multiply']
+
+def test_writer_recreates_missing_file_with_header(tmp_path):
+    """Test that a deleted history file is recreated with its header on the next write."""
+    path = str(tmp_path / "history.csv")
+    storage = CSVHistoryStorage(path, buffer_rows=1)
+    storage.initialize()
+    storage.append('add', 1, 1, 2)
+    os.remove(path)
+    storage.append('add', 2, 2, 4)
+    assert storage.load()['Result'].tolist() == [4]
+
+def test_reads_stream_the_history_as_it_was_when_they_began(tmp_path):
+    """Test that rows another writer appends, or a clear, while a read streams the active file are not seen."""
+    path = str(tmp_path / "history.csv")
+    reader = CSVHistoryStorage(path, buffer_rows=1)
+    reader.initialize()
+    for i in range(10):
+        reader.append('add', i, 1, i + 1)
+    blocks = reader.iter_csv(block_size=16)
+    chunks = reader.iter_chunks(4)
+    first_block, first_chunk = next(blocks), next(chunks)
+    writer = CSVHistoryStorage(path, buffer_rows=1)
+    writer.append('multiply', 1, 1, 1)
+    rows = (first_block + b''.join(blocks)).decode().splitlines()
+    assert rows == [f"add,{i},1,{i + 1}" for i in range(10)]
+    writer.initialize()
+    assert sum(len(chunk) for chunk in [first_chunk, *chunks]) == 10
+    assert reader.load()['Operation'].tolist() == []
@@ -0,0 +1,97 @@
+"""
+Unit tests for history queries: argument parsing, tail reads, pagination and filters
+across the history backends.
+"""
+import pytest
+from calculator.plugins.history import HistoryManager, ShowHistoryCommand
+from calculator.plugins.history.query import HistoryQuery
+
+@pytest.fixture(params=['csv', 'binary', 'sqlite'])
+def filled_manager(request, tmp_path):
+    """Fixture for a HistoryManager of each backend holding 100 entries."""
+    manager = HistoryManager(backend=request.param, history_file=str(tmp_path / f"history.{request.param}"))
+    for i in range(100):
+        operation = 'divide' if i % 4 == 0 else 'add'
+        manager.save_to_history(operation, i, 1, float(i))
+    return manager
+
+def test_parse_query_arguments():
+    """Test parsing of showhistory arguments."""
+    query = HistoryQuery.parse(['op=divide', 'result>=10', 'operand1=0..5', 'last', '3'])
+    assert query.operation == 'divide'
+    assert query.last == 3
+    assert query.conditions == [('Result', '>=', 10.0), ('Operand1', '>=', 0.0), ('Operand1', '<=', 5.0)]
+
+    query = HistoryQuery.parse(['page', '2', 'size=5'])
+    assert (query.page, query.page_size) == (2, 5)
+
+@pytest.mark.parametrize("args", [['last'], ['last', '0'], ['bogus'], ['color=red'], ['op>add'], ['result>=ten']])
+def test_parse_invalid_query_arguments(args):
+    """Test that malformed arguments are rejected."""
+    with pytest.raises(ValueError):
+        HistoryQuery.parse(args)
+
+def test_default_query_is_bounded(filled_manager):
+    """Test that a query without arguments returns only the most recent page."""
+    history = filled_manager.query_history()
+    assert history['Result'].tolist() == [float(i) for i in range(80, 100)]
+
+def test_tail_query(filled_manager):
+    """Test reading the last N entries."""
+    history = filled_manager.query_history(HistoryQuery.parse(['last', '3']))
+    assert history['Result'].tolist() == [97.0, 98.0, 99.0]
+
+def test_tail_query_larger_than_history(filled_manager):
+    """Test a tail read asking for more entries than exist."""
+    assert len(filled_manager.query_history(HistoryQuery(last=500))) == 100
+
+def test_page_query(filled_manager):
+    """Test reading one page of entries."""
+    history = filled_manager.query_history(HistoryQuery.parse(['page', '3', 'size=10']))
+    assert history['Result'].tolist() == [float(i) for i in range(20, 30)]
+
+def test_filtered_query(filled_manager):
+    """Test operation and range filters combined with a tail read."""
+    history = filled_manager.query_history(HistoryQuery.parse(['op=divide', 'result=10..50', 'last', '2']))
+    assert history['Operation'].tolist() == ['divide', 'divide']
+    assert history['Result'].tolist() == [44.0, 48.0]
+
+def test_time_filters_need_sqlite(filled_manager):
+    """Test that time filters are applied by sqlite and refused, not ignored, by the file backends."""
+    query = HistoryQuery.parse(['since=5'])
+    if filled_manager.backend == 'sqlite':
+        assert len(filled_manager.query_history(query)) == 20
+    else:
+        with pytest.raises(ValueError, match="only supported by the sqlite"):
+            filled_manager.query_history(query)
+
+def test_filtered_query_streams_in_chunks(tmp_path):
+    """Test that filtered queries give the same answer when read in small chunks."""
+    manager = HistoryManager(backend='csv', history_file=str(tmp_path / "history.csv"))
+    for i in range(50):
+        manager.save_to_history('add', i, 0, float(i))
+    query = HistoryQuery.parse(['result>10', 'last', '5'])
+    assert manager.storage.query(query, chunksize=7)['Result'].tolist() == [45.0, 46.0, 47.0, 48.0, 49.0]
+    query = HistoryQuery.parse(['result>10', 'page', '2', 'size=4'])
+    assert manager.storage.query(query, chunksize=3)['Result'].tolist() == [15.0, 16.0, 17.0, 18.0]
+
+def test_csv_tail_reads_across_blocks(tmp_path):
+    """Test the backwards tail read when the entries span several read blocks."""
+    manager = HistoryManager(backend='csv', history_file=str(tmp_path / "history.csv"))
+    for i in range(200):
+        manager.save_to_history('add', i, 0, float(i))
+    assert manager.storage.tail(150, block_size=64)['Result'].tolist() == [float(i) for i in range(50, 200)]
+
+def test_show_history_command_with_arguments(filled_manager, capsys):
+    """Test that showhistory passes its arguments on as a query."""
+    command = ShowHistoryCommand()
+    command.history_manager = filled_manager
+    command.execute('last', '1')
+    output = capsys.readouterr().out
+    assert "Calculation History:" in output
+    assert "99.0" in output and "98.0" not in output
+
+def test_show_history_command_invalid_arguments(capsys):
+    """Test that showhistory reports invalid arguments instead of raising."""
+    ShowHistoryCommand().execute('last', 'many')
+    assert "Error:" in capsys.readouterr().out
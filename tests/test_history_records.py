@@ -0,0 +1,79 @@
+"""
+Tests for the compact history record type and the in-memory ring buffer.
+"""
+import sqlite3
+from unittest import mock
+import pytest
+from calculator.plugins.history import HistoryManager
+from calculator.plugins.history.records import HistoryRecord, RingBuffer
+
+def test_history_record_is_compact():
+    """Test that records have no per-instance dict and compare by their fields."""
+    record = HistoryRecord('add', 1, 2, 3, timestamp=10.0)
+    assert not hasattr(record, '__dict__')
+    with pytest.raises(AttributeError):
+        record.note = "extra"
+    assert record.row() == ('add', 1, 2, 3)
+    assert record == HistoryRecord('add', 1, 2, 3, timestamp=10.0)
+    assert record != HistoryRecord('add', 1, 2, 3)
+    assert HistoryRecord.now('add', 1, 2, 3).timestamp is not None
+
+def test_ring_buffer_keeps_newest_items():
+    """Test appending past capacity, eviction and reading the newest items."""
+    ring = RingBuffer(3)
+    assert ring.append(1) is None and ring.append(2) is None
+    assert not ring.full and list(ring) == [1, 2]
+    assert ring.append(3) is None and ring.full
+    assert ring.append(4) == 1
+    ring.extend([5, 6])
+    assert list(ring) == [4, 5, 6]
+    assert ring.last(2) == [5, 6]
+    assert ring.last(10) == [4, 5, 6]
+    ring.clear()
+    assert len(ring) == 0 and list(ring) == []
+    with pytest.raises(ValueError):
+        RingBuffer(0)
+
+def test_manager_keeps_recent_records(tmp_path):
+    """Test that saved calculations are kept as timestamped records in the ring buffer."""
+    manager = HistoryManager(history_file=str(tmp_path / "history.csv"), recent_size=2)
+    for i in range(3):
+        manager.save_to_history('add', i, 1, i + 1)
+    records = manager.recent_records()
+    assert [record.row() for record in records] == [('add', 1, 1, 2), ('add', 2, 1, 3)]
+    assert all(record.timestamp is not None for record in records)
+    assert [record.result for record in manager.recent_records(1)] == [3]
+    assert not manager.recent_complete
+
+def test_sqlite_stores_record_timestamp(tmp_path):
+    """Test that the sqlite backend stores the timestamp taken when the record was created."""
+    path = str(tmp_path / "history.db")
+    manager = HistoryManager(backend='sqlite', history_file=path)
+    manager.save_to_history('multiply', 2, 3, 6)
+    manager.flush()
+    with sqlite3.connect(path) as conn:
+        created_at = conn.execute("SELECT created_at FROM history").fetchone()[0]
+    assert created_at == manager.recent_records()[0].timestamp
+
+@pytest.mark.parametrize('backend', ['csv', 'binary', 'sqlite'])
+def test_own_flushes_keep_recent_records(tmp_path, backend):
+    """Test that entries this manager saved and flushed are served from memory, not read back from storage."""
+    manager = HistoryManager(backend=backend, history_file=str(tmp_path / f"history.{backend}"), buffer_rows=1)
+    manager.save_to_history('add', 1, 2, 3)
+    manager.query_history()  # Seeds the in-memory entries
+    manager.save_to_history('add', 2, 2, 4)
+    manager.flush()
+    with mock.patch.object(manager.storage, 'tail_records', side_effect=AssertionError("read from storage")), \
+            mock.patch.object(manager.storage, 'query', side_effect=AssertionError("read from storage")):
+        assert manager.query_history()['Result'].tolist() == [3, 4]
+        assert len(manager.load_history()) == 2
+
+def test_other_manager_writes_reseed_recent_records(tmp_path):
+    """Test that a second manager writing through the same storage makes the first one reseed."""
+    first = HistoryManager(history_file=str(tmp_path / "history.csv"), buffer_rows=1)
+    second = HistoryManager(history_file=str(tmp_path / "history.csv"), buffer_rows=1)
+    first.save_to_history('add', 1, 2, 3)
+    assert len(first.load_history()) == 1
+    second.save_to_history('add', 2, 2, 4)
+    first.save_to_history('add', 3, 2, 5)
+    assert first.load_history()['Result'].tolist() == [3, 4, 5]
@@ -0,0 +1,81 @@
+"""
+Tests for rotating the CSV history into compressed segments and reading across them.
+"""
+import os
+import time
+import pytest
+from calculator.plugins.history import HistoryManager
+from calculator.plugins.history.query import HistoryQuery
+from calculator.plugins.history.aggregates import HistoryAggregates
+from calculator.plugins.history.binary import import_csv, BinaryHistoryStorage
+
+@pytest.fixture
+def rotating_manager(tmp_path):
+    """Fixture for a CSV HistoryManager that rotates every few hundred bytes."""
+    manager = HistoryManager(history_file=str(tmp_path / "history.csv"), buffer_rows=5, recent_size=5)
+    manager.storage.rotation.max_bytes = 200
+    for i in range(100):
+        manager.save_to_history('divide' if i % 10 == 0 else 'add', i, 1, float(i))
+    manager.flush()
+    return manager
+
+def test_history_rotated_into_compressed_segments(rotating_manager):
+    """Test that the active file stays small and older entries move to gzip segments."""
+    segments = rotating_manager.storage.segments()
+    assert len(segments) > 5
+    assert all(segment.endswith('.csv.gz') for segment in segments)
+    assert os.path.basename(segments[0]) == 'history.000001.csv.gz'
+    assert os.path.getsize(rotating_manager.history_file) < 400
+
+def test_reads_stream_across_segments(rotating_manager):
+    """Test that pages, tails, filters and full loads see every entry in order."""
+    everything = rotating_manager.query_history(HistoryQuery(page=1, page_size=1000))
+    assert everything['Result'].tolist() == [float(i) for i in range(100)]
+    assert rotating_manager.query_history(HistoryQuery(last=30))['Result'].tolist() == [float(i) for i in range(70, 100)]
+    divides = rotating_manager.query_history(HistoryQuery(operation='divide', last=100))
+    assert divides['Result'].tolist() == [float(i) for i in range(0, 100, 10)]
+    assert len(rotating_manager.load_history()) == 100
+
+def test_aggregates_rebuilt_across_segments(rotating_manager):
+    """Test that a rebuild of the aggregates includes the archived entries."""
+    os.remove(rotating_manager.aggregates.path)
+    stats = HistoryAggregates(rotating_manager.storage).get()
+    assert stats['add'].count == 90 and stats['divide'].count == 10
+
+def test_interrupted_compression_is_read_and_compacted(tmp_path):
+    """Test that an uncompressed segment is still read and gets compressed later (lzma)."""
+    manager = HistoryManager(history_file=str(tmp_path / "history.csv"), buffer_rows=1, recent_size=1)
+    manager.storage.rotation.codec = 'none'
+    manager.save_to_history('add', 1, 1, 2)
+    manager.storage.rotate()
+    assert manager.storage.segments()[0].endswith('history.000001.csv')
+    manager.storage.rotation.codec = 'lzma'
+    manager.save_to_history('add', 2, 1, 3)
+    manager.storage.rotate()
+    assert [os.path.basename(s) for s in manager.storage.segments()] == ['history.000001.csv.xz', 'history.000002.csv.xz']
+    manager.save_to_history('add', 3, 1, 4)
+    assert manager.query_history(HistoryQuery(last=10))['Result'].tolist() == [2, 3, 4]
+
+def test_age_based_rotation(tmp_path):
+    """Test that an old active file is rotated on the next flush."""
+    manager = HistoryManager(history_file=str(tmp_path / "history.csv"), buffer_rows=1)
+    rotation = manager.storage.rotation
+    rotation.max_bytes, rotation.max_age = 0, 60
+    manager.save_to_history('add', 1, 1, 2)
+    assert manager.storage.segments() == []
+    rotation.mark_started()
+    assert os.path.exists(rotation.state_path)
+    rotation._started = time.time() - 120  # pylint: disable=protected-access
+    manager.save_to_history('add', 2, 1, 3)
+    assert len(manager.storage.segments()) == 1
+
+def test_clear_history_removes_segments(rotating_manager):
+    """Test that clearing the history also deletes its segments."""
+    rotating_manager.clear_history()
+    assert rotating_manager.storage.segments() == []
+    assert rotating_manager.query_history(HistoryQuery(page=1, page_size=1000)).empty
+
+def test_import_csv_reads_segments(rotating_manager, tmp_path):
+    """Test that migrating to the binary format includes archived entries."""
+    assert import_csv(rotating_manager.history_file, str(tmp_path / "history.bin")) == 100
+    assert len(BinaryHistoryStorage(str(tmp_path / "history.bin")).records()) == 100
@@ -0,0 +1,96 @@
+"""
+Unit tests for the SQLite history backend and its connection pool.
+"""
+import sqlite3
+import threading
+import pytest
+from calculator.plugins.history import HistoryManager
+from calculator.plugins.history.query import HistoryQuery
+from calculator.plugins.history.sqlite import SQLiteHistoryStorage, SQLiteConnectionPool
+
+@pytest.fixture
+def sqlite_manager(tmp_path):
+    """Fixture for a HistoryManager using the SQLite backend in a temporary directory."""
+    return HistoryManager(backend='sqlite', history_file=str(tmp_path / "history.db"))
+
+def test_sqlite_save_and_load(sqlite_manager):
+    """Test that entries round-trip through the SQLite backend."""
+    sqlite_manager.save_to_history("add", 1, 2, 3)
+    sqlite_manager.save_to_history("divide", 1, 4, 0.25)
+    history = sqlite_manager.load_history()
+    assert history.to_dict('records') == [
+        {'Operation': 'add', 'Operand1': 1.0, 'Operand2': 2.0, 'Result': 3.0},
+        {'Operation': 'divide', 'Operand1': 1.0, 'Operand2': 4.0, 'Result': 0.25},
+    ]
+
+def test_sqlite_schema_uses_wal_and_indexes(sqlite_manager):
+    """Test that the database is in WAL mode and indexed on operation and time."""
+    sqlite_manager.flush()
+    conn = sqlite3.connect(sqlite_manager.history_file)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(history)")}
+    assert {"idx_history_operation", "idx_history_created_at"} <= indexes
+    conn.close()
+
+def test_sqlite_version_without_counting_rows(sqlite_manager):
+    """Test that the version follows appends and clears from the id and the clear generation alone."""
+    storage = sqlite_manager.storage
+    empty = storage.version()
+    sqlite_manager.save_to_history("add", 1, 2, 3)
+    sqlite_manager.flush()
+    assert storage.version() == [empty[0], 1]
+    sqlite_manager.clear_history()
+    assert storage.version() == [empty[0] + 1, None]  # As empty as before, but a different history
+    statements = []
+    with storage.pool.connection() as conn:
+        conn.set_trace_callback(statements.append)
+        storage._version(conn)  # pylint: disable=protected-access
+        conn.set_trace_callback(None)
+    assert not any('count(' in statement.lower() for statement in statements)
+
+def test_sqlite_query_filters(sqlite_manager):
+    """Test filtered and limited queries."""
+    for i in range(5):
+        sqlite_manager.save_to_history("add", i, 1, i + 1)
+        sqlite_manager.save_to_history("multiply", i, 2, i * 2)
+    storage = sqlite_manager.storage
+    assert storage.query(HistoryQuery(operation="multiply"))['Result'].tolist() == [0, 2, 4, 6, 8]
+    assert storage.query(HistoryQuery(operation="add", last=2))['Result'].tolist() == [4, 5]
+    assert storage.query(HistoryQuery(since=0, until=1)).empty
+    assert len(storage.query(HistoryQuery(since=0))) == 10
+
+def test_sqlite_clear_history(sqlite_manager):
+    """Test clearing the SQLite history."""
+    sqlite_manager.save_to_history("add", 1, 2, 3)
+    sqlite_manager.clear_history()
+    assert sqlite_manager.load_history().empty
+
+def test_sqlite_concurrent_writers(tmp_path):
+    """Test that several threads can log to the same database through the pool."""
+    path = str(tmp_path / "shared.db")
+    storage = SQLiteHistoryStorage(path, buffer_rows=10)
+    storage.initialize()
+
+    def worker(n):
+        for i in range(100):
+            storage.append(f"op{n}", i, i, i)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    history = storage.load()
+    storage.close()
+    assert len(history) == 400
+    assert history.groupby('Operation').size().tolist() == [100, 100, 100, 100]
+
+def test_connection_pool_reuses_connections(tmp_path):
+    """Test that the pool hands out at most `size` connections and reuses them."""
+    pool = SQLiteConnectionPool(str(tmp_path / "pool.db"), size=2)
+    with pool.connection() as first:
+        with pool.connection() as second:
+            assert first is not second
+    with pool.connection() as again:
+        assert again in (first, second)
+    pool.close()
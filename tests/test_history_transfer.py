@@ -0,0 +1,145 @@
+"""
+Tests for streaming history export and import (CSV, JSON Lines, compressed).
+"""
+import io
+import gzip
+import json
+from unittest import mock
+import pytest
+from calculator.plugins.history import HistoryManager, ExportHistoryCommand, ImportHistoryCommand
+from calculator.plugins.history.query import HistoryQuery
+from calculator.plugins.history.transfer import transfer_format, TransferProgress
+from main import parse_arguments
+
+BACKEND_FILES = [('csv', 'history.csv'), ('binary', 'history.bin'), ('sqlite', 'history.db')]
+
+def make_manager(tmp_path, backend='csv', file_name='history.csv', entries=10):
+    """Create a HistoryManager in tmp_path holding a few entries."""
+    manager = HistoryManager(backend=backend, history_file=str(tmp_path / file_name), buffer_rows=3)
+    for i in range(entries):
+        manager.save_to_history('divide' if i % 2 else 'add', i, 2, i + 0.5)
+    return manager
+
+def test_transfer_format():
+    """Test that the format comes from the extension, past a compression suffix."""
+    assert transfer_format('backup.csv') == 'csv'
+    assert transfer_format('backup.JSONL.gz') == 'jsonl'
+    assert transfer_format('backup.ndjson.xz') == 'jsonl'
+    assert transfer_format('backup.txt', 'jsonl') == 'jsonl'
+    with pytest.raises(ValueError, match="Cannot tell the history format"):
+        transfer_format('backup.txt')
+    with pytest.raises(ValueError, match="Unknown history format"):
+        transfer_format('backup.csv', 'xml')
+
+@pytest.mark.parametrize('backend, file_name', BACKEND_FILES)
+@pytest.mark.parametrize('export_name', ['out.csv', 'out.csv.gz', 'out.jsonl', 'out.jsonl.xz'])
+def test_round_trip(tmp_path, backend, file_name, export_name):
+    """Test exporting from and importing into every backend in every format."""
+    source = make_manager(tmp_path, backend, file_name)
+    assert source.export_history(str(tmp_path / export_name)) == 10
+
+    target = HistoryManager(backend=backend, history_file=str(tmp_path / f"imported-{file_name}"))
+    target.save_to_history('multiply', 1, 1, 1)
+    assert target.import_history(str(tmp_path / export_name)) == 10
+    history = target.load_history()
+    assert history['Operation'].tolist() == ['multiply'] + ['divide' if i % 2 else 'add' for i in range(10)]
+    assert history['Result'].astype(float).tolist() == [1.0] + [i + 0.5 for i in range(10)]
+    assert target.operation_stats()['add'].count == 5
+    assert target.query_history(HistoryQuery(last=1))['Result'].tolist() == [9.5]  # Ring buffer reseeded
+
+def test_jsonl_layout(tmp_path):
+    """Test that JSON Lines exports hold one object per entry with the history columns."""
+    make_manager(tmp_path, entries=2).export_history(str(tmp_path / "out.jsonl.gz"))
+    with gzip.open(tmp_path / "out.jsonl.gz", 'rt', encoding='utf-8') as f:
+        entries = [json.loads(line) for line in f]
+    assert entries == [
+        {'Operation': 'add', 'Operand1': 0, 'Operand2': 2, 'Result': 0.5},
+        {'Operation': 'divide', 'Operand1': 1, 'Operand2': 2, 'Result': 1.5},
+    ]
+
+def test_csv_import_copies_plain_blocks(tmp_path):
+    """Test the unparsed CSV path, with blocks that need parsing mixed in."""
+    source = tmp_path / "import.csv"
+    source.write_text('Operation,Operand1,Operand2,Result\nadd,1,2,3\n"add",2,2,4\n\nadd,3,2,5\nadd,4,2,6')
+    manager = HistoryManager(history_file=str(tmp_path / "history.csv"))
+    with mock.patch('calculator.plugins.history.transfer.BLOCK_BYTES', 12):
+        assert manager.import_history(str(source)) == 4
+    assert manager.load_history()['Result'].tolist() == [3, 4, 5, 6]
+    assert manager.operation_stats()['add'].count == 4  # Rebuilt after the unparsed blocks
+
+def test_import_reorders_and_checks_columns(tmp_path):
+    """Test that columns are matched by name and missing columns are reported."""
+    manager = HistoryManager(history_file=str(tmp_path / "history.csv"))
+    (tmp_path / "reordered.csv").write_text("Result,Operation,Operand2,Operand1\n3,add,2,1\n")
+    assert manager.import_history(str(tmp_path / "reordered.csv")) == 1
+    assert manager.load_history().values.tolist() == [['add', 1, 2, 3]]
+    (tmp_path / "partial.jsonl").write_text('{"Operation": "add", "Result": 3}\n')
+    with pytest.raises(ValueError, match="missing history columns: Operand1, Operand2"):
+        manager.import_history(str(tmp_path / "partial.jsonl"))
+
+@pytest.mark.parametrize('file_name, text', [
+    ('import.csv', 'Operation,Operand1,Operand2,Result\nadd,1,2,3\nadd,foo,bar,baz\nadd,1/3,1/3,2/3\nadd,1,2,three\n'),
+    ('import.jsonl', '{"Operation": "add", "Operand1": 1, "Operand2": 2, "Result": 3}\n'
+                     '{"Operation": "add", "Operand1": "foo", "Operand2": "bar", "Result": "baz"}\n'
+                     '{"Operation": "add", "Operand1": "1/3", "Operand2": "1/3", "Result": "2/3"}\n'
+                     '{"Operation": "add", "Operand1": 1, "Operand2": true, "Result": 3}\n'),
+])
+def test_import_skips_rows_that_are_not_numbers(tmp_path, caplog, file_name, text):
+    """Test that rows with non-numeric operands or results are skipped and reported, on every path."""
+    (tmp_path / file_name).write_text(text)
+    manager = HistoryManager(history_file=str(tmp_path / "history.csv"))
+    assert manager.import_history(str(tmp_path / file_name)) == 2
+    assert manager.load_history()['Result'].astype(str).tolist() == ['3', '2/3']
+    assert manager.operation_stats()['add'].count == 2
+    assert "Skipped 2 rows" in caplog.text
+
+def test_failed_import_leaves_aggregates_unchanged(tmp_path):
+    """Test that the aggregates are only updated once the imported entries are stored."""
+    source = make_manager(tmp_path, entries=4)
+    source.export_history(str(tmp_path / "out.jsonl"))
+    target = make_manager(tmp_path, 'sqlite', 'history.db', entries=2)
+    assert target.operation_stats()['add'].count == 1
+    with mock.patch.object(target.storage, 'append_frame', side_effect=OSError("disk full")):
+        with pytest.raises(OSError):
+            target.import_history(str(tmp_path / "out.jsonl"))
+    assert target.operation_stats()['add'].count == 1
+
+def test_import_into_rotating_history(tmp_path):
+    """Test that a large import is rotated into segments as it is appended."""
+    source = make_manager(tmp_path, entries=200)
+    source.export_history(str(tmp_path / "out.csv"))
+    target = HistoryManager(history_file=str(tmp_path / "rotating.csv"))
+    target.storage.rotation.max_bytes = 500
+    with mock.patch('calculator.plugins.history.transfer.BLOCK_BYTES', 256):
+        assert target.import_history(str(tmp_path / "out.csv")) == 200
+    assert len(target.storage.segments()) > 3
+    assert len(target.load_history()) == 200
+
+def test_progress_reports(tmp_path):
+    """Test that progress is reported while transferring and when finished."""
+    stream = io.StringIO()
+    progress = TransferProgress("Exported", stream, interval=0)
+    make_manager(tmp_path).export_history(str(tmp_path / "out.csv"), progress=progress)
+    progress.finish()
+    lines = stream.getvalue().splitlines()
+    assert lines[-1].startswith("Exported: 10 rows (")
+    assert len(lines) == 2
+
+def test_commands(tmp_path, capsys):
+    """Test the exporthistory and importhistory commands, including their errors."""
+    manager = make_manager(tmp_path)
+    path = str(tmp_path / "Backup.CSV")
+    ExportHistoryCommand(manager).execute(path, 'csv')
+    assert f"Exported 10 history entries to {path}." in capsys.readouterr().out
+    ImportHistoryCommand(manager).execute(path)
+    assert f"Imported 10 history entries from {path}." in capsys.readouterr().out
+    assert len(manager.load_history()) == 20
+    ImportHistoryCommand(manager).execute(str(tmp_path / "missing.csv"))
+    assert "Error:" in capsys.readouterr().out
+    ExportHistoryCommand(manager).execute()
+    assert "Usage: exporthistory PATH [csv|jsonl]" in capsys.readouterr().out
+
+def test_cli_flags():
+    """Test the export and import command-line flags."""
+    args = parse_arguments(['--import-history', 'in.jsonl.gz', '--export-history', 'out.txt', '--history-format', 'csv'])
+    assert (args.import_history, args.export_history, args.history_format) == ('in.jsonl.gz', 'out.txt', 'csv')
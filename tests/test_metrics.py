@@ -0,0 +1,116 @@
+"""
+Tests for the metrics registry, the command/history instrumentation and the stats command.
+"""
+
+import json
+import pytest
+from calculator.commands import CommandHandler
+from calculator.metrics import Metrics, metrics
+from calculator.plugins.arithmetic import AddCommand, DivideCommand
+from calculator.plugins.history import HistoryManager
+from calculator.plugins.stats import StatsCommand
+
+@pytest.fixture
+def enabled_metrics():
+    """Enable the global registry for one test and restore it afterwards."""
+    previous = metrics.enabled
+    metrics.reset()
+    metrics.enabled = True
+    yield metrics
+    metrics.enabled = previous
+    metrics.reset()
+
+def test_counters_and_histograms():
+    """Test counting and observing values under separate label sets."""
+    registry = Metrics(enabled=True)
+    registry.increment('calls_total', command='add')
+    registry.increment('calls_total', 2, command='add')
+    registry.increment('calls_total', command='divide')
+    registry.observe('latency_seconds', 0.002, command='add')
+    registry.observe('latency_seconds', 2.0, command='add')
+    snapshot = registry.snapshot()
+    values = {entry['labels']['command']: entry['value'] for entry in snapshot['counters']['calls_total']}
+    assert values == {'add': 3, 'divide': 1}
+    histogram = snapshot['histograms']['latency_seconds'][0]
+    assert histogram['count'] == 2
+    assert histogram['buckets']['0.005'] == 1
+    assert histogram['buckets']['+Inf'] == 2
+
+def test_prometheus_and_json_output(tmp_path):
+    """Test the Prometheus text format and JSON snapshots written to disk."""
+    registry = Metrics(enabled=True)
+    registry.increment('calls_total', command='add')
+    registry.observe('latency_seconds', 0.5)
+    text = registry.to_prometheus()
+    assert '# TYPE calls_total counter' in text
+    assert 'calls_total{command="add"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 1' in text
+    assert 'latency_seconds_count 1' in text
+    registry.write(str(tmp_path / 'metrics.json'))
+    assert json.loads((tmp_path / 'metrics.json').read_text())['counters']['calls_total'][0]['value'] == 1
+    registry.write(str(tmp_path / 'metrics.prom'))
+    assert (tmp_path / 'metrics.prom').read_text() == text
+
+def test_command_metrics_recorded(enabled_metrics):
+    """Test that command calls, errors and latency are recorded when enabled."""
+    handler = CommandHandler()
+    handler.register_command('add', AddCommand())
+    handler.register_command('divide', DivideCommand())
+    handler.execute_command('add', 1, 2)
+    handler.execute_command('add', 3, 4)
+    with pytest.raises(ZeroDivisionError):
+        handler.execute_command('divide', 1, 0)
+    calls = {entry['labels']['command']: entry['value']
+             for entry in enabled_metrics.snapshot()['counters']['calculator_command_calls_total']}
+    assert calls == {'add': 2, 'divide': 1}
+    errors = enabled_metrics.snapshot()['counters']['calculator_command_errors_total']
+    assert errors == [{'labels': {'command': 'divide'}, 'value': 1}]
+    latency = enabled_metrics.snapshot()['histograms']['calculator_command_latency_seconds']
+    assert sum(entry['count'] for entry in latency) == 3
+
+def test_metrics_disabled_records_nothing():
+    """Test that nothing is recorded while metrics are disabled."""
+    previous = metrics.enabled
+    metrics.enabled = False
+    metrics.reset()
+    try:
+        handler = CommandHandler()
+        handler.register_command('add', AddCommand())
+        handler.execute_command('add', 1, 2)
+        assert metrics.snapshot() == {'counters': {}, 'histograms': {}}
+    finally:
+        metrics.enabled = previous
+
+def test_history_metrics_recorded(enabled_metrics, tmp_path):
+    """Test that history writes, bytes and read latency are recorded."""
+    manager = HistoryManager(history_file=str(tmp_path / 'history.csv'), buffer_rows=1)
+    manager.save_to_history('add', 1, 2, 3)
+    manager.history_file = str(tmp_path / 'history.csv')  # Drop the in-memory entries
+    assert len(manager.query_history()) == 1
+    snapshot = enabled_metrics.snapshot()
+    assert snapshot['counters']['calculator_history_entries_written_total'][0]['value'] == 1
+    assert snapshot['counters']['calculator_history_write_bytes_total'][0]['value'] > 0
+    assert snapshot['counters']['calculator_history_read_bytes_total'][0]['value'] > 0
+    assert snapshot['histograms']['calculator_history_read_seconds'][0]['labels']['operation'] == 'query'
+
+def test_stats_command(enabled_metrics, capsys, tmp_path):
+    """Test showing, exporting, resetting and toggling metrics with the stats command."""
+    handler = CommandHandler(cache_size=4)
+    handler.register_command('add', AddCommand())
+    stats = StatsCommand(handler)
+    handler.execute_command('add', 1, 2)
+    stats.execute()
+    output = capsys.readouterr().out
+    assert 'calculator_command_calls_total{command="add"} 1' in output
+    assert 'Result cache: 0 hits, 1 misses' in output
+    path = tmp_path / 'snapshot.json'
+    stats.execute('save', str(path))
+    assert 'calculator_command_calls_total' in json.loads(path.read_text())['counters']
+    with pytest.raises(ValueError, match="Cannot write metrics to"):
+        stats.execute('save', str(tmp_path))  # A directory, not a file
+    stats.execute('reset')
+    assert enabled_metrics.snapshot() == {'counters': {}, 'histograms': {}}
+    stats.execute('off')
+    assert not enabled_metrics.enabled
+    stats.execute('on')
+    assert enabled_metrics.enabled
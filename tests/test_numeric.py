@@ -0,0 +1,129 @@
+"""
+Unit tests for the numeric modes (float, decimal and fraction).
+"""
+import decimal
+from decimal import Decimal
+from fractions import Fraction
+import pandas as pd
+import pytest
+from calculator.numeric import NumericMode, exact_operands, get_numeric_mode, set_numeric_mode, to_decimal
+from calculator.batch import parse_operations, execute_operations
+from calculator.commands import CommandHandler
+from calculator.plugins.arithmetic import AddCommand, SubtractCommand, MultiplyCommand, DivideCommand
+from calculator.plugins.expression import EvalCommand
+from calculator.plugins.numeric import ModeCommand
+from calculator.plugins.history import HistoryManager
+from calculator.plugins.history.storage import numeric_values
+
+@pytest.fixture(autouse=True)
+def float_mode():
+    """Fixture restoring float mode after each test."""
+    yield
+    set_numeric_mode('float')
+
+@pytest.fixture
+def command_handler():
+    """Fixture for a CommandHandler with the arithmetic commands."""
+    handler = CommandHandler()
+    for name, command in [('add', AddCommand()), ('subtract', SubtractCommand()),
+                          ('multiply', MultiplyCommand()), ('divide', DivideCommand())]:
+        handler.register_command(name, command)
+    return handler
+
+def test_parse_in_each_mode():
+    """Test that each mode parses operand text into its own type."""
+    assert NumericMode('float').parse('0.1') == 0.1
+    assert NumericMode('decimal').parse(' 0.1 ') == Decimal('0.1')
+    assert NumericMode('fraction').parse('1/3') == Fraction(1, 3)
+    assert NumericMode('fraction').parse('0.1') == Fraction(1, 10)
+    for name in ('float', 'decimal', 'fraction'):
+        with pytest.raises(ValueError):
+            NumericMode(name).parse('abc')
+
+def test_invalid_mode_settings():
+    """Test that unknown modes and precisions below 1 are rejected."""
+    with pytest.raises(ValueError, match="Unknown numeric mode"):
+        NumericMode('complex')
+    with pytest.raises(ValueError, match="at least 1"):
+        NumericMode('decimal', 0)
+
+def test_decimal_precision_context():
+    """Test that activating decimal mode applies its precision."""
+    set_numeric_mode('decimal', 5)
+    assert get_numeric_mode().precision == 5
+    assert DivideCommand().execute(Decimal(1), Decimal(3)) == Decimal('0.33333')
+    set_numeric_mode('decimal')
+    assert decimal.getcontext().prec == 28
+
+def test_exact_arithmetic():
+    """Test that decimal and fraction operands stay exact through every command."""
+    assert AddCommand().execute(Decimal('0.1'), Decimal('0.2')) == Decimal('0.3')
+    assert SubtractCommand().execute(Fraction(1, 2), Fraction(1, 3)) == Fraction(1, 6)
+    assert MultiplyCommand().execute(Fraction(2, 3), Fraction(3, 4)) == Fraction(1, 2)
+    assert DivideCommand().execute(Fraction(1), Fraction(3)) == Fraction(1, 3)
+    with pytest.raises(ZeroDivisionError):
+        DivideCommand().execute(Decimal(1), Decimal(0))
+
+def test_mixed_operands():
+    """Test that operand pairs Python cannot combine are converted to one exact type."""
+    assert AddCommand().execute(Decimal('0.1'), 0.2) == Decimal('0.3')
+    assert AddCommand().execute(Decimal('0.5'), Fraction(1, 4)) == Decimal('0.75')
+    assert exact_operands(Fraction(1, 2), 0.25) == (Fraction(1, 2), Fraction(1, 4))
+    assert to_decimal(Fraction(1, 4)) == Decimal('0.25')
+    with pytest.raises(ValueError, match="both values must be numbers"):
+        AddCommand().execute(Decimal(1), "2")
+
+def test_batch_uses_numeric_mode(command_handler):
+    """Test that batch operands are parsed in the current mode."""
+    set_numeric_mode('fraction')
+    operations = parse_operations(["divide 1 3", "add 0.1 0.2"])
+    assert list(execute_operations(command_handler, operations)) == ["1/3", "3/10"]
+    set_numeric_mode('decimal')
+    operations = parse_operations(["add 0.1 0.2"])
+    assert list(execute_operations(command_handler, operations)) == ["0.3"]
+
+def test_decimal_signals_are_errors(command_handler):
+    """Test that decimal InvalidOperation and Overflow are reported as errors rather than raised."""
+    set_numeric_mode('decimal')
+    with pytest.raises(ValueError, match="Result is undefined"):
+        SubtractCommand().execute(Decimal('inf'), Decimal('inf'))
+    with pytest.raises(ValueError, match="Result is too large"):
+        AddCommand().execute(Decimal('1e999999999'), Decimal('1e999999999'))
+    operations = parse_operations(["subtract inf inf", "add 1e999999999 1e999999999", "add 1 2"])
+    assert list(execute_operations(command_handler, operations)) == [
+        "Error: Result is undefined.", "Error: Result is too large.", "3"]
+
+def test_eval_uses_numeric_mode(command_handler):
+    """Test that expression literals and values are parsed in the current mode."""
+    evaluator = EvalCommand(command_handler)
+    assert evaluator.execute('a+0.2', 'a=0.1') == pytest.approx(0.3)
+    set_numeric_mode('decimal')
+    assert evaluator.execute('a+0.2', 'a=0.1') == Decimal('0.3')
+    assert evaluator.execute('-a', 'a=0.1') == Decimal('-0.1')
+    set_numeric_mode('fraction')
+    assert evaluator.execute('1/3 + a', 'a=1/6') == Fraction(1, 2)
+
+def test_mode_command(command_handler, capsys):
+    """Test showing and switching the mode, which clears the result cache."""
+    command_handler.cache_size = 8
+    command_handler.execute_command('add', 1.0, 2.0)
+    mode = ModeCommand(command_handler)
+    mode.execute('decimal', '12')
+    assert get_numeric_mode().name == 'decimal'
+    assert command_handler.cache_info()['size'] == 0
+    mode.execute()
+    assert "decimal (12 digits)" in capsys.readouterr().out
+    with pytest.raises(ValueError, match="Usage: mode"):
+        mode.execute('hex')
+
+def test_csv_history_keeps_exact_text(tmp_path):
+    """Test that the CSV history stores the exact representation and still filters and aggregates it."""
+    path = tmp_path / "history.csv"
+    manager = HistoryManager(backend='csv', history_file=str(path))
+    manager.save_to_history('add', Decimal('0.1'), Decimal('0.2'), Decimal('0.3'))
+    manager.save_to_history('divide', Fraction(1), Fraction(3), Fraction(1, 3))
+    manager.flush()
+    lines = path.read_text().splitlines()
+    assert lines[1:] == ["add,0.1,0.2,0.3", "divide,1,3,1/3"]
+    assert manager.storage.operation_totals()['divide'].mean == pytest.approx(1 / 3)
+    assert numeric_values(pd.Series(['0.5', '1/4', 'x', None])).tolist()[:2] == [0.5, 0.25]
@@ -0,0 +1,41 @@
+"""
+Unit tests for the parallel batch engine.
+"""
+from calculator.parallel import ParallelEngine
+
+def test_parallel_engine_keeps_input_order(tmp_path):
+    """Test that results come back in input order across shards and workers."""
+    source = tmp_path / "ops.txt"
+    source.write_text("".join(f"add {i} 1\n" for i in range(250)) + "divide 1 0\n")
+    destination = tmp_path / "results.txt"
+    stats = ParallelEngine(workers=2, shard_lines=20).run(str(source), str(destination))
+    lines = destination.read_text().splitlines()
+    assert lines[:250] == [str(float(i + 1)) for i in range(250)]
+    assert lines[250].startswith("Error:")
+    assert stats['operations'] == 251
+    assert stats['workers'] == 2
+    assert stats['operations_per_second'] > 0
+
+def test_parallel_engine_merges_history_in_order(tmp_path):
+    """Test that history entries from all workers are saved by the parent in input order."""
+    source = tmp_path / "ops.txt"
+    source.write_text("".join(f"multiply {i} 2\n" for i in range(100)))
+    saved = []
+
+    class RecordingHistory:
+        """Collects saved entries."""
+        def save_to_history(self, *entry):
+            saved.append(entry)
+
+    ParallelEngine(workers=3, shard_lines=7).run(str(source), str(tmp_path / "results.txt"), RecordingHistory())
+    assert saved == [('multiply', float(i), 2.0, i * 2.0) for i in range(100)]
+
+def test_parallel_engine_refuses_commands_without_operands(tmp_path):
+    """Test that commands acting on a worker's own state are errors rather than run in the worker."""
+    source = tmp_path / "ops.txt"
+    source.write_text("add 1 2\nclearhistory\nmode decimal\nadd 2 2\n")
+    destination = tmp_path / "results.txt"
+    ParallelEngine(workers=2, shard_lines=2).run(str(source), str(destination))
+    assert destination.read_text().splitlines() == [
+        "3.0", "Error: Command 'clearhistory' cannot run in a parallel batch.",
+        "Error: Command 'mode' cannot run in a parallel batch.", "4.0"]
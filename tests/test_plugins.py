@@ -0,0 +1,81 @@
+"""
+Unit tests for PluginManager: plugin discovery, the plugin manifest and lazy command loading.
+"""
+import json
+import pytest
+from calculator.commands import CommandHandler
+from calculator.plugins import PluginManager, LazyCommand
+from calculator.plugins.arithmetic import AddCommand
+from calculator.plugins.menu import MenuCommand
+
+@pytest.fixture
+def manifest_path(tmp_path):
+    """Fixture for a plugin manifest path in a temporary directory."""
+    return str(tmp_path / "plugin_manifest.json")
+
+def test_discovery_writes_manifest(manifest_path):
+    """Test that a first load imports plugins and records their commands."""
+    handler = CommandHandler()
+    PluginManager(handler, manifest_path).load_plugins()
+    assert isinstance(handler.commands['add'], AddCommand)
+    with open(manifest_path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    assert manifest['commands']['add'] == {
+        'module': 'calculator.plugins.arithmetic', 'class': 'AddCommand', 'pure': True, 'arity': 2,
+        'operand_types': ['builtins.float', 'builtins.int', 'decimal.Decimal', 'fractions.Fraction'],
+        'vectorized': True, 'dependencies': [],
+    }
+    assert manifest['commands']['menu']['pure'] is False
+
+def test_manifest_registers_lazy_commands(manifest_path):
+    """Test that a matching manifest registers placeholders that load on first use."""
+    PluginManager(CommandHandler(), manifest_path).load_plugins()
+
+    handler = CommandHandler()
+    PluginManager(handler, manifest_path).load_plugins()
+    assert isinstance(handler.commands['add'], LazyCommand)
+    assert handler.commands['add'].pure is True
+    descriptor = handler.descriptors['add']
+    assert (descriptor.arity, descriptor.vectorized) == (2, True)
+    assert float in descriptor.operand_types
+    assert handler.execute_command('add', 2, 3) == 5
+    assert isinstance(handler.commands['add'], AddCommand)  # Placeholder replaced itself
+
+def test_lazy_command_passes_command_handler(manifest_path):
+    """Test that lazily loaded commands still receive the command handler."""
+    PluginManager(CommandHandler(), manifest_path).load_plugins()
+    handler = CommandHandler()
+    PluginManager(handler, manifest_path).load_plugins()
+    handler.execute_command('menu')
+    assert isinstance(handler.commands['menu'], MenuCommand)
+    assert handler.commands['menu'].command_handler is handler
+
+def test_lazy_command_batch_execution(manifest_path):
+    """Test that batch execution works through a lazy placeholder."""
+    PluginManager(CommandHandler(), manifest_path).load_plugins()
+    handler = CommandHandler()
+    PluginManager(handler, manifest_path).load_plugins()
+    results, errors = handler.execute_batch('multiply', [1, 2], [3, 4])
+    assert results.tolist() == [3, 8]
+    assert not errors.any()
+
+def test_stale_manifest_triggers_discovery(manifest_path):
+    """Test that a manifest with a different fingerprint is ignored and rewritten."""
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': 'stale', 'commands': {'bogus': {
+            'module': 'nowhere', 'class': 'Nothing', 'pure': False}}}, f)
+    handler = CommandHandler()
+    manager = PluginManager(handler, manifest_path)
+    manager.load_plugins()
+    assert 'bogus' not in handler.commands
+    assert isinstance(handler.commands['add'], AddCommand)
+    with open(manifest_path, encoding='utf-8') as f:
+        assert json.load(f)['fingerprint'] == manager.plugins_fingerprint()
+
+def test_unreadable_manifest_triggers_discovery(manifest_path):
+    """Test that a corrupt manifest falls back to importing the plugins."""
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        f.write("{not json")
+    handler = CommandHandler()
+    PluginManager(handler, manifest_path).load_plugins()
+    assert isinstance(handler.commands['add'], AddCommand)
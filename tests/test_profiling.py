@@ -0,0 +1,84 @@
+"""
+Tests for session profiling: profiler sections, reports and the profile command.
+"""
+import os
+from unittest import mock
+import pytest
+from calculator import CalculatorApp
+from calculator.commands import CommandHandler
+from calculator.plugins.arithmetic import AddCommand
+from calculator.plugins.history import HistoryManager
+from calculator.plugins.profile import ProfileCommand
+from calculator.profiling import profiler
+
+@pytest.fixture
+def command_handler():
+    """Fixture for a CommandHandler with the add and profile commands; profiling is stopped afterwards."""
+    handler = CommandHandler()
+    handler.register_command('add', AddCommand())
+    handler.register_command('profile', ProfileCommand(handler))
+    yield handler
+    profiler.stop()
+
+def test_sections_are_noops_while_inactive():
+    """Test that sections cost nothing and record nothing while profiling is off."""
+    assert not profiler.active
+    with profiler.section('history.load'):
+        pass
+    assert 'history.load' not in profiler.sections
+
+def test_profile_command_wraps_dispatch(command_handler, capsys):
+    """Test that starting profiling times each command and stopping restores direct dispatch."""
+    direct = command_handler._dispatch['add']
+    command_handler.execute_command('profile', 'start')
+    assert profiler.active
+    assert command_handler.execute_command('add', 2, 3) == 5
+    assert profiler.sections['command.add'].count == 1
+    command_handler.execute_command('profile', 'start')
+    command_handler.execute_command('profile', 'stop')
+    assert command_handler._dispatch['add'] == direct
+    output = capsys.readouterr().out
+    assert "Profiling started." in output and "Profiling is already running." in output
+    assert "Profiling stopped." in output
+
+def test_dump_report(command_handler, tmp_path, capsys):
+    """Test that a dump covers sections, top functions and allocation sites, while profiling runs."""
+    command_handler.execute_command('profile', 'start')
+    manager = HistoryManager(history_file=str(tmp_path / "history.csv"), buffer_rows=10)
+    for i in range(50):
+        manager.save_to_history('add', i, 1, command_handler.execute_command('add', i, 1))
+    manager.flush()
+    command_handler.execute_command('profile', 'dump', str(tmp_path / "reports"))
+    assert profiler.active  # Dumping does not stop profiling
+
+    reports = sorted(os.listdir(tmp_path / "reports"))
+    assert len(reports) == 2 and reports[0].endswith('.prof') and reports[1].endswith('.txt')
+    report = (tmp_path / "reports" / reports[1]).read_text(encoding='utf-8')
+    for heading in ("Sections", "command.add", "history.write", "history.flush",
+                    "Top 25 functions by cumulative time", "save_to_history",
+                    "Top 25 allocation sites", "by growth since profiling started"):
+        assert heading in report
+    assert f"Profile written to {tmp_path / 'reports'}" in capsys.readouterr().out
+
+def test_dump_without_profile(capsys):
+    """Test the error and usage messages of the profile command."""
+    with mock.patch.object(profiler, 'profile', None):
+        ProfileCommand(CommandHandler()).execute('dump')
+    assert "Error: No profile to dump" in capsys.readouterr().out
+    ProfileCommand(CommandHandler()).execute('restart')
+    assert "Usage: profile [start | stop | dump [DIR]]" in capsys.readouterr().out
+
+@mock.patch.dict(os.environ, {'CALC_PROFILE': '1'})
+def test_environment_switch():
+    """Test that CALC_PROFILE starts profiling at startup and the report is written at shutdown."""
+    try:
+        app = CalculatorApp()
+        assert profiler.active
+        app.plugin_manager.load_plugins()
+        assert 'plugins.load' in profiler.sections
+        with mock.patch.object(profiler, 'dump') as mock_dump:
+            app.export_profile()
+        mock_dump.assert_called_once_with()
+        assert not profiler.active
+    finally:
+        profiler.stop()
@@ -0,0 +1,91 @@
+"""
+Unit tests for the prompt-free REPL and its command-name trie.
+"""
+import io
+import logging
+from unittest import mock
+import pytest
+from calculator import CalculatorApp
+from calculator.commands import CommandHandler
+from calculator.plugins.arithmetic import AddCommand, SubtractCommand, DivideCommand
+from calculator.plugins.menu import MenuCommand
+from calculator.repl import CommandTrie, FastREPL
+
+@pytest.fixture
+def command_handler():
+    """Fixture for a CommandHandler with a few commands."""
+    handler = CommandHandler()
+    handler.register_command("add", AddCommand())
+    handler.register_command("subtract", SubtractCommand())
+    handler.register_command("divide", DivideCommand())
+    handler.register_command("menu", MenuCommand(handler))
+    return handler
+
+def test_trie_resolves_unique_prefixes():
+    """Test full names, unique prefixes, ambiguous prefixes and unknown names."""
+    trie = CommandTrie(['showhistory', 'stats', 'subtract', 'sub'])
+    assert trie.resolve('stats') == 'stats'
+    assert trie.resolve('sh') == 'showhistory'
+    assert trie.resolve('st') == 'stats'
+    assert trie.resolve('sub') == 'sub'  # A full name wins over longer names
+    assert trie.resolve('subt') == 'subtract'
+    assert trie.completions('s') == ['showhistory', 'stats', 'sub', 'subtract']
+    with pytest.raises(ValueError, match="Ambiguous command 's'"):
+        trie.resolve('s')
+    with pytest.raises(KeyError):
+        trie.resolve('power')
+
+def test_single_line_commands(command_handler, capsys):
+    """Test that operands come from the same line and arity comes from the command."""
+    output = io.StringIO()
+    repl = FastREPL(command_handler)
+    count = repl.run(io.StringIO("add 3 4\na 1 2\n\n# comment\ndiv 1 0\nsub 1\nd x 2\nmenu\nexit\nadd 5 5\n"), output)
+    assert count == 6
+    assert output.getvalue().splitlines() == [
+        "7.0", "3.0", "Error: Cannot divide by zero.", "Error: Expected 2 operands, got 1.",
+        "Error: could not convert string to float: 'x'",
+    ]
+    assert "Available Commands:" in capsys.readouterr().out
+
+def test_output_is_written_in_blocks(command_handler):
+    """Test that buffered output is written once per block, not once per line."""
+    output = mock.MagicMock()
+    repl = FastREPL(command_handler, chunk_lines=100)
+    repl.run(io.StringIO("add 1 1\n" * 250), output)
+    assert output.write.call_count == 3
+    written = ''.join(call.args[0] for call in output.write.call_args_list)
+    assert written.count("2.0\n") == 250
+
+def test_history_is_saved(command_handler):
+    """Test that calculations are saved to history."""
+    history_manager = mock.MagicMock()
+    FastREPL(command_handler, history_manager).run(io.StringIO("add 3 4\n"), io.StringIO())
+    history_manager.save_to_history.assert_called_once_with('add', 3.0, 4.0, 7.0)
+
+def test_app_run_repl(capsys, caplog):
+    """Test the app-level REPL with the real plugins."""
+    app = CalculatorApp()
+    app.history_manager = mock.MagicMock()
+    output = io.StringIO()
+    with caplog.at_level(logging.ERROR):
+        assert app.run_repl(io.StringIO("mul 6 7\nroot 2 3\n"), output) == 2
+    assert output.getvalue() == "42.0\nError: Unknown command: 'root'\n"
+    app.history_manager.flush.assert_called_once()
+
+@mock.patch('builtins.input', side_effect=['add 2 3', 'exit'])
+def test_prompting_repl_accepts_single_line(mock_input, capsys):
+    """Test that the prompting REPL also takes operands on the command line."""
+    app = CalculatorApp()
+    app.history_manager = mock.MagicMock()
+    app.start()
+    assert "Result: 5.0" in capsys.readouterr().out
+    assert mock_input.call_count == 2
+
+def test_reads_real_files_in_chunks(command_handler, tmp_path):
+    """Test the raw chunked reader on a real file, including lines split across chunks."""
+    path = tmp_path / "commands.txt"
+    path.write_text("add 10 20\nsubtract 5 2\nadd 1 1")  # No final newline
+    output = io.StringIO()
+    with open(path, encoding='utf-8') as f:
+        assert FastREPL(command_handler, read_chunk_bytes=5).run(f, output) == 3
+    assert output.getvalue().splitlines() == ["30.0", "3.0", "2.0"]
@@ -0,0 +1,176 @@
+"""
+Unit tests for the asyncio calculation server, its client and the load generator.
+"""
+import asyncio
+from decimal import Decimal
+import pytest
+from calculator.numeric import set_numeric_mode
+from calculator.commands import CommandHandler
+from calculator.plugins.arithmetic import AddCommand, DivideCommand, MultiplyCommand, PowerCommand
+from calculator.plugins.history import HistoryManager, ClearHistoryCommand
+from calculator.server import CalculatorServer
+from calculator.server.client import CalculatorClient
+from calculator.server.loadgen import run_load, percentile
+
+class RecordingHistory:
+    """Collects saved entries."""
+    def __init__(self):
+        self.entries = []
+        self.flushed = False
+
+    def save_to_history(self, *entry):
+        self.entries.append(entry)
+
+    def flush(self):
+        self.flushed = True
+
+@pytest.fixture
+def command_handler():
+    """Fixture for a CommandHandler with a few arithmetic commands."""
+    handler = CommandHandler()
+    handler.register_command("add", AddCommand())
+    handler.register_command("divide", DivideCommand())
+    return handler
+
+def test_handle_request(command_handler):
+    """Test request handling without a socket."""
+    server = CalculatorServer(command_handler)
+    assert server.handle_request(b'{"id": 1, "command": "add", "args": [1, 2]}') == {'id': 1, 'result': 3}
+    response = server.handle_request(b'{"id": 2, "command": "divide", "args": [1, 0]}')
+    assert response['type'] == 'ZeroDivisionError'
+    assert server.handle_request(b'{"id": 3, "command": "power", "args": []}')['type'] == 'KeyError'
+    assert server.handle_request(b'not json')['type'] == 'ValueError'
+    assert server.handle_request(b'[1, 2]')['type'] == 'ValueError'
+    response = server.handle_request(b'{"id": 4, "command": "add", "args": ["1", "2"]}')
+    assert response['error'] == "Invalid input: both values must be numbers."
+    assert server.handle_request(b'{"id": 5, "command": "add", "args": [1]}')['type'] == 'ValueError'
+
+def test_handle_request_coerces_operands_to_the_mode(command_handler):
+    """Test that JSON integers become floats in float mode, so exact powers cannot run unbounded."""
+    command_handler.register_command("power", PowerCommand())
+    server = CalculatorServer(command_handler)
+    result = server.handle_request(b'{"id": 1, "command": "add", "args": [1, 2]}')['result']
+    assert isinstance(result, float)
+    response = server.handle_request(b'{"id": 2, "command": "power", "args": [7, 3000000]}')
+    assert response['type'] == 'ValueError' and "too large" in response['error']
+
+def test_handle_request_refuses_commands_without_operands(command_handler, tmp_path):
+    """Test that history, menu and similar commands cannot be run by clients."""
+    history = HistoryManager(history_file=str(tmp_path / "history.csv"))
+    history.save_to_history('add', 1, 2, 3)
+    command_handler.register_command("clearhistory", ClearHistoryCommand(history))
+    server = CalculatorServer(command_handler, history)
+    response = server.handle_request(b'{"id": 6, "command": "clearhistory"}')
+    assert response == {'id': 6, 'error': "Command 'clearhistory' is not available over the server.",
+                        'type': 'ValueError'}
+    assert len(history.load_history()) == 1
+
+def test_server_round_trip_with_pipelining(command_handler):
+    """Test pipelined calls from a client and history written by the background task."""
+    history = RecordingHistory()
+
+    async def scenario():
+        server = CalculatorServer(command_handler, history, port=0)
+        await server.start()
+        client = await CalculatorClient.connect('127.0.0.1', server.port)
+        results = await asyncio.gather(*(client.call('add', i, 1) for i in range(50)))
+        with pytest.raises(ZeroDivisionError):
+            await client.call('divide', 1, 0)
+        await client.close()
+        await server.close()
+        return results
+
+    assert asyncio.run(scenario()) == [i + 1 for i in range(50)]
+    assert len(history.entries) == 50
+    assert history.entries[0] == ('add', 0, 1, 1)
+    assert history.flushed
+
+def test_unsendable_results_and_failed_saves(command_handler, tmp_path, caplog):
+    """Test that a result JSON cannot carry is an error response and a failed save does not stop the history task."""
+    class FailingHistory(RecordingHistory):
+        """Fails to save multiplications."""
+        def save_to_history(self, *entry):
+            if entry[0] == 'multiply':
+                raise OverflowError("too large")
+            super().save_to_history(*entry)
+
+    history = FailingHistory()
+    command_handler.register_command("multiply", MultiplyCommand())
+    path = str(tmp_path / "calc.sock")
+
+    async def scenario():
+        server = CalculatorServer(command_handler, history, path=path)
+        await server.start()
+        client = await CalculatorClient.connect_unix(path)
+        with pytest.raises(ValueError, match="Result cannot be sent"):
+            await client.call('multiply', 10 ** 3000, 10 ** 3000)
+        result = await client.call('add', 1, 2)
+        await client.close()
+        await server.close()
+        return result
+
+    # Fraction mode keeps the operands exact, so the product has more digits than Python converts to text
+    set_numeric_mode('fraction')
+    try:
+        assert asyncio.run(scenario()) == '3'
+    finally:
+        set_numeric_mode('float')
+    assert history.entries == [('add', 1, 2, 3)]
+    assert "Could not save multiply to history: too large" in caplog.text
+
+def test_server_unix_socket(command_handler, tmp_path):
+    """Test serving over a Unix domain socket."""
+    path = str(tmp_path / "calc.sock")
+
+    async def scenario():
+        server = CalculatorServer(command_handler, path=path)
+        await server.start()
+        client = await CalculatorClient.connect_unix(path)
+        result = await client.call('add', 2, 2)
+        await client.close()
+        await server.close()
+        return result
+
+    assert asyncio.run(scenario()) == 4
+
+def test_server_uses_numeric_mode(command_handler, tmp_path):
+    """Test that operands follow the numeric mode and exact results are sent as text."""
+    path = str(tmp_path / "calc.sock")
+
+    async def scenario():
+        server = CalculatorServer(command_handler, path=path)
+        await server.start()
+        client = await CalculatorClient.connect_unix(path)
+        results = [await client.call('add', 0.1, 0.2), await client.call('divide', 1, 3)]
+        await client.close()
+        await server.close()
+        return results
+
+    set_numeric_mode('decimal')
+    try:
+        server = CalculatorServer(command_handler)
+        assert server.handle_request(b'{"id": 1, "command": "add", "args": [0.1, 0.2]}')['result'] == Decimal('0.3')
+        set_numeric_mode('fraction')
+        assert asyncio.run(scenario()) == ['3/10', '1/3']
+    finally:
+        set_numeric_mode('float')
+
+def test_load_generator(command_handler):
+    """Test that the load generator reports throughput and latency percentiles."""
+    async def scenario():
+        server = CalculatorServer(command_handler, port=0)
+        await server.start()
+        stats = await run_load(port=server.port, connections=2, requests=100, pipeline=8)
+        await server.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats['requests'] == 100
+    assert stats['errors'] > 0  # 'subtract' and 'multiply' are not registered in this handler
+    assert stats['requests_per_second'] > 0
+    assert 0 < stats['p50_ms'] <= stats['p99_ms']
+
+def test_percentile():
+    """Test the percentile helper."""
+    assert percentile([1, 2, 3, 4], 0.5) == 3
+    assert percentile([], 0.99) == 0.0